@@ -0,0 +1,177 @@
+"""CPU microbenchmarks for encryption and payload building.
+
+Measures throughput and peak allocations of the CPU-bound hot paths and
+compares them with a stored baseline. Fails (exit code 1) when a case is
+slower or allocates more than the tolerance allows.
+
+    python benchmarks/cpu.py --save-baseline
+    python benchmarks/cpu.py --tolerance 0.2
+"""
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_ksef import _self_signed_certificate  # noqa: E402
+from ksef.encryption import EncryptionManager  # noqa: E402
+from ksef.utils import build_search_body  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "cpu_baseline.json")
+INVOICE_SIZES = {"1KB": 1024, "64KB": 64 * 1024, "1MB": 1024**2, "3MB": 3 * 1024**2}
+
+SEARCH_PARAMS = {
+    "subject_type": "Subject2",
+    "date_type": "Invoicing",
+    "date_from": "2025-01-01T00:00:00.000+00:00",
+    "date_to": "2025-01-31T23:59:59.999+00:00",
+    "seller_nip": "5260250274",
+    "currency_codes": ["PLN", "EUR"],
+    "invoice_types": ["Vat", "Kor"],
+}
+
+
+def build_cases():
+    certificate, _ = _self_signed_certificate()
+    timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    encryption = EncryptionManager()
+    encryption.generate_session_keys(certificate)
+
+    cases = {}
+    for label, size in INVOICE_SIZES.items():
+        xml = _invoice_of_size(size)
+        cases[f"encrypt_invoice[{label}]"] = partial(encryption.encrypt_invoice, xml)
+        cases[f"encrypt_invoice_body[{label}]"] = partial(
+            encryption.encrypt_invoice_body, xml
+        )
+
+    payload = encryption.encrypt_invoice(_invoice_of_size(INVOICE_SIZES["64KB"]))
+    cases["encrypt_token"] = lambda: EncryptionManager.encrypt_token(
+        "token", timestamp, certificate
+    )
+    cases["generate_session_keys"] = lambda: EncryptionManager().generate_session_keys(
+        certificate
+    )
+    cases["load_x509"] = lambda: EncryptionManager._load_public_key(certificate)
+    cases["serialize_payload[64KB]"] = lambda: json.dumps(payload).encode("utf-8")
+    cases["build_search_body"] = lambda: build_search_body(SEARCH_PARAMS)
+    return cases
+
+
+def measure(func, min_time: float, repeats: int):
+    func()
+
+    number = 1
+    while True:
+        elapsed = _time_loop(func, number)
+        if elapsed >= min_time / repeats:
+            break
+        number *= 2
+
+    timings = [_time_loop(func, number) / number for _ in range(repeats)]
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_op = statistics.median(timings)
+    return {
+        "ops_per_second": round(1 / per_op, 2),
+        "us_per_op": round(per_op * 1e6, 3),
+        "peak_bytes": peak,
+    }
+
+
+def compare(results, baseline, tolerance: float):
+    failures = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+
+        if result["ops_per_second"] < before["ops_per_second"] * (1 - tolerance):
+            failures.append(f"{name}: throughput")
+        if result["peak_bytes"] > before["peak_bytes"] * (1 + tolerance):
+            failures.append(f"{name}: allocations")
+    return failures
+
+
+def _time_loop(func, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - start
+
+
+def _invoice_of_size(size: int) -> str:
+    head = '<?xml version="1.0" encoding="UTF-8"?><Faktura><Fa>'
+    tail = "</Fa></Faktura>"
+    row = "<FaWiersz><P_7>Towar</P_7><P_11>100.00</P_11></FaWiersz>"
+    body = row * ((size - len(head) - len(tail)) // len(row) + 1)
+    return (head + body)[: size - len(tail)] + tail
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.3, help="Allowed relative regression."
+    )
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds per case.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--filter", default="", help="Run cases containing this text.")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    print(f"{'case':<30} {'ops/s':>12} {'us/op':>12} {'peak KB':>10}  vs baseline")
+    for name, func in build_cases().items():
+        if args.filter not in name:
+            continue
+
+        result = results[name] = measure(func, args.min_time, args.repeats)
+        before = baseline.get(name)
+        change = (
+            f"{result['ops_per_second'] / before['ops_per_second'] - 1:+.1%}"
+            if before
+            else "-"
+        )
+        print(
+            f"{name:<30} {result['ops_per_second']:>12.1f} {result['us_per_op']:>12.1f} "
+            f"{result['peak_bytes'] / 1024:>10.1f}  {change}"
+        )
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {"python": sys.version.split()[0], "results": results}, f, indent=2
+            )
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return
+
+    failures = compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Import-time benchmark for the CLI entry points.
+
+Fails (exit code 1) when a heavy dependency leaks into a cold path or when the
+median startup time exceeds the threshold.
+
+    python benchmarks/import_time.py --runs 10 --max-ms 150
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("requests", "cryptography", "dateutil", "sqlite3", "xml.etree")
+
+COLD_PATHS = {
+    "import ksef": "import ksef",
+    "import ksef.client": "import ksef.client",
+    "KSeFClient()": (
+        "from ksef import KSeFClient, KSeFConfig; KSeFClient(KSeFConfig())"
+    ),
+    "main --help": (
+        "import sys; sys.argv = ['main.py', '--help']\n"
+        "import main\n"
+        "try:\n    main.main()\nexcept SystemExit:\n    pass"
+    ),
+}
+
+
+def leaked_modules(code: str):
+    probe = (
+        "import contextlib, io, sys\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        + "".join(f"    {line}\n" for line in code.splitlines())
+        + f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", probe],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+    return [m for m in output.split(",") if m]
+
+
+def startup_ms(code: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            capture_output=True,
+            check=True,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--max-ms", type=float, default=150.0, help="Median startup threshold."
+    )
+    args = parser.parse_args()
+
+    baseline = startup_ms("pass", args.runs)
+    failed = False
+
+    print(f"{'path':<20} {'median ms':>10} {'over python':>12}  leaked")
+    for name, code in COLD_PATHS.items():
+        median = startup_ms(code, args.runs)
+        leaked = leaked_modules(code)
+        over_limit = median > args.max_ms
+        failed = failed or over_limit or bool(leaked)
+
+        print(
+            f"{name:<20} {median:>10.1f} {median - baseline:>12.1f}  "
+            f"{','.join(leaked) or '-'}{'  SLOW' if over_limit else ''}"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,686 @@
+"""Local mock of the KSeF API v2 for benchmarks.
+
+Implements the endpoints from ksef/constants.py with configurable latency,
+processing delay, injected 429 responses and page-size limits. Invoice exports
+are served as AES-encrypted ZIP packages split into --export-part-size parts,
+ready after --processing-delay. With --http2
+the server speaks cleartext HTTP/2 (h2c, prior knowledge; needs the h2
+package) instead of HTTP/1.1.
+
+    python benchmarks/mock_ksef.py --port 8900 --latency 0.02 --throttle 0.01
+"""
+
+import argparse
+import base64
+import datetime
+import hashlib
+import io
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ksef import constants  # noqa: E402
+
+HTTP_TOO_MANY_REQUESTS = 429
+API_PREFIX = "/v2"
+ENDPOINT_EXPORT_PART = "/exports/{reference}/parts/{part}"
+
+THROTTLED_ENDPOINTS = {
+    constants.ENDPOINT_SESSION_INVOICES,
+    constants.ENDPOINT_SESSION_INVOICE_LIST,
+    constants.ENDPOINT_INVOICE_SEARCH,
+    constants.ENDPOINT_INVOICE_XML,
+    constants.ENDPOINT_INVOICE_METADATA,
+}
+
+INVOICE_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Faktura xmlns="http://crd.gov.pl/wzor/2025/06/25/13775/">'
+    "<Naglowek><KodFormularza>FA</KodFormularza></Naglowek>"
+    "<Podmiot1><DaneIdentyfikacyjne><NIP>{seller}</NIP></DaneIdentyfikacyjne>"
+    "</Podmiot1><Fa><KodWaluty>PLN</KodWaluty><P_1>{date}</P_1>"
+    "<P_2>FV/{index}</P_2><P_13_1>{net}</P_13_1><P_14_1>{vat}</P_14_1>"
+    "<P_15>{gross}</P_15></Fa>{padding}</Faktura>"
+)
+
+
+class MockKSeF:
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        processing_delay: float = 0.0,
+        throttle: float = 0.0,
+        max_page_size: int = 250,
+        stored_invoices: int = 1000,
+        invoice_bytes: int = 2048,
+        seed: int = 0,
+        auth_delay: float = 0.0,
+        http2: bool = False,
+        export_part_size: int = 1024 * 1024,
+    ):
+        self.latency = latency
+        self.processing_delay = processing_delay
+        self.auth_delay = auth_delay
+        self.throttle = throttle
+        self.max_page_size = max_page_size
+        self.export_part_size = export_part_size
+        self.certificate, self.private_key = _self_signed_certificate()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.auth_ready = {}
+        self.exports = {}
+        self.sequence = itertools.count(1)
+        self.stored = _build_store(stored_invoices, invoice_bytes)
+        self.stored_by_number = {inv["ksefNumber"]: inv for inv in self.stored}
+        self.requests = 0
+        self.throttled = 0
+        self.connections = 0
+
+        if http2:
+            self.httpd = H2Server(self, (host, port))
+        else:
+            self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+            self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> "MockKSeF":
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="mock-ksef", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def handle(self, method: str, template: str, params: dict, query: dict, body):
+        with self.lock:
+            self.requests += 1
+            throttled = (
+                template in THROTTLED_ENDPOINTS and self.random.random() < self.throttle
+            )
+            if throttled:
+                self.throttled += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            return HTTP_TOO_MANY_REQUESTS, {"status": {"code": 429}}
+
+        route = ROUTES.get((method, template))
+        if route is None:
+            return constants.HTTP_NOT_FOUND, {"error": "not found"}
+        return route(self, params, query, body)
+
+    def auth_challenge(self, params, query, body):
+        return constants.HTTP_OK, {
+            "challenge": uuid.uuid4().hex,
+            "timestamp": _now().isoformat(),
+        }
+
+    def auth_ksef_token(self, params, query, body):
+        reference = uuid.uuid4().hex
+        with self.lock:
+            self.auth_ready[reference] = time.monotonic() + self.auth_delay
+        return constants.HTTP_ACCEPTED, {
+            "referenceNumber": reference,
+            "authenticationToken": {"token": uuid.uuid4().hex},
+        }
+
+    def auth_status(self, params, query, body):
+        ready_at = self.auth_ready.get(params["reference"], 0.0)
+        if time.monotonic() < ready_at:
+            return constants.HTTP_OK, {"status": {"code": constants.STATUS_PROCESSING}}
+        return constants.HTTP_OK, {"status": {"code": constants.STATUS_ACCEPTED}}
+
+    def auth_redeem(self, params, query, body):
+        return constants.HTTP_OK, {
+            "accessToken": _token(datetime.timedelta(minutes=15)),
+            "refreshToken": _token(datetime.timedelta(days=7)),
+        }
+
+    def auth_refresh(self, params, query, body):
+        return constants.HTTP_OK, {
+            "accessToken": _token(datetime.timedelta(minutes=15))
+        }
+
+    def public_keys(self, params, query, body):
+        return constants.HTTP_OK, [
+            {
+                "certificate": self.certificate,
+                "usage": [constants.CERT_USAGE_SYMMETRIC_KEY, "KsefTokenEncryption"],
+                "type": constants.CERT_TYPE_ENCRYPTION,
+            }
+        ]
+
+    def open_session(self, params, query, body):
+        reference = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[reference] = []
+        return constants.HTTP_CREATED, {
+            "referenceNumber": reference,
+            "validUntil": (_now() + datetime.timedelta(hours=12)).isoformat(),
+        }
+
+    def close_session(self, params, query, body):
+        with self.lock:
+            self.sessions.pop(params["session"], None)
+        return constants.HTTP_NO_CONTENT, None
+
+    def send_invoice(self, params, query, body):
+        reference = uuid.uuid4().hex
+        with self.lock:
+            invoices = self.sessions.get(params["session"])
+            if invoices is None:
+                return constants.HTTP_NOT_FOUND, {"error": "unknown session"}
+            invoices.append(
+                {
+                    "referenceNumber": reference,
+                    "ksefNumber": _ksef_number(next(self.sequence)),
+                    "readyAt": time.monotonic() + self.processing_delay,
+                }
+            )
+        return constants.HTTP_ACCEPTED, {"referenceNumber": reference}
+
+    def session_invoices(self, params, query, body):
+        now = time.monotonic()
+        with self.lock:
+            invoices = list(self.sessions.get(params["session"], []))
+
+        return constants.HTTP_OK, {
+            "invoices": [
+                {
+                    "referenceNumber": inv["referenceNumber"],
+                    "ksefNumber": inv["ksefNumber"] if now >= inv["readyAt"] else None,
+                    "status": {
+                        "code": (
+                            constants.STATUS_ACCEPTED
+                            if now >= inv["readyAt"]
+                            else constants.STATUS_PROCESSING
+                        )
+                    },
+                }
+                for inv in invoices
+            ]
+        }
+
+    def search(self, params, query, body):
+        offset = int(query.get("pageOffset", ["0"])[0])
+        size = min(int(query.get("pageSize", ["250"])[0]), self.max_page_size)
+        start = offset * size
+        page = self.stored[start : start + size]
+
+        return constants.HTTP_OK, {
+            "invoices": [inv["metadata"] for inv in page],
+            "hasMore": start + size < len(self.stored),
+        }
+
+    def invoice_xml(self, params, query, body):
+        invoice = self.stored_by_number.get(params["number"])
+        if invoice is None:
+            return constants.HTTP_NOT_FOUND, {"error": "unknown invoice"}
+        return constants.HTTP_OK, invoice["content"]
+
+    def invoice_metadata(self, params, query, body):
+        invoice = self.stored_by_number.get(params["number"])
+        if invoice is None:
+            return constants.HTTP_NOT_FOUND, {"error": "unknown invoice"}
+        return constants.HTTP_OK, invoice["metadata"]
+
+    def start_export(self, params, query, body):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives import padding as crypto_padding
+        from cryptography.hazmat.primitives.asymmetric import padding
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+        encryption = body["encryption"]
+        key = self.private_key.decrypt(
+            base64.b64decode(encryption["encryptedSymmetricKey"]),
+            padding.OAEP(
+                mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None,
+            ),
+        )
+        iv = base64.b64decode(encryption["initializationVector"])
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for invoice in self.stored:
+                archive.writestr(f"{invoice['ksefNumber']}.xml", invoice["content"])
+            archive.writestr(
+                constants.EXPORT_METADATA_FILE,
+                json.dumps({"invoices": [inv["metadata"] for inv in self.stored]}),
+            )
+        data = buffer.getvalue()
+
+        reference = uuid.uuid4().hex
+        parts, blobs = [], []
+        for number, start in enumerate(
+            range(0, len(data), self.export_part_size), start=1
+        ):
+            plain = data[start : start + self.export_part_size]
+            padder = crypto_padding.PKCS7(constants.PKCS7_BLOCK_SIZE).padder()
+            encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+            encrypted = (
+                encryptor.update(padder.update(plain) + padder.finalize())
+                + encryptor.finalize()
+            )
+            blobs.append(encrypted)
+            parts.append(
+                {
+                    "ordinalNumber": number,
+                    "partName": f"{reference}.zip.{number:03d}.aes",
+                    "url": self.base_url
+                    + ENDPOINT_EXPORT_PART.format(reference=reference, part=number),
+                    "partSize": len(plain),
+                    "partHash": _sha256_b64(plain),
+                    "encryptedPartSize": len(encrypted),
+                    "encryptedPartHash": _sha256_b64(encrypted),
+                }
+            )
+
+        with self.lock:
+            self.exports[reference] = {
+                "readyAt": time.monotonic() + self.processing_delay,
+                "blobs": blobs,
+                "package": {
+                    "invoiceCount": len(self.stored),
+                    "size": len(data),
+                    "parts": parts,
+                    "isTruncated": False,
+                },
+            }
+        return constants.HTTP_ACCEPTED, {"referenceNumber": reference}
+
+    def export_status(self, params, query, body):
+        export = self.exports.get(params["reference"])
+        if export is None:
+            return constants.HTTP_NOT_FOUND, {"error": "unknown export"}
+        if time.monotonic() < export["readyAt"]:
+            return constants.HTTP_OK, {"status": {"code": constants.STATUS_PROCESSING}}
+        return constants.HTTP_OK, {
+            "status": {"code": constants.STATUS_ACCEPTED},
+            "package": export["package"],
+        }
+
+    def export_part(self, params, query, body):
+        export = self.exports.get(params["reference"])
+        part = int(params["part"])
+        if export is None or not 1 <= part <= len(export["blobs"]):
+            return constants.HTTP_NOT_FOUND, {"error": "unknown export part"}
+        return constants.HTTP_OK, export["blobs"][part - 1]
+
+
+ROUTES = {
+    ("POST", constants.ENDPOINT_AUTH_CHALLENGE): MockKSeF.auth_challenge,
+    ("POST", constants.ENDPOINT_AUTH_KSEF_TOKEN): MockKSeF.auth_ksef_token,
+    ("GET", constants.ENDPOINT_AUTH_STATUS): MockKSeF.auth_status,
+    ("POST", constants.ENDPOINT_AUTH_REDEEM): MockKSeF.auth_redeem,
+    ("POST", constants.ENDPOINT_AUTH_REFRESH): MockKSeF.auth_refresh,
+    ("GET", constants.ENDPOINT_PUBLIC_KEYS): MockKSeF.public_keys,
+    ("POST", constants.ENDPOINT_SESSION_ONLINE): MockKSeF.open_session,
+    ("POST", constants.ENDPOINT_SESSION_CLOSE): MockKSeF.close_session,
+    ("POST", constants.ENDPOINT_SESSION_INVOICES): MockKSeF.send_invoice,
+    ("GET", constants.ENDPOINT_SESSION_INVOICE_LIST): MockKSeF.session_invoices,
+    ("POST", constants.ENDPOINT_INVOICE_SEARCH): MockKSeF.search,
+    ("GET", constants.ENDPOINT_INVOICE_XML): MockKSeF.invoice_xml,
+    ("GET", constants.ENDPOINT_INVOICE_METADATA): MockKSeF.invoice_metadata,
+    ("POST", constants.ENDPOINT_INVOICE_EXPORT): MockKSeF.start_export,
+    ("GET", constants.ENDPOINT_INVOICE_EXPORT_STATUS): MockKSeF.export_status,
+    ("GET", ENDPOINT_EXPORT_PART): MockKSeF.export_part,
+}
+
+_TEMPLATES = sorted(
+    {template for _, template in ROUTES},
+    key=lambda template: ("{" in template, -len(template)),
+)
+_PATTERNS = [
+    (re.compile(re.sub(r"\\{(\w+)\\}", r"(?P<\1>[^/]+)", re.escape(t))), t)
+    for t in _TEMPLATES
+]
+
+
+def _match(path: str):
+    for pattern, template in _PATTERNS:
+        match = pattern.fullmatch(path)
+        if match:
+            return template, match.groupdict()
+    return path, {}
+
+
+def _make_handler(mock: MockKSeF):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            mock.count_connection()
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def _dispatch(self, method: str):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+
+            status, data, headers = _serve(mock, method, self.path, raw)
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args):
+            pass
+
+    return Handler
+
+
+class H2Server:
+
+    def __init__(self, mock: MockKSeF, address, workers: int = 64):
+        import h2.config
+
+        self.mock = mock
+        self.config = h2.config.H2Configuration(
+            client_side=False, header_encoding="utf-8"
+        )
+        self.socket = socket.create_server(address)
+        self.server_address = self.socket.getsockname()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.connections = set()
+        self._stopped = threading.Event()
+
+    def serve_forever(self):
+        self.socket.settimeout(0.2)
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self.socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.mock.count_connection()
+            self.connections.add(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def shutdown(self):
+        self._stopped.set()
+
+    def server_close(self):
+        self.socket.close()
+        for conn in list(self.connections):
+            conn.close()
+        self.executor.shutdown(wait=False)
+
+    def _serve(self, conn: socket.socket):
+        import h2.connection
+        import h2.events
+
+        h2conn = h2.connection.H2Connection(config=self.config)
+        window = threading.Condition()
+        streams = {}
+
+        with window:
+            h2conn.initiate_connection()
+            conn.sendall(h2conn.data_to_send())
+
+        try:
+            while True:
+                data = conn.recv(65535)
+                if not data:
+                    return
+
+                with window:
+                    events = h2conn.receive_data(data)
+                    for event in events:
+                        if isinstance(event, h2.events.RequestReceived):
+                            streams[event.stream_id] = (dict(event.headers), [])
+                        elif isinstance(event, h2.events.DataReceived):
+                            streams[event.stream_id][1].append(event.data)
+                            h2conn.acknowledge_received_data(
+                                event.flow_controlled_length, event.stream_id
+                            )
+                        elif isinstance(event, h2.events.StreamEnded):
+                            headers, chunks = streams.pop(event.stream_id)
+                            self.executor.submit(
+                                self._respond,
+                                conn,
+                                h2conn,
+                                window,
+                                event.stream_id,
+                                headers,
+                                b"".join(chunks),
+                            )
+                        elif isinstance(event, h2.events.ConnectionTerminated):
+                            return
+                    window.notify_all()
+                    conn.sendall(h2conn.data_to_send())
+        except OSError:
+            return
+        finally:
+            self.connections.discard(conn)
+            conn.close()
+
+    def _respond(self, conn, h2conn, window, stream_id, headers, raw):
+        status, data, response_headers = _serve(
+            self.mock, headers[":method"], headers[":path"], raw
+        )
+        view = memoryview(data)
+
+        with window:
+            h2conn.send_headers(
+                stream_id,
+                [(":status", str(status))]
+                + [(name.lower(), value) for name, value in response_headers],
+                end_stream=not data,
+            )
+            conn.sendall(h2conn.data_to_send())
+
+            while view:
+                size = min(
+                    h2conn.local_flow_control_window(stream_id),
+                    h2conn.max_outbound_frame_size,
+                    len(view),
+                )
+                if size <= 0:
+                    window.wait()
+                    continue
+                h2conn.send_data(
+                    stream_id, view[:size].tobytes(), end_stream=size == len(view)
+                )
+                conn.sendall(h2conn.data_to_send())
+                view = view[size:]
+
+
+def _serve(mock: MockKSeF, method: str, raw_path: str, raw: bytes):
+    url = urlparse(raw_path)
+    template, params = _match(url.path[len(API_PREFIX) :])
+    body = json.loads(raw) if raw else None
+
+    status, payload = mock.handle(method, template, params, parse_qs(url.query), body)
+
+    if payload is None:
+        data, content_type = b"", constants.CONTENT_TYPE_JSON
+    elif isinstance(payload, bytes):
+        data, content_type = payload, constants.CONTENT_TYPE_XML
+    else:
+        data = json.dumps(payload).encode("utf-8")
+        content_type = constants.CONTENT_TYPE_JSON
+
+    headers = [("Content-Type", content_type), ("Content-Length", str(len(data)))]
+    if status == HTTP_TOO_MANY_REQUESTS:
+        headers.append(("Retry-After", "1"))
+    return status, data, headers
+
+
+def _self_signed_certificate():
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "mock-ksef")])
+    now = _now()
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    der = cert.public_bytes(serialization.Encoding.DER)
+    return base64.b64encode(der).decode(), key
+
+
+def _sha256_b64(data: bytes) -> str:
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+def _build_store(count: int, invoice_bytes: int):
+    store = []
+    today = _now().date()
+
+    for index in range(1, count + 1):
+        seller = f"{1000000000 + index % 97:010d}"
+        net = 100 + index % 900
+        xml = INVOICE_TEMPLATE.format(
+            seller=seller,
+            date=today.isoformat(),
+            index=index,
+            net=f"{net}.00",
+            vat=f"{net * 0.23:.2f}",
+            gross=f"{net * 1.23:.2f}",
+            padding="",
+        )
+        padding = max(invoice_bytes - len(xml), 0)
+        content = xml.replace("</Faktura>", f"<!--{'x' * padding}--></Faktura>")
+        content = content.encode("utf-8")
+        number = _ksef_number(index, seller)
+
+        store.append(
+            {
+                "ksefNumber": number,
+                "content": content,
+                "metadata": {
+                    "ksefNumber": number,
+                    "invoiceNumber": f"FV/{index}",
+                    "seller": {"nip": seller, "name": f"Seller {seller}"},
+                    "buyer": {"identifier": {"type": "Nip", "value": "5260250274"}},
+                    "issueDate": today.isoformat(),
+                    "invoicingDate": _now().isoformat(),
+                    "netAmount": net,
+                    "vatAmount": round(net * 0.23, 2),
+                    "grossAmount": round(net * 1.23, 2),
+                    "currency": "PLN",
+                    "formCode": {"value": "FA"},
+                    "invoiceType": "Vat",
+                    "invoiceHash": base64.b64encode(
+                        hashlib.sha256(content).digest()
+                    ).decode(),
+                    "invoiceSize": len(content),
+                },
+            }
+        )
+    return store
+
+
+def _token(lifetime: datetime.timedelta) -> dict:
+    return {"token": uuid.uuid4().hex, "validUntil": (_now() + lifetime).isoformat()}
+
+
+def _ksef_number(sequence: int, nip: str = "5260250274") -> str:
+    return f"{nip}-{_now():%Y%m%d}-{sequence:012X}-{sequence % 256:02X}"
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--processing-delay", type=float, default=0.0)
+    parser.add_argument("--throttle", type=float, default=0.0, help="429 ratio.")
+    parser.add_argument("--max-page-size", type=int, default=250)
+    parser.add_argument("--stored-invoices", type=int, default=1000)
+    parser.add_argument(
+        "--auth-delay", type=float, default=0.0, help="Seconds until auth completes."
+    )
+    parser.add_argument("--http2", action="store_true", help="Serve h2c (HTTP/2).")
+    parser.add_argument(
+        "--export-part-size",
+        type=int,
+        default=1024 * 1024,
+        help="Plaintext bytes per export package part.",
+    )
+    args = parser.parse_args()
+
+    mock = MockKSeF(
+        args.host,
+        args.port,
+        args.latency,
+        args.processing_delay,
+        args.throttle,
+        args.max_page_size,
+        args.stored_invoices,
+        auth_delay=args.auth_delay,
+        http2=args.http2,
+        export_part_size=args.export_part_size,
+    )
+    print(f"Mock KSeF listening on {mock.base_url}")
+    try:
+        mock.httpd.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
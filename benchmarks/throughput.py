@@ -0,0 +1,297 @@
+"""End-to-end throughput benchmark against the local mock KSeF server.
+
+Runs send, download and search scenarios at several sizes and concurrency
+levels and reports invoices/s with p50/p99 request latency and the number of
+connections the server saw. Results can be saved and compared with a
+previous run. --transports http1 http2 repeats every scenario over HTTP/1.1
+(requests) and multiplexed HTTP/2 (httpx[http2] against the h2c mock).
+
+    python benchmarks/throughput.py --sizes 50 200 --concurrency 1 4 --latency 0.01
+    python benchmarks/throughput.py --scenarios download --concurrency 32 \
+        --transports http1 http2
+    python benchmarks/throughput.py --output after.json --baseline before.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_ksef import MockKSeF  # noqa: E402
+from ksef.client import KSeFClient  # noqa: E402
+from ksef.config import KSeFConfig  # noqa: E402
+from ksef.constants import TRANSPORT_HTTP1, TRANSPORT_HTTP2  # noqa: E402
+from ksef.http_client import HttpClient  # noqa: E402
+from ksef.metrics import endpoint_template  # noqa: E402
+from ksef.transports import Http2Transport  # noqa: E402
+
+INVOICE_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Faktura xmlns="http://crd.gov.pl/wzor/2025/06/25/13775/">'
+    "<Fa><P_2>FV/{index}</P_2>{padding}</Fa></Faktura>"
+)
+
+
+class TimedHttpClient(HttpClient):
+
+    def __init__(self, base_url: str, pool_size: int, transport=None):
+        super().__init__(base_url, pool_size, transport=transport)
+        self.latencies = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _request(self, method, endpoint, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super()._request(method, endpoint, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.latencies[endpoint_template(endpoint)].append(elapsed)
+
+
+def build_clients(
+    mock: MockKSeF, count: int, log_dir: str, rate_limit: int, transport: str
+):
+    http = TimedHttpClient(
+        mock.base_url,
+        pool_size=max(count, 1) * 2,
+        transport=(
+            Http2Transport(prior_knowledge=True)
+            if transport == TRANSPORT_HTTP2
+            else None
+        ),
+    )
+    config = KSeFConfig(
+        nip="5260250274",
+        ksef_token="benchmark",
+        log_file=os.path.join(log_dir, "benchmark.log"),
+        rate_limit=rate_limit,
+        index_db="",
+        log_level_file="WARNING",
+        log_level_console="ERROR",
+    )
+
+    clients = [KSeFClient(config, http) for _ in range(count)]
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        if not all(executor.map(KSeFClient.authenticate, clients)):
+            raise RuntimeError("Authentication against the mock server failed")
+
+    http.latencies.clear()
+    return clients, http
+
+
+def run_parallel(clients, items, work):
+    shards = [items[i :: len(clients)] for i in range(len(clients))]
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        results = list(executor.map(work, clients, shards))
+    return sum(r["successful"] for r in results), sum(r["failed"] for r in results)
+
+
+def scenario_send(clients, size: int, invoice_bytes: int, **_):
+    padding = "<!--" + "x" * max(invoice_bytes - len(INVOICE_XML) - 7, 0) + "-->"
+    invoices = [INVOICE_XML.format(index=i, padding=padding) for i in range(size)]
+    return run_parallel(
+        clients, invoices, lambda client, shard: client.send_multiple_invoices(shard)
+    )
+
+
+def scenario_download(clients, size: int, mock: MockKSeF, workdir: str, **_):
+    numbers = [invoice["ksefNumber"] for invoice in mock.stored[:size]]
+    metadata = {invoice["ksefNumber"]: invoice["metadata"] for invoice in mock.stored}
+    output = tempfile.mkdtemp(dir=workdir)
+    return run_parallel(
+        clients,
+        numbers,
+        lambda client, shard: client.download_multiple_invoices(
+            shard, tempfile.mkdtemp(dir=output), metadata
+        ),
+    )
+
+
+def scenario_search(clients, size: int, mock: MockKSeF, page_size: int, **_):
+    page_size = min(page_size, size)
+    pages = list(range((size + page_size - 1) // page_size))
+
+    def search_pages(client, shard):
+        found = failed = 0
+        for page in shard:
+            results = client.search_invoices(
+                subject_type="Subject2",
+                date_type="Invoicing",
+                date_from="2025-01-01T00:00:00.000+00:00",
+                page_offset=page,
+                page_size=page_size,
+            )
+            if results:
+                found += len(results["invoices"])
+            else:
+                failed += 1
+        return {"successful": found, "failed": failed}
+
+    return run_parallel(clients, pages, search_pages)
+
+
+SCENARIOS = {
+    "send": scenario_send,
+    "download": scenario_download,
+    "search": scenario_search,
+}
+
+
+def run_scenario(name, mock, size, concurrency, args, workdir, transport):
+    connections = mock.connections
+    clients, http = build_clients(
+        mock, concurrency, workdir, args.rate_limit, transport
+    )
+
+    started = time.perf_counter()
+    successful, failed = SCENARIOS[name](
+        clients,
+        size=size,
+        mock=mock,
+        workdir=workdir,
+        invoice_bytes=args.invoice_bytes,
+        page_size=args.page_size,
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(v for values in http.latencies.values() for v in values)
+    http.close()
+    return {
+        "scenario": name,
+        "transport": transport,
+        "size": size,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 4),
+        "successful": successful,
+        "failed": failed,
+        "invoices_per_second": round(successful / elapsed, 2) if elapsed else 0.0,
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "connections": mock.connections - connections,
+    }
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def print_results(results, baseline):
+    previous = {result_key(r): r for r in (baseline or {}).get("results", [])}
+
+    print(
+        f"{'scenario':<10} {'transport':<9} {'size':>6} {'conc':>5} {'inv/s':>10} "
+        f"{'p50 ms':>9} {'p99 ms':>9} {'conns':>6} {'failed':>7}  change"
+    )
+    for r in results:
+        before = previous.get(result_key(r))
+        change = "-"
+        if before and before["invoices_per_second"]:
+            ratio = r["invoices_per_second"] / before["invoices_per_second"] - 1
+            change = f"{ratio:+.1%}"
+
+        print(
+            f"{r['scenario']:<10} {result_key(r)[1]:<9} {r['size']:>6} "
+            f"{r['concurrency']:>5} {r['invoices_per_second']:>10.1f} "
+            f"{r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+            f"{r.get('connections', '-'):>6} {r['failed']:>7}  {change}"
+        )
+
+
+def result_key(result):
+    return (
+        result["scenario"],
+        result.get("transport", TRANSPORT_HTTP1),
+        result["size"],
+        result["concurrency"],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS)
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[50, 200])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4])
+    parser.add_argument(
+        "--transports",
+        nargs="+",
+        default=[TRANSPORT_HTTP1],
+        choices=[TRANSPORT_HTTP1, TRANSPORT_HTTP2],
+    )
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--processing-delay", type=float, default=0.0)
+    parser.add_argument("--throttle", type=float, default=0.0, help="429 ratio.")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--invoice-bytes", type=int, default=4096)
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=100000,
+        help="Client rate limit; keep high to measure client overhead.",
+    )
+    parser.add_argument("--output", help="Save results as JSON.")
+    parser.add_argument("--baseline", help="Compare with a previously saved run.")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = []
+    for transport in args.transports:
+        try:
+            mock = MockKSeF(
+                latency=args.latency,
+                processing_delay=args.processing_delay,
+                throttle=args.throttle,
+                stored_invoices=max(args.sizes),
+                invoice_bytes=args.invoice_bytes,
+                http2=transport == TRANSPORT_HTTP2,
+            )
+        except ImportError:
+            print(f"Skipping {transport}: requires the 'httpx[http2]' package")
+            continue
+
+        with mock, tempfile.TemporaryDirectory() as workdir:
+            for name in args.scenarios:
+                for size in args.sizes:
+                    for concurrency in args.concurrency:
+                        results.append(
+                            run_scenario(
+                                name, mock, size, concurrency, args, workdir, transport
+                            )
+                        )
+
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "settings": {
+                key: value
+                for key, value in vars(args).items()
+                if key not in ("output", "baseline")
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
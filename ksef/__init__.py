@@ -1,5 +1,14 @@
-from ksef.client import KSeFClient
-from ksef.config import KSeFConfig
-
 __version__ = "2.0.0"
 __all__ = ["KSeFClient", "KSeFConfig"]
+
+
+def __getattr__(name: str):
+    if name == "KSeFClient":
+        from ksef.client import KSeFClient
+
+        return KSeFClient
+    if name == "KSeFConfig":
+        from ksef.config import KSeFConfig
+
+        return KSeFConfig
+    raise AttributeError(f"module 'ksef' has no attribute {name!r}")
@@ -1,42 +1,98 @@
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional
+from ksef.certificates import CertificateStore
 from ksef.http_client import HttpClient
 from ksef.encryption import EncryptionManager
 from ksef.logger_service import LoggerService
+from ksef.metrics import MetricsRegistry
 from ksef.constants import (
     ENDPOINT_AUTH_CHALLENGE,
     ENDPOINT_AUTH_KSEF_TOKEN,
     ENDPOINT_AUTH_STATUS,
     ENDPOINT_AUTH_REDEEM,
-    ENDPOINT_PUBLIC_KEYS,
+    ENDPOINT_AUTH_REFRESH,
     HTTP_OK,
     HTTP_ACCEPTED,
     CONTEXT_TYPE_NIP,
     STATUS_ACCEPTED,
-    AUTH_WAIT_SECONDS,
+    STATUS_PROCESSING,
+    AUTH_POLL_INTERVAL,
+    AUTH_POLL_MAX_INTERVAL,
+    AUTH_POLL_TIMEOUT,
+    AUTH_TOKEN_DEFAULT_TTL,
+    AUTH_TOKEN_REFRESH_MARGIN,
     CERT_TYPE_ENCRYPTION,
 )
 
 
 class AuthService:
 
-    def __init__(self, http_client: HttpClient, logger: LoggerService, nip: str):
+    def __init__(
+        self,
+        http_client: HttpClient,
+        logger: LoggerService,
+        nip: str,
+        metrics: Optional[MetricsRegistry] = None,
+        certificates: Optional[CertificateStore] = None,
+    ):
         self.http = http_client
         self.logger = logger
         self.nip = nip
+        self.metrics = metrics
+        self.certificates = certificates or CertificateStore(http_client, logger)
         self.authentication_token: Optional[str] = None
         self.access_token: Optional[str] = None
         self.refresh_token: Optional[str] = None
+        self.access_valid_until = 0.0
+        self.refresh_valid_until = 0.0
+
+    def is_valid(self, margin: float = AUTH_TOKEN_REFRESH_MARGIN) -> bool:
+        return bool(self.access_token) and (
+            time.monotonic() + margin < self.access_valid_until
+        )
+
+    def can_refresh(self, margin: float = AUTH_TOKEN_REFRESH_MARGIN) -> bool:
+        return bool(self.refresh_token) and (
+            time.monotonic() + margin < self.refresh_valid_until
+        )
+
+    def expire(self):
+        self.access_valid_until = 0.0
+
+    def on_unauthorized(self, token: str):
+        if token and token == self.access_token:
+            self.expire()
+
+    def invalidate(self):
+        self.access_token = None
+        self.refresh_token = None
+        self.access_valid_until = 0.0
+        self.refresh_valid_until = 0.0
+
+    def refresh(self) -> bool:
+        response = self.http.post_json(ENDPOINT_AUTH_REFRESH, {}, self.refresh_token)
+
+        if response.status_code != HTTP_OK:
+            self.logger.warning("Token refresh failed: %s", response.status_code)
+            self.refresh_valid_until = 0.0
+            return False
+
+        access = response.json().get("accessToken", {})
+        self.access_token = access.get("token")
+        self.access_valid_until = _valid_until(access)
+        self.logger.info("Access token refreshed")
+        return bool(self.access_token)
 
     def authenticate(self, ksef_token: str) -> bool:
         self.logger.info("Starting authentication...")
 
-        challenge_data = self._get_challenge()
-        if not challenge_data:
-            return False
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            public_key_future = executor.submit(self._get_public_key)
+            challenge_data = self._get_challenge()
+            public_key = public_key_future.result()
 
-        public_key = self._get_public_key()
-        if not public_key:
+        if not challenge_data or not public_key:
             return False
 
         encrypted_token = self._encrypt_token(
@@ -68,18 +124,17 @@ class AuthService:
             self.logger.info("Challenge received")
             return response.json()
 
-        self.logger.error(f"Challenge failed: {response.status_code}")
+        self.logger.error("Challenge failed: %s", response.status_code)
         return None
 
     def _get_public_key(self) -> Optional[str]:
-        response = self.http.get_json(ENDPOINT_PUBLIC_KEYS)
+        certificates = self.certificates.get()
 
-        if response.status_code != HTTP_OK:
-            self.logger.error(f"Failed to get public key: {response.status_code}")
+        if certificates is None:
+            self.logger.error("Failed to get public key")
             return None
 
-        data = response.json()
-        return self._extract_encryption_cert(data)
+        return self._extract_encryption_cert(certificates)
 
     def _extract_encryption_cert(self, certificates: list) -> Optional[str]:
         for cert in certificates:
@@ -98,11 +153,17 @@ class AuthService:
         self, token: str, timestamp: str, public_key: str
     ) -> Optional[str]:
         self.logger.info("Encrypting token...")
+        started = time.perf_counter()
         try:
             return EncryptionManager.encrypt_token(token, timestamp, public_key)
         except Exception as e:
-            self.logger.error(f"Token encryption failed: {e}")
+            self.logger.error("Token encryption failed: %s", e)
             return None
+        finally:
+            if self.metrics:
+                self.metrics.histogram(
+                    "ksef_encryption_duration_seconds", "Encryption time."
+                ).observe(time.perf_counter() - started, operation="token")
 
     def _request_authentication(self, challenge: str, encrypted_token: str) -> bool:
         payload = {
@@ -114,14 +175,14 @@ class AuthService:
         response = self.http.post_json(ENDPOINT_AUTH_KSEF_TOKEN, payload)
 
         if response.status_code != HTTP_ACCEPTED:
-            self.logger.error(f"Authentication failed: {response.status_code}")
+            self.logger.error("Authentication failed: %s", response.status_code)
             return False
 
         data = response.json()
         self.authentication_token = data.get("authenticationToken", {}).get("token")
         auth_reference = data.get("referenceNumber")
 
-        self.logger.info(f"Authentication token received: {auth_reference}")
+        self.logger.info("Authentication token received: %s", auth_reference)
         self._store_auth_reference(auth_reference)
         return True
 
@@ -129,16 +190,27 @@ class AuthService:
         self.auth_reference = reference
 
     def _wait_for_completion(self) -> bool:
-        time.sleep(AUTH_WAIT_SECONDS)
-
         endpoint = ENDPOINT_AUTH_STATUS.format(reference=self.auth_reference)
-        response = self.http.get_json(endpoint, self.authentication_token)
+        deadline = time.monotonic() + AUTH_POLL_TIMEOUT
+        interval = AUTH_POLL_INTERVAL
 
-        if response.status_code != HTTP_OK:
-            self.logger.error(f"Failed to get auth status: {response.status_code}")
-            return False
+        while True:
+            time.sleep(interval)
+            response = self.http.get_json(endpoint, self.authentication_token)
 
-        return self._check_auth_status(response.json())
+            if response.status_code != HTTP_OK:
+                self.logger.error("Failed to get auth status: %s", response.status_code)
+                return False
+
+            data = response.json()
+            status = data.get("status", {})
+            if not isinstance(status, dict) or status.get("code") != STATUS_PROCESSING:
+                return self._check_auth_status(data)
+
+            if time.monotonic() >= deadline:
+                self.logger.error("Authentication timed out")
+                return False
+            interval = min(interval * 2, AUTH_POLL_MAX_INTERVAL)
 
     def _check_auth_status(self, data: Dict) -> bool:
         status = data.get("status", {})
@@ -148,7 +220,7 @@ class AuthService:
             self.logger.info("Authentication completed")
             return True
 
-        self.logger.error(f"Authentication status: {status}")
+        self.logger.error("Authentication status: %s", status)
         return False
 
     def _redeem_token(self) -> bool:
@@ -157,7 +229,7 @@ class AuthService:
         )
 
         if response.status_code != HTTP_OK:
-            self.logger.error(f"Token redeem failed: {response.status_code}")
+            self.logger.error("Token redeem failed: %s", response.status_code)
             return False
 
         self._extract_tokens(response.json())
@@ -165,5 +237,20 @@ class AuthService:
         return True
 
     def _extract_tokens(self, data: Dict):
-        self.access_token = data.get("accessToken", {}).get("token")
-        self.refresh_token = data.get("refreshToken", {}).get("token")
+        access = data.get("accessToken", {})
+        refresh = data.get("refreshToken", {})
+        self.access_token = access.get("token")
+        self.refresh_token = refresh.get("token")
+        self.access_valid_until = _valid_until(access)
+        self.refresh_valid_until = _valid_until(refresh)
+
+
+def _valid_until(token: Dict) -> float:
+    valid_until = token.get("validUntil")
+    if not valid_until:
+        return time.monotonic() + AUTH_TOKEN_DEFAULT_TTL
+
+    from dateutil import parser
+
+    expires = parser.isoparse(valid_until).timestamp()
+    return time.monotonic() + expires - time.time()
@@ -0,0 +1,53 @@
+import threading
+import time
+from typing import Dict, List, Optional
+from ksef.http_client import HttpClient
+from ksef.logger_service import LoggerService
+from ksef.constants import CERTIFICATE_CACHE_TTL, ENDPOINT_PUBLIC_KEYS, HTTP_OK
+
+
+class CertificateStore:
+
+    def __init__(
+        self,
+        http_client: HttpClient,
+        logger: Optional[LoggerService] = None,
+        ttl: float = CERTIFICATE_CACHE_TTL,
+    ):
+        self.http = http_client
+        self.logger = logger
+        self.ttl = ttl
+        self._certificates: Optional[List[Dict]] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[List[Dict]]:
+        with self._lock:
+            if (
+                self._certificates is not None
+                and time.monotonic() - self._fetched_at < self.ttl
+            ):
+                return self._certificates
+
+            response = self.http.get_json(ENDPOINT_PUBLIC_KEYS)
+            if response.status_code != HTTP_OK:
+                return None
+
+            self._certificates = response.json()
+            self._fetched_at = time.monotonic()
+            return self._certificates
+
+    def find(self, usage: str) -> Optional[str]:
+        certificates = self.get()
+        if not certificates:
+            return None
+
+        for cert in certificates:
+            if usage in cert.get("usage", []):
+                if self.logger:
+                    self.logger.info("%s certificate found", usage)
+                return cert.get("certificate")
+
+        if self.logger:
+            self.logger.warning("No %s certificate, using the first one", usage)
+        return certificates[0].get("certificate")
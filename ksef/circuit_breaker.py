@@ -0,0 +1,133 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+from ksef.constants import (
+    BREAKER_CLOSED,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_HALF_OPEN,
+    BREAKER_HALF_OPEN_PROBES,
+    BREAKER_MAX_RESET_TIMEOUT,
+    BREAKER_OPEN,
+    BREAKER_RESET_TIMEOUT,
+    BREAKER_STATE_VALUES,
+)
+from ksef.metrics import MetricsRegistry
+
+
+class CircuitBreaker:
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+        max_reset_timeout: float = BREAKER_MAX_RESET_TIMEOUT,
+        metrics: Optional[MetricsRegistry] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = max(half_open_probes, 1)
+        self.max_reset_timeout = max(max_reset_timeout, reset_timeout)
+        self.metrics = metrics
+        self.clock = clock
+
+        self.state = BREAKER_CLOSED
+        self._failures = 0
+        self._timeout = reset_timeout
+        self._opened_at = 0.0
+        self._probes = 0
+        self._successes = 0
+        self._opens = 0
+        self._lock = threading.Lock()
+        self._publish_state()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == BREAKER_CLOSED:
+                return True
+
+            if self.state == BREAKER_OPEN:
+                if self.clock() - self._opened_at < self._timeout:
+                    return False
+                self._transition(BREAKER_HALF_OPEN)
+
+            if self._probes >= self.half_open_probes:
+                return False
+            self._probes += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self.state != BREAKER_HALF_OPEN:
+                return
+
+            self._probes = max(self._probes - 1, 0)
+            self._successes += 1
+            if self._successes >= self.half_open_probes:
+                self._timeout = self.reset_timeout
+                self._transition(BREAKER_CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+
+            if self.state == BREAKER_HALF_OPEN:
+                self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+                self._transition(BREAKER_OPEN)
+            elif (
+                self.state == BREAKER_CLOSED
+                and self._failures >= self.failure_threshold
+            ):
+                self._transition(BREAKER_OPEN)
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return (
+                self.state == BREAKER_OPEN
+                and self.clock() - self._opened_at < self._timeout
+            )
+
+    @property
+    def degraded(self) -> bool:
+        with self._lock:
+            return self.state != BREAKER_CLOSED or self._failures > 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == BREAKER_OPEN:
+                retry_in = max(self._timeout - (self.clock() - self._opened_at), 0.0)
+            return {
+                "state": self.state,
+                "consecutiveFailures": self._failures,
+                "opens": self._opens,
+                "retryIn": round(retry_in, 3),
+            }
+
+    def _transition(self, state: str):
+        self.state = state
+        self._probes = 0
+        self._successes = 0
+
+        if state == BREAKER_OPEN:
+            self._opened_at = self.clock()
+            self._opens += 1
+        elif state == BREAKER_CLOSED:
+            self._failures = 0
+
+        if self.metrics:
+            self.metrics.counter(
+                "ksef_circuit_breaker_transitions_total",
+                "Circuit breaker state changes.",
+            ).inc(state=state)
+        self._publish_state()
+
+    def _publish_state(self):
+        if self.metrics:
+            self.metrics.gauge(
+                "ksef_circuit_breaker_state",
+                "Circuit breaker state (0 closed, 1 half-open, 2 open).",
+            ).set(BREAKER_STATE_VALUES[self.state])
@@ -1,44 +1,218 @@
-from typing import Dict, Optional, List
+import itertools
+import os
+import random
+import threading
+import time
+from functools import cached_property
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Optional,
+    List,
+    Iterable,
+    Iterator,
+    Sized,
+    Tuple,
+    Union,
+)
 from pathlib import Path
 
 from ksef.config import KSeFConfig
-from ksef.http_client import HttpClient
-from ksef.logger_service import LoggerService
-from ksef.rate_limiter import RateLimiter
-from ksef.encryption import EncryptionManager
-from ksef.auth_service import AuthService
-from ksef.session_service import SessionService
-from ksef.invoice_service import InvoiceService
+from ksef.utils import InvoiceFile
 from ksef.constants import (
     EXTENDED_MAX_ATTEMPTS,
     EXTENDED_DELAY_SECONDS,
     DEFAULT_DOWNLOAD_DIR,
+    EXPORT_PART_WORKERS,
+    OFFLINE_DRAIN_INITIAL_BATCH,
+    OFFLINE_DRAIN_MAX_BATCH,
+    OFFLINE_DRAIN_PAUSE_SECONDS,
+    PRIORITY_BULK_SEND,
+    PRIORITY_DOWNLOAD,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_POLL,
+    PRIORITY_SEARCH,
 )
 
+if TYPE_CHECKING:
+    from ksef.http_client import HttpClient
+    from ksef.offline_spool import OfflineSpool
+    from ksef.output_sinks import OutputSink
+    from ksef.metadata_frame import MetadataFrame
+    from ksef.records import InvoiceMetadata, StatusEntry
+    from ksef.result_sinks import ResultSink
+    from ksef.timeline import InvoiceTimeline
+
+
+class _locked_cached_property(cached_property):
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        with instance._services_lock:
+            return super().__get__(instance, owner)
+
 
 class KSeFClient:
 
-    def __init__(self, config: KSeFConfig):
+    def __init__(self, config: KSeFConfig, http: Optional["HttpClient"] = None):
+        self._services_lock = threading.RLock()
+        self._session_lock = threading.RLock()
         self.config = config
-        self._setup_services()
+        self.created_at = time.monotonic()
+        self.first_send_at: Optional[float] = None
+        if http is not None:
+            self.http = http
+
+    @_locked_cached_property
+    def http(self) -> "HttpClient":
+        from ksef.http_client import HttpClient
+        from ksef.transports import create_transport
+
+        return HttpClient(
+            self.config.base_url,
+            metrics=self.metrics,
+            breaker=self.breaker,
+            transport=create_transport(self.config.http2, logger=self.logger),
+        )
+
+    @_locked_cached_property
+    def breaker(self):
+        if self.config.breaker_threshold <= 0:
+            return None
+
+        from ksef.circuit_breaker import CircuitBreaker
+
+        return CircuitBreaker(
+            self.config.breaker_threshold,
+            self.config.breaker_reset_timeout,
+            metrics=self.metrics,
+        )
+
+    @_locked_cached_property
+    def offline_spool(self) -> Optional["OfflineSpool"]:
+        if not self.config.offline_spool_dir:
+            return None
+
+        from ksef.offline_spool import OfflineSpool
 
-    def _setup_services(self):
-        self.http = HttpClient(self.config.base_url)
-        self.logger = LoggerService(
+        directory = os.path.join(
+            self.config.offline_spool_dir,
+            self.config.environment,
+            self.config.nip or "unknown",
+        )
+        return OfflineSpool(directory, self.metrics)
+
+    @_locked_cached_property
+    def metrics(self):
+        if not (self.config.metrics_file or self.config.metrics_port):
+            return None
+
+        from ksef.metrics import MetricsRegistry
+
+        return MetricsRegistry()
+
+    @_locked_cached_property
+    def logger(self):
+        from ksef.logger_service import LoggerService
+
+        return LoggerService(
             "KSeFClient",
             self.config.log_file,
             self.config.log_level_file,
             self.config.log_level_console,
+            self.config.log_format,
+            self.config.log_async,
+            self.config.log_max_bytes,
+            self.config.log_backup_count,
+        )
+
+    @_locked_cached_property
+    def rate_limiter(self):
+        from ksef.rate_limiter import RateLimiter
+
+        return RateLimiter(self.config.rate_limit, self.metrics)
+
+    @_locked_cached_property
+    def encryption(self):
+        from ksef.encryption import EncryptionManager
+
+        return EncryptionManager()
+
+    @_locked_cached_property
+    def certificates(self):
+        from ksef.certificates import CertificateStore
+
+        return CertificateStore(self.http, self.logger)
+
+    @_locked_cached_property
+    def auth_service(self):
+        from ksef.auth_service import AuthService
+
+        service = AuthService(
+            self.http, self.logger, self.config.nip, self.metrics, self.certificates
         )
-        self.rate_limiter = RateLimiter(self.config.rate_limit)
-        self.encryption = EncryptionManager()
+        self.http.add_unauthorized_listener(service.on_unauthorized)
+        return service
 
-        self.auth_service = AuthService(self.http, self.logger, self.config.nip)
-        self.session_service = SessionService(self.http, self.encryption, self.logger)
-        self.invoice_service = InvoiceService(
-            self.http, self.encryption, self.logger, self.rate_limiter, self.config
+    @_locked_cached_property
+    def session_service(self):
+        from ksef.session_service import SessionService
+
+        return SessionService(
+            self.http, self.encryption, self.logger, self.metrics, self.certificates
+        )
+
+    @_locked_cached_property
+    def export_service(self):
+        from ksef.export_service import ExportService
+
+        return ExportService(self.http, self.logger, self.certificates, self.scheduler)
+
+    @_locked_cached_property
+    def invoice_service(self):
+        from ksef.invoice_service import InvoiceService
+
+        return InvoiceService(
+            self.http,
+            self.encryption,
+            self.logger,
+            self.rate_limiter,
+            self.config,
+            self._build_cache(),
+            self.metrics,
+            self.scheduler,
+            self.poll_estimator,
+        )
+
+    @_locked_cached_property
+    def poll_estimator(self):
+        if not self.config.adaptive_poll:
+            return None
+
+        from ksef.poll_estimator import ProcessingTimeEstimator
+
+        return ProcessingTimeEstimator(
+            self.config.poll_stats_file, self.config.environment
+        )
+
+    @_locked_cached_property
+    def scheduler(self):
+        from ksef.scheduler import PriorityScheduler
+
+        return PriorityScheduler(
+            self.rate_limiter, self.config.scheduler_mode, metrics=self.metrics
         )
 
+    @_locked_cached_property
+    def metadata_index(self):
+        if not self.config.index_db:
+            return None
+
+        from ksef.metadata_index import MetadataIndex
+
+        return MetadataIndex(self.config.index_db)
+
     @property
     def access_token(self) -> Optional[str]:
         return self.auth_service.access_token
@@ -50,19 +224,47 @@ class KSeFClient:
     def authenticate(self) -> bool:
         return self.auth_service.authenticate(self.config.ksef_token)
 
+    def invalidate_token(self):
+        self.auth_service.invalidate()
+
     def initialize_session(self) -> bool:
         return self.session_service.initialize_session(self.access_token)
 
     def terminate_session(self) -> bool:
         return self.session_service.terminate_session(self.access_token)
 
-    def send_invoice_to_session(self, invoice_xml: str) -> Optional[str]:
-        return self.invoice_service.send_invoice(
-            self.session_reference, self.access_token, invoice_xml
+    def send_invoice_to_session(
+        self,
+        invoice_xml: str,
+        timeline: Optional["InvoiceTimeline"] = None,
+        priority: str = PRIORITY_INTERACTIVE,
+        deadline: Optional[float] = None,
+    ) -> Optional[str]:
+        reference = self.invoice_service.send_invoice(
+            self.session_reference,
+            self.access_token,
+            invoice_xml,
+            timeline,
+            priority,
+            deadline,
         )
+        if reference and self.first_send_at is None:
+            self.first_send_at = time.monotonic()
+        return reference
+
+    def time_to_first_send(self) -> Optional[float]:
+        if self.first_send_at is None:
+            return None
+        return self.first_send_at - self.created_at
 
     def poll_invoice_status(
-        self, reference_number: str, max_attempts: int = 30, delay_sec: int = 1
+        self,
+        reference_number: str,
+        max_attempts: int = 30,
+        delay_sec: int = 1,
+        timeline: Optional["InvoiceTimeline"] = None,
+        priority: str = PRIORITY_POLL,
+        deadline: Optional[float] = None,
     ) -> Optional[Dict]:
         return self.invoice_service.poll_status(
             self.session_reference,
@@ -70,65 +272,385 @@ class KSeFClient:
             reference_number,
             max_attempts,
             delay_sec,
+            timeline,
+            priority,
+            deadline,
+        )
+
+    def poll_invoice_statuses(
+        self,
+        timelines: Dict[str, "InvoiceTimeline"],
+        max_attempts: int = 30,
+        delay_sec: int = 1,
+        priority: str = PRIORITY_POLL,
+        deadline: Optional[float] = None,
+    ) -> Iterator[Tuple[str, Optional[Dict]]]:
+        return self.invoice_service.poll_statuses(
+            self.session_reference,
+            self.access_token,
+            timelines,
+            max_attempts,
+            delay_sec,
+            priority,
+            deadline,
+        )
+
+    def get_invoice_xml(
+        self,
+        ksef_number: str,
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
+    ) -> Optional[str]:
+        return self.invoice_service.get_invoice_xml(
+            ksef_number, self.access_token, priority, deadline
+        )
+
+    def get_invoice_metadata(
+        self,
+        ksef_number: str,
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
+    ) -> Optional[Dict]:
+        return self.invoice_service.get_metadata(
+            ksef_number, self.access_token, priority, deadline
+        )
+
+    def cache_stats(self) -> Optional[Dict]:
+        return self.invoice_service.cache_stats()
+
+    def save_poll_estimate(self):
+        if not self.poll_estimator:
+            return
+
+        try:
+            self.poll_estimator.save()
+        except OSError as e:
+            self.logger.warning("Failed to save poll statistics: %s", e)
+
+    def resilience_stats(self) -> Dict:
+        breaker = self.http.breaker
+        return {
+            "breaker": breaker.stats() if breaker else None,
+            "offlineSpool": self.offline_spool.depth if self.offline_spool else None,
+        }
+
+    def is_outage(self, error: Optional[Exception] = None) -> bool:
+        if error is not None:
+            from ksef.http_client import request_not_sent
+
+            return request_not_sent(error)
+
+        breaker = self.http.breaker
+        return breaker is not None and breaker.degraded
+
+    def search_invoices(
+        self,
+        priority: str = PRIORITY_SEARCH,
+        deadline: Optional[float] = None,
+        **params,
+    ) -> Optional[Dict]:
+        results = self.invoice_service.search_invoices(
+            self.access_token, priority, deadline, **params
         )
 
-    def get_invoice_xml(self, ksef_number: str) -> Optional[str]:
-        return self.invoice_service.get_invoice_xml(ksef_number, self.access_token)
+        if results and self.metadata_index:
+            self._index_search_results(results)
+
+        return results
+
+    def iter_search(
+        self,
+        priority: str = PRIORITY_SEARCH,
+        deadline: Optional[float] = None,
+        **params,
+    ) -> Iterator["InvoiceMetadata"]:
+        from ksef.records import InvoiceMetadata
 
-    def get_invoice_metadata(self, ksef_number: str) -> Optional[Dict]:
-        return self.invoice_service.get_metadata(ksef_number, self.access_token)
+        for page in self.invoice_service.iter_search_pages(
+            self.access_token, priority, deadline, **params
+        ):
+            if self.metadata_index:
+                self._index_search_results(page)
+            for invoice in page.get("invoices", []):
+                yield InvoiceMetadata.from_api(invoice)
 
-    def search_invoices(self, **params) -> Optional[Dict]:
-        return self.invoice_service.search_invoices(self.access_token, **params)
+    def search_frame(
+        self,
+        priority: str = PRIORITY_SEARCH,
+        deadline: Optional[float] = None,
+        **params,
+    ) -> "MetadataFrame":
+        from ksef.metadata_frame import MetadataFrame
 
-    def download_invoice_to_file(self, ksef_number: str, output_path: str) -> bool:
-        invoice_xml = self.get_invoice_xml(ksef_number)
+        return MetadataFrame.from_records(
+            self.iter_search(priority, deadline, **params)
+        )
+
+    def session_statuses(self) -> Optional[List["StatusEntry"]]:
+        return self.invoice_service.list_session_statuses(
+            self.session_reference, self.access_token
+        )
+
+    def query_index(self, **filters) -> List[Dict]:
+        if not self.metadata_index:
+            return []
+        return self.metadata_index.query(**filters)
+
+    def download_invoice_to_file(
+        self,
+        ksef_number: str,
+        output_path: str,
+        priority: str = PRIORITY_INTERACTIVE,
+        deadline: Optional[float] = None,
+    ) -> bool:
+        invoice_xml = self.get_invoice_xml(ksef_number, priority, deadline)
 
         if not invoice_xml:
             return False
 
         return self._save_to_file(invoice_xml, output_path)
 
+    def export_invoices(
+        self,
+        output_dir: str = DEFAULT_DOWNLOAD_DIR,
+        sink: Optional["OutputSink"] = None,
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
+        result_sink: Optional["ResultSink"] = None,
+        workers: int = EXPORT_PART_WORKERS,
+        **params,
+    ) -> Optional[Dict]:
+        import tempfile
+
+        started = self.export_service.start(
+            self.access_token, priority, deadline, **params
+        )
+        if not started:
+            return None
+        reference, encryption = started
+
+        package = self.export_service.wait(self.access_token, reference, deadline)
+        if package is None:
+            return None
+
+        if package.get("isTruncated"):
+            self.logger.warning(
+                "Export truncated by KSeF, narrow the date range to get the rest"
+            )
+
+        with tempfile.TemporaryDirectory() as workdir:
+            archive = os.path.join(workdir, f"{reference}.zip")
+            if package.get("parts") and not self.export_service.download_package(
+                package, encryption, archive, workers
+            ):
+                return None
+
+            if sink is None:
+                from ksef.output_sinks import DirectorySink
+
+                with DirectorySink(output_dir, self.config.download_layout) as own:
+                    results = self._unpack_export(archive, package, own, result_sink)
+            else:
+                results = self._unpack_export(archive, package, sink, result_sink)
+
+        results["reference"] = reference
+        results["truncated"] = bool(package.get("isTruncated"))
+        return self._detach_result_sink(results, result_sink)
+
     def download_multiple_invoices(
-        self, ksef_numbers: List[str], output_dir: str = DEFAULT_DOWNLOAD_DIR
+        self,
+        ksef_numbers: List[str],
+        output_dir: str = DEFAULT_DOWNLOAD_DIR,
+        metadata: Optional[Dict[str, Union[Dict, "InvoiceMetadata"]]] = None,
+        sink: Optional["OutputSink"] = None,
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
+        result_sink: Optional["ResultSink"] = None,
     ) -> Dict:
-        results = self._init_download_results(len(ksef_numbers))
-
-        self.logger.info(f"Downloading {len(ksef_numbers)} invoices...")
+        if sink is None:
+            from ksef.output_sinks import DirectorySink
 
-        for i, ksef_number in enumerate(ksef_numbers, 1):
-            self._download_single(
-                ksef_number, output_dir, i, len(ksef_numbers), results
+            with DirectorySink(output_dir, self.config.download_layout) as own_sink:
+                results = self._download_to_sink(
+                    ksef_numbers, own_sink, metadata, priority, deadline, result_sink
+                )
+        else:
+            results = self._download_to_sink(
+                ksef_numbers, sink, metadata, priority, deadline, result_sink
             )
 
-        self.logger.info(
-            f"Download complete: {results['successful']}/{results['total']} successful"
+        return self._detach_result_sink(results, result_sink)
+
+    def ensure_authenticated(self) -> bool:
+        return self._ensure_authenticated()
+
+    def ensure_session(self) -> bool:
+        return self._ensure_authenticated_session()
+
+    def send_single_invoice(
+        self,
+        invoice_xml: str,
+        priority: str = PRIORITY_INTERACTIVE,
+        deadline: Optional[float] = None,
+    ) -> Optional[Dict]:
+        if not self._ensure_online_session():
+            return self._spool_if_outage(invoice_xml)
+
+        return self._send_and_poll(invoice_xml, priority, deadline)
+
+    def send_multiple_invoices(
+        self,
+        invoices: Iterable[Union[str, InvoiceFile]],
+        keep_session: bool = False,
+        priority: str = PRIORITY_BULK_SEND,
+        deadline: Optional[float] = None,
+        result_sink: Optional["ResultSink"] = None,
+    ) -> Dict:
+        results = self._send_batch(
+            invoices,
+            keep_session,
+            priority,
+            deadline,
+            self.offline_spool is not None,
+            result_sink,
         )
-        return results
+        return self._detach_result_sink(results, result_sink)
 
-    def send_single_invoice(self, invoice_xml: str) -> Optional[Dict]:
-        if not self._ensure_authenticated():
-            return None
+    def drain_offline_spool(
+        self, limit: Optional[int] = None, keep_session: bool = False
+    ) -> Dict:
+        summary = {
+            "drained": 0,
+            "successful": 0,
+            "failed": 0,
+            "retrying": 0,
+            "quarantined": 0,
+            "remaining": 0,
+        }
+        spool = self.offline_spool
+        if spool is None:
+            return summary
 
-        if not self._ensure_session():
-            return None
+        with spool.drain_lock() as locked:
+            if locked:
+                self._drain_spool(spool, summary, limit, keep_session)
+            else:
+                self.logger.warning("Offline spool is already being drained")
 
-        return self._send_and_poll(invoice_xml)
+        summary["remaining"] = spool.depth
+        self.logger.info(
+            "Spool drain: %s/%s successful, %s remaining",
+            summary["successful"],
+            summary["drained"],
+            summary["remaining"],
+        )
+        return summary
 
-    def send_multiple_invoices(self, invoices: List[str]) -> Dict:
-        results = self._init_send_results(len(invoices))
+    def _send_batch(
+        self,
+        invoices: Iterable[Union[str, InvoiceFile]],
+        keep_session: bool,
+        priority: str,
+        deadline: Optional[float],
+        spool: bool,
+        result_sink: Optional["ResultSink"] = None,
+    ) -> Dict:
+        results = self._init_send_results(
+            len(invoices) if isinstance(invoices, Sized) else 0, result_sink
+        )
 
         try:
-            if not self._ensure_authenticated():
+            if not self._ensure_online_session():
+                if self.is_outage():
+                    self._defer_all(invoices, results, spool)
                 return results
 
-            if not self._ensure_session():
-                return results
+            return self._process_multiple_invoices(
+                invoices, results, priority, deadline, spool
+            )
+
+        finally:
+            if not keep_session:
+                self.terminate_session()
+
+    def _drain_spool(
+        self,
+        spool: "OfflineSpool",
+        summary: Dict,
+        limit: Optional[int],
+        keep_session: bool,
+    ):
+        batch = OFFLINE_DRAIN_INITIAL_BATCH
+        first = True
+
+        try:
+            while not self._circuit_open():
+                size = (
+                    batch if limit is None else min(batch, limit - summary["drained"])
+                )
+                entries = spool.peek(size) if size > 0 else []
+                if not entries:
+                    break
 
-            return self._process_multiple_invoices(invoices, results)
+                if not first:
+                    time.sleep(OFFLINE_DRAIN_PAUSE_SECONDS * random.uniform(0.5, 1.5))
+                first = False
 
+                self.logger.info(
+                    "Draining %s of %s spooled invoices...", len(entries), spool.depth
+                )
+                invoices = [
+                    InvoiceFile(entry.path, 0, spool.load(entry)) for entry in entries
+                ]
+                results = self._send_batch(
+                    invoices, True, PRIORITY_BULK_SEND, None, spool=False
+                )
+
+                if self._complete_drained(spool, entries, results, summary):
+                    self.logger.warning("KSeF still unavailable, drain paused")
+                    break
+                batch = min(batch * 2, OFFLINE_DRAIN_MAX_BATCH)
         finally:
-            self.terminate_session()
+            if not keep_session:
+                self.terminate_session()
+
+    @staticmethod
+    def _complete_drained(
+        spool: "OfflineSpool", entries: List, results: Dict, summary: Dict
+    ) -> int:
+        handled = 0
+        for record in results["results"]:
+            status = record["status"]
+            if status == "deferred":
+                continue
+
+            entry = entries[record["index"] - 1]
+            record = {k: v for k, v in record.items() if k not in ("path", "size")}
+            handled += 1
+
+            if status in ("accepted", "rejected"):
+                spool.complete(entry, {**record, **entry.source})
+                summary["drained"] += 1
+                summary["successful" if status == "accepted" else "failed"] += 1
+            elif spool.fail(entry, {**record, **entry.source}):
+                summary["quarantined"] += 1
+            else:
+                summary["retrying"] += 1
+
+        return len(entries) - handled
+
+    def _build_cache(self):
+        if not self.config.cache_enabled:
+            return None
+
+        from ksef.invoice_cache import InvoiceCache
+
+        return InvoiceCache(
+            self.config.cache_max_entries,
+            self.config.cache_max_bytes,
+            self.config.cache_ttl,
+            self.config.cache_dir or None,
+        )
 
     def _save_to_file(self, content: str, output_path: str) -> bool:
         try:
@@ -138,42 +660,278 @@ class KSeFClient:
             with open(output_path, "w", encoding="utf-8") as f:
                 f.write(content)
 
-            self.logger.info(f"Invoice saved to: {output_path}")
+            self.logger.info("Invoice saved to: %s", output_path)
             return True
         except Exception as e:
-            self.logger.error(f"Failed to save file: {e}", exc_info=True)
+            self.logger.error("Failed to save file: %s", e, exc_info=True)
             return False
 
+    def _index_search_results(self, results: Dict):
+        try:
+            count = self.metadata_index.add_invoices(results.get("invoices", []))
+            self.logger.debug("Indexed %s invoices", count)
+        except Exception as e:
+            self.logger.warning("Failed to index search results: %s", e)
+
+    def _mark_downloaded(self, ksef_number: str, location: str):
+        try:
+            self.metadata_index.mark_downloaded(ksef_number, location)
+        except Exception as e:
+            self.logger.warning("Failed to mark %s as downloaded: %s", ksef_number, e)
+
+    @staticmethod
+    def _init_download_results(
+        total: int, result_sink: Optional["ResultSink"] = None
+    ) -> Dict:
+        return {
+            "total": total,
+            "successful": 0,
+            "failed": 0,
+            "skipped": 0,
+            "results": [] if result_sink is None else result_sink,
+        }
+
     @staticmethod
-    def _init_download_results(total: int) -> Dict:
-        return {"total": total, "successful": 0, "failed": 0, "results": []}
+    def _detach_result_sink(results: Dict, result_sink: Optional["ResultSink"]) -> Dict:
+        if result_sink is not None:
+            del results["results"]
+        return results
+
+    def _download_to_sink(
+        self,
+        ksef_numbers: List[str],
+        sink: "OutputSink",
+        metadata: Optional[Dict[str, Union[Dict, "InvoiceMetadata"]]],
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
+        result_sink: Optional["ResultSink"] = None,
+    ) -> Dict:
+        results = self._init_download_results(len(ksef_numbers), result_sink)
+
+        removed = sink.cleanup_partials()
+        if removed:
+            self.logger.info("Removed %s interrupted partial downloads", removed)
+
+        self.logger.info("Downloading %s invoices...", len(ksef_numbers))
+
+        for i, ksef_number in enumerate(ksef_numbers, 1):
+            invoice_metadata = self._lookup_metadata(ksef_number, metadata)
+            self._download_single(
+                ksef_number,
+                sink,
+                invoice_metadata,
+                i,
+                len(ksef_numbers),
+                results,
+                priority,
+                deadline,
+            )
+
+        self.logger.info(
+            "Download complete: %s/%s successful, %s already present",
+            results["successful"],
+            results["total"],
+            results["skipped"],
+        )
+        return results
+
+    def _unpack_export(
+        self,
+        archive: str,
+        package: Dict,
+        sink: "OutputSink",
+        result_sink: Optional["ResultSink"],
+    ) -> Dict:
+        results = self._init_download_results(
+            package.get("invoiceCount", 0), result_sink
+        )
+        if not package.get("parts"):
+            return results
+
+        removed = sink.cleanup_partials()
+        if removed:
+            self.logger.info("Removed %s interrupted partial downloads", removed)
+
+        metadata = self.export_service.read_metadata(archive)
+        if metadata and self.metadata_index:
+            self._index_search_results({"invoices": list(metadata.values())})
+
+        for ksef_number, content in self.export_service.iter_invoices(archive):
+            invoice_metadata = self._lookup_metadata(ksef_number, metadata)
+            self._store_invoice(sink, ksef_number, content, invoice_metadata, results)
+
+        self.logger.info(
+            "Export unpacked: %s/%s saved", results["successful"], results["total"]
+        )
+        return results
+
+    def _lookup_metadata(
+        self,
+        ksef_number: str,
+        metadata: Optional[Dict[str, Union[Dict, "InvoiceMetadata"]]],
+    ) -> Dict:
+        if metadata and ksef_number in metadata:
+            record = metadata[ksef_number]
+            return record if isinstance(record, dict) else record.to_dict()
+        if self.metadata_index:
+            try:
+                return self.metadata_index.get(ksef_number) or {}
+            except Exception as e:
+                self.logger.warning("Failed to read %s from index: %s", ksef_number, e)
+        return {}
 
     def _download_single(
-        self, ksef_number: str, output_dir: str, index: int, total: int, results: Dict
+        self,
+        ksef_number: str,
+        sink: "OutputSink",
+        metadata: Dict,
+        index: int,
+        total: int,
+        results: Dict,
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
     ):
-        self.logger.info(f"Downloading {index}/{total}: {ksef_number}")
+        try:
+            existing = sink.find_existing(ksef_number, metadata)
+        except OSError as e:
+            self.logger.warning("Cannot check existing file for %s: %s", ksef_number, e)
+            existing = None
+        if existing:
+            self.logger.debug(
+                "Skipping %d/%d: %s (present)",
+                index,
+                total,
+                ksef_number,
+                ksefNumber=ksef_number,
+            )
+            self._add_download_result(results, ksef_number, "skipped", existing)
+            return
 
-        filename = f"{ksef_number}.xml"
-        output_path = f"{output_dir}/{filename}"
+        self.logger.info(
+            "Downloading %d/%d: %s", index, total, ksef_number, ksefNumber=ksef_number
+        )
+        content = self.invoice_service.get_invoice_content(
+            ksef_number, self.access_token, priority, deadline
+        )
+
+        if content is None:
+            self._add_download_result(results, ksef_number, "failed")
+            return
 
-        success = self.download_invoice_to_file(ksef_number, output_path)
+        location = self._store_invoice(sink, ksef_number, content, metadata, results)
+        if location:
+            self.logger.info("Invoice saved to: %s", location)
 
-        if success:
-            results["successful"] += 1
-            results["results"].append(
-                {"ksefNumber": ksef_number, "status": "success", "path": output_path}
+    def _store_invoice(
+        self,
+        sink: "OutputSink",
+        ksef_number: str,
+        content: bytes,
+        metadata: Dict,
+        results: Dict,
+    ) -> Optional[str]:
+        try:
+            location = sink.write(ksef_number, content, metadata)
+        except OSError as e:
+            self.logger.error("Failed to save %s: %s", ksef_number, e)
+            self._add_download_result(results, ksef_number, "failed", error=str(e))
+            return None
+
+        if not location:
+            self.logger.error("Hash mismatch for %s, file discarded", ksef_number)
+            self._add_download_result(
+                results, ksef_number, "failed", error="Hash mismatch"
             )
-        else:
+            return None
+
+        self._add_download_result(results, ksef_number, "success", location)
+        return location
+
+    def _add_download_result(
+        self,
+        results: Dict,
+        ksef_number: str,
+        status: str,
+        location: Optional[str] = None,
+        error: Optional[str] = None,
+    ):
+        if status == "failed":
             results["failed"] += 1
-            results["results"].append({"ksefNumber": ksef_number, "status": "failed"})
+            record = {"ksefNumber": ksef_number, "status": status}
+            if error:
+                record["error"] = error
+            results["results"].append(record)
+            return
+
+        results["successful" if status == "success" else "skipped"] += 1
+        results["results"].append(
+            {"ksefNumber": ksef_number, "status": status, "path": location}
+        )
+
+        if self.metadata_index:
+            self._mark_downloaded(ksef_number, location)
 
     def _ensure_authenticated(self) -> bool:
-        if not self.access_token:
+        auth = self.auth_service
+        if auth.is_valid():
+            return True
+
+        with self._session_lock:
+            if auth.is_valid():
+                return True
+
+            if auth.access_token and auth.can_refresh() and auth.refresh():
+                return True
+
             self.logger.info("Authenticating...")
             if not self.authenticate():
                 self.logger.error("Authentication failed")
                 return False
-        return True
+            return True
+
+    def _ensure_online_session(self) -> bool:
+        from requests import RequestException
+
+        if self._circuit_open():
+            self.logger.warning("KSeF unavailable (circuit open)")
+            return False
+
+        try:
+            return self._ensure_authenticated_session()
+        except RequestException as e:
+            self.logger.error("KSeF unavailable: %s", e)
+            return False
+
+    def _ensure_authenticated_session(self) -> bool:
+        with self._session_lock:
+            if self.access_token or self.session_reference:
+                return self._ensure_authenticated() and self._ensure_session()
+
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                prepared = executor.submit(self.session_service.prepare_encryption)
+                authenticated = self._ensure_authenticated()
+                encrypted = prepared.result()
+
+            if not encrypted:
+                self.logger.error("Session encryption could not be prepared")
+                return False
+            return authenticated and self._ensure_session()
+
+    def _circuit_open(self) -> bool:
+        breaker = self.http.breaker
+        return breaker is not None and breaker.is_open
+
+    def _spool_if_outage(
+        self, invoice_xml: str, error: Optional[Exception] = None
+    ) -> Optional[Dict]:
+        if self.offline_spool is None or not self.is_outage(error):
+            return None
+
+        entry_id = self.offline_spool.put(invoice_xml)
+        self.logger.warning("KSeF unavailable, invoice spooled offline: %s", entry_id)
+        return {"status": "spooled", "spoolId": entry_id}
 
     def _ensure_session(self) -> bool:
         if not self.session_reference:
@@ -183,80 +941,235 @@ class KSeFClient:
                 return False
         return True
 
-    def _send_and_poll(self, invoice_xml: str) -> Optional[Dict]:
+    def _send_and_poll(
+        self, invoice_xml: str, priority: str, deadline: Optional[float]
+    ) -> Optional[Dict]:
+        from requests import RequestException
+
         self.logger.info("Sending invoice...")
-        reference_number = self.send_invoice_to_session(invoice_xml)
+        try:
+            reference_number = self.send_invoice_to_session(
+                invoice_xml, priority=priority, deadline=deadline
+            )
+        except RequestException as e:
+            if self.is_outage(e):
+                self.logger.error("Invoice send failed: %s", e)
+                return self._spool_if_outage(invoice_xml, e)
+            self.logger.error("Send outcome unknown: %s", e)
+            return None
 
         if not reference_number:
             self.logger.error("Invoice send failed")
-            return None
+            return self._spool_if_outage(invoice_xml)
 
         self.logger.info("Checking invoice status...")
-        result = self.poll_invoice_status(reference_number)
+        result = self._poll_quietly(reference_number, priority, deadline)
+        self.save_poll_estimate()
 
         if result and result.get("status") == "accepted":
-            self.logger.info(f"Success! KSeF: {result['ksefNumber']}")
+            self.logger.info("Success! KSeF: %s", result["ksefNumber"])
             return result
 
         self.logger.error("Failed to get KSeF number")
         return None
 
     @staticmethod
-    def _init_send_results(total: int) -> Dict:
-        return {"total": total, "successful": 0, "failed": 0, "results": []}
+    def _init_send_results(
+        total: int, result_sink: Optional["ResultSink"] = None
+    ) -> Dict:
+        return {
+            "total": total,
+            "successful": 0,
+            "failed": 0,
+            "spooled": 0,
+            "results": [] if result_sink is None else result_sink,
+        }
 
-    def _process_multiple_invoices(self, invoices: List[str], results: Dict) -> Dict:
-        self.logger.info(f"Sending {len(invoices)} invoices...")
+    def _process_multiple_invoices(
+        self,
+        invoices: Iterable[Union[str, InvoiceFile]],
+        results: Dict,
+        priority: str,
+        deadline: Optional[float],
+        spool: bool = False,
+    ) -> Dict:
+        self.logger.info("Sending %s invoices...", results["total"] or "streamed")
 
-        reference_numbers = self._send_all_invoices(invoices, results)
+        pending = self._send_all_invoices(invoices, results, priority, deadline, spool)
 
-        if reference_numbers:
-            self._poll_all_statuses(reference_numbers, results)
+        if pending:
+            self._poll_all_statuses(pending, results, deadline)
 
         self.logger.info(
-            f"Summary: {results['successful']}/{results['total']} successful, "
-            f"{results['failed']} failed"
+            "Summary: %s/%s successful, %s failed, %s spooled offline",
+            results["successful"],
+            results["total"],
+            results["failed"],
+            results["spooled"],
         )
         return results
 
-    def _send_all_invoices(self, invoices: List[str], results: Dict) -> List[str]:
-        reference_numbers = []
+    def _send_all_invoices(
+        self,
+        invoices: Iterable[Union[str, InvoiceFile]],
+        results: Dict,
+        priority: str = PRIORITY_BULK_SEND,
+        deadline: Optional[float] = None,
+        spool: bool = False,
+    ) -> List[Dict]:
+        from requests import RequestException
+        from ksef.timeline import InvoiceTimeline
+
+        pending = []
+        total = results["total"] or "?"
+        iterator = iter(invoices)
+
+        for i in itertools.count(1):
+            timeline = InvoiceTimeline()
+            timeline.mark("read_start")
+            invoice = next(iterator, None)
+            if invoice is None:
+                break
+            timeline.mark("read_end")
 
-        for i, invoice_xml in enumerate(invoices, 1):
-            self.logger.info(f"Sending invoice {i}/{len(invoices)}...")
-            reference = self.send_invoice_to_session(invoice_xml)
+            invoice_xml, source = self._unpack_invoice(invoice)
+            results["total"] = max(results["total"], i)
 
-            if reference:
-                reference_numbers.append(reference)
+            if self._circuit_open():
+                self._defer_invoice(results, i, invoice_xml, source, spool)
+                continue
+
+            self.logger.info("Sending invoice %d/%s...", i, total)
+            error = None
+            try:
+                reference = self.send_invoice_to_session(
+                    invoice_xml, timeline, priority, deadline
+                )
+            except RequestException as e:
+                reference, error = None, e
+
+            if not reference and self.is_outage(error):
+                self._defer_invoice(results, i, invoice_xml, source, spool)
+            elif reference:
+                pending.append(
+                    {
+                        "index": i,
+                        "reference": reference,
+                        "source": source,
+                        "timeline": timeline,
+                    }
+                )
             else:
-                self._add_failed_result(results, i, "Failed to send")
+                source["timeline"] = timeline.to_dict()
+                message = (
+                    f"Send outcome unknown: {error}" if error else "Failed to send"
+                )
+                self._add_failed_result(results, i, message, source)
+
+        return pending
+
+    def _defer_all(
+        self, invoices: Iterable[Union[str, InvoiceFile]], results: Dict, spool: bool
+    ):
+        for i, invoice in enumerate(invoices, 1):
+            invoice_xml, source = self._unpack_invoice(invoice)
+            self._defer_invoice(results, i, invoice_xml, source, spool)
+            results["total"] = max(results["total"], i)
 
-        return reference_numbers
+    def _defer_invoice(
+        self, results: Dict, index: int, invoice_xml: str, source: Dict, spool: bool
+    ):
+        if not spool:
+            results["results"].append({"index": index, "status": "deferred", **source})
+            return
 
-    def _poll_all_statuses(self, reference_numbers: List[str], results: Dict):
-        self.logger.info(f"Checking status of {len(reference_numbers)} invoices...")
+        entry_id = self.offline_spool.put(invoice_xml, source)
+        self.logger.warning(
+            "KSeF unavailable, invoice %d spooled offline: %s", index, entry_id
+        )
+        results["spooled"] += 1
+        results["results"].append(
+            {"index": index, "status": "spooled", "spoolId": entry_id, **source}
+        )
 
-        for i, reference in enumerate(reference_numbers, 1):
-            self.logger.info(f"Checking invoice {i}/{len(reference_numbers)}...")
+    def _poll_quietly(
+        self,
+        reference: str,
+        priority: str = PRIORITY_POLL,
+        deadline: Optional[float] = None,
+        **kwargs,
+    ) -> Optional[Dict]:
+        from requests import RequestException
 
-            result = self.poll_invoice_status(
-                reference,
-                max_attempts=EXTENDED_MAX_ATTEMPTS,
-                delay_sec=EXTENDED_DELAY_SECONDS,
+        try:
+            return self.poll_invoice_status(
+                reference, priority=priority, deadline=deadline, **kwargs
             )
+        except RequestException as e:
+            self.logger.error("Status check failed for %s: %s", reference, e)
+            return None
 
-            if result and result.get("status") == "accepted":
-                self._add_success_result(results, i, result, reference)
-            else:
-                self._add_error_result(results, i, result, reference)
+    def _poll_all_statuses(
+        self, pending: List[Dict], results: Dict, deadline: Optional[float] = None
+    ):
+        from requests import RequestException
+
+        self.logger.info("Checking status of %s invoices...", len(pending))
+        remaining = {entry["reference"]: entry for entry in pending}
+
+        try:
+            for reference, result in self.invoice_service.poll_statuses(
+                self.session_reference,
+                self.access_token,
+                {ref: entry["timeline"] for ref, entry in remaining.items()},
+                EXTENDED_MAX_ATTEMPTS,
+                EXTENDED_DELAY_SECONDS,
+                deadline=deadline,
+            ):
+                self._add_polled_result(results, remaining.pop(reference), result)
+        except RequestException as e:
+            self.logger.error("Status check failed: %s", e)
+
+        for entry in remaining.values():
+            self._add_polled_result(results, entry, None)
+
+        self.save_poll_estimate()
+
+    def _add_polled_result(self, results: Dict, entry: Dict, result: Optional[Dict]):
+        source = {**entry["source"], "timeline": entry["timeline"].to_dict()}
+
+        if result and result.get("status") == "accepted":
+            self._add_success_result(
+                results, entry["index"], result, entry["reference"], source
+            )
+        else:
+            self._add_error_result(
+                results, entry["index"], result, entry["reference"], source
+            )
+
+    @staticmethod
+    def _unpack_invoice(invoice: Union[str, InvoiceFile]) -> Tuple[str, Dict]:
+        if isinstance(invoice, InvoiceFile):
+            return invoice.content, {"path": invoice.path, "size": invoice.size}
+        return invoice, {}
 
     @staticmethod
-    def _add_failed_result(results: Dict, index: int, error: str):
+    def _add_failed_result(
+        results: Dict, index: int, error: str, source: Optional[Dict] = None
+    ):
         results["failed"] += 1
-        results["results"].append({"index": index, "status": "failed", "error": error})
+        results["results"].append(
+            {"index": index, "status": "failed", "error": error, **(source or {})}
+        )
 
     @staticmethod
-    def _add_success_result(results: Dict, index: int, result: Dict, reference: str):
+    def _add_success_result(
+        results: Dict,
+        index: int,
+        result: Dict,
+        reference: str,
+        source: Optional[Dict] = None,
+    ):
         results["successful"] += 1
         results["results"].append(
             {
@@ -265,12 +1178,17 @@ class KSeFClient:
                 "ksefNumber": result["ksefNumber"],
                 "link": result["link"],
                 "referenceNumber": reference,
+                **(source or {}),
             }
         )
 
     @staticmethod
     def _add_error_result(
-        results: Dict, index: int, result: Optional[Dict], reference: str
+        results: Dict,
+        index: int,
+        result: Optional[Dict],
+        reference: str,
+        source: Optional[Dict] = None,
     ):
         results["failed"] += 1
         results["results"].append(
@@ -279,5 +1197,6 @@ class KSeFClient:
                 "status": "rejected" if result else "unknown",
                 "referenceNumber": reference,
                 "error": result.get("description") if result else "Timeout",
+                **(source or {}),
             }
         )
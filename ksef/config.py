@@ -1,6 +1,11 @@
 import os
 from dataclasses import dataclass
 from typing import Dict
+from ksef.constants import (
+    DEFAULT_INDEX_DB,
+    DEFAULT_OFFLINE_SPOOL_DIR,
+    DEFAULT_POLL_STATS_FILE,
+)
 
 
 @dataclass
@@ -11,9 +16,36 @@ class KSeFConfig:
     environment: str = os.getenv("KSEF_ENV", "test")
     log_file: str = os.getenv("KSEF_LOG_FILE", "logs/ksef_log.log")
     rate_limit: int = int(os.getenv("KSEF_RATE_LIMIT", "10"))
+    scheduler_mode: str = os.getenv("KSEF_SCHEDULER_MODE", "weighted")
+    adaptive_poll: bool = os.getenv("KSEF_ADAPTIVE_POLL", "1") == "1"
+    poll_stats_file: str = os.getenv("KSEF_POLL_STATS_FILE", DEFAULT_POLL_STATS_FILE)
+    index_db: str = os.getenv("KSEF_INDEX_DB", DEFAULT_INDEX_DB)
+    download_layout: str = os.getenv("KSEF_DOWNLOAD_LAYOUT", "")
+
+    cache_enabled: bool = os.getenv("KSEF_CACHE", "0") == "1"
+    cache_max_entries: int = int(os.getenv("KSEF_CACHE_MAX_ENTRIES", "2048"))
+    cache_max_bytes: int = int(os.getenv("KSEF_CACHE_MAX_BYTES", str(64 * 1024**2)))
+    cache_ttl: float = float(os.getenv("KSEF_CACHE_TTL", "86400"))
+    cache_dir: str = os.getenv("KSEF_CACHE_DIR", "")
+
+    http2: bool = os.getenv("KSEF_HTTP2", "0") == "1"
+    breaker_threshold: int = int(os.getenv("KSEF_BREAKER_THRESHOLD", "5"))
+    breaker_reset_timeout: float = float(os.getenv("KSEF_BREAKER_RESET", "30"))
+    offline_spool_dir: str = os.getenv(
+        "KSEF_OFFLINE_SPOOL_DIR", DEFAULT_OFFLINE_SPOOL_DIR
+    )
+
+    server_token: str = os.getenv("KSEF_SERVER_TOKEN", "")
+
+    metrics_file: str = os.getenv("KSEF_METRICS_FILE", "")
+    metrics_port: int = int(os.getenv("KSEF_METRICS_PORT", "0"))
 
     log_level_file: str = os.getenv("KSEF_LOG_LEVEL_FILE", "DEBUG")
     log_level_console: str = os.getenv("KSEF_LOG_LEVEL_CONSOLE", "INFO")
+    log_format: str = os.getenv("KSEF_LOG_FORMAT", "text")
+    log_async: bool = os.getenv("KSEF_LOG_ASYNC", "0") == "1"
+    log_max_bytes: int = int(os.getenv("KSEF_LOG_MAX_BYTES", "0"))
+    log_backup_count: int = int(os.getenv("KSEF_LOG_BACKUP_COUNT", "5"))
 
     @property
     def base_url(self) -> str:
@@ -4,7 +4,13 @@ HTTP_CREATED = 201
 HTTP_ACCEPTED = 202
 HTTP_NO_CONTENT = 204
 HTTP_BAD_REQUEST = 400
+HTTP_UNAUTHORIZED = 401
+HTTP_FORBIDDEN = 403
+HTTP_NOT_FOUND = 404
 HTTP_METHOD_NOT_ALLOWED = 405
+HTTP_PAYLOAD_TOO_LARGE = 413
+HTTP_UNSUPPORTED_MEDIA_TYPE = 415
+HTTP_INTERNAL_ERROR = 500
 
 # Processing Status Codes
 STATUS_ACCEPTED = 200
@@ -25,12 +31,14 @@ AES_KEY_SIZE = 32  # AES-256
 AES_BLOCK_SIZE = 16
 AES_MODE_BITS = 128
 PKCS7_BLOCK_SIZE = 128
+BASE64_CHUNK_SIZE = 3 * 16 * 1024
 
 # API Endpoints
 ENDPOINT_AUTH_CHALLENGE = "/auth/challenge"
 ENDPOINT_AUTH_KSEF_TOKEN = "/auth/ksef-token"
 ENDPOINT_AUTH_STATUS = "/auth/{reference}"
 ENDPOINT_AUTH_REDEEM = "/auth/token/redeem"
+ENDPOINT_AUTH_REFRESH = "/auth/token/refresh"
 ENDPOINT_PUBLIC_KEYS = "/security/public-key-certificates"
 ENDPOINT_SESSION_ONLINE = "/sessions/online"
 ENDPOINT_SESSION_INVOICES = "/sessions/online/{session}/invoices"
@@ -39,10 +47,13 @@ ENDPOINT_SESSION_CLOSE = "/sessions/online/{session}/close"
 ENDPOINT_INVOICE_XML = "/invoices/ksef/{number}"
 ENDPOINT_INVOICE_METADATA = "/invoices/metadata/{number}"
 ENDPOINT_INVOICE_SEARCH = "/invoices/query/metadata"
+ENDPOINT_INVOICE_EXPORT = "/invoices/exports"
+ENDPOINT_INVOICE_EXPORT_STATUS = "/invoices/exports/{reference}"
 
 # Certificate Types
 CERT_TYPE_ENCRYPTION = "encryption"
 CERT_USAGE_SYMMETRIC_KEY = "SymmetricKeyEncryption"
+CERTIFICATE_CACHE_TTL = 3600.0
 
 # Context Identifier
 CONTEXT_TYPE_NIP = "nip"
@@ -57,19 +68,181 @@ DEFAULT_MAX_ATTEMPTS = 30
 DEFAULT_DELAY_SECONDS = 1
 EXTENDED_MAX_ATTEMPTS = 60
 EXTENDED_DELAY_SECONDS = 2
-AUTH_WAIT_SECONDS = 1
+AUTH_POLL_INTERVAL = 0.1
+AUTH_POLL_MAX_INTERVAL = 0.5
+AUTH_POLL_TIMEOUT = 30.0
+AUTH_TOKEN_DEFAULT_TTL = 900.0
+AUTH_TOKEN_REFRESH_MARGIN = 60.0
+
+# Adaptive Polling
+POLL_ESTIMATE_QUANTILES = (0.5, 0.8, 0.95, 0.99)
+POLL_ESTIMATE_WINDOW = 512
+POLL_ESTIMATE_MIN_SAMPLES = 10
+POLL_MIN_DELAY = 0.2
+POLL_MAX_DELAY = 10.0
+POLL_BACKOFF_JITTER = 0.2
+POLL_PROBE_FACTOR = 0.9
+DEFAULT_POLL_STATS_FILE = "ksef_poll_stats.json"
+
+# HTTP
+HTTP_POOL_SIZE = 10
+HTTP_CONNECT_TIMEOUT = 10.0
+HTTP_READ_TIMEOUT = 120.0
+HTTP2_MAX_CONNECTIONS = 4
+TRANSPORT_HTTP1 = "http1"
+TRANSPORT_HTTP2 = "http2"
+
+# Circuit Breaker
+BREAKER_CLOSED = "closed"
+BREAKER_HALF_OPEN = "half_open"
+BREAKER_OPEN = "open"
+BREAKER_STATE_VALUES = {BREAKER_CLOSED: 0, BREAKER_HALF_OPEN: 1, BREAKER_OPEN: 2}
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+BREAKER_MAX_RESET_TIMEOUT = 300.0
+BREAKER_HALF_OPEN_PROBES = 2
+
+# Metrics
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POLL_ATTEMPT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 60)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_WRITE_INTERVAL = 15.0
+
+# Send Timeline
+TIMELINE_PHASES = (
+    ("read", "read_start", "read_end"),
+    ("limiter_wait", "limiter_start", "limiter_end"),
+    ("encrypt", "encrypt_start", "encrypt_end"),
+    ("post", "post_start", "post_end"),
+    ("poll_wait", "post_end", "poll_start"),
+    ("until_listed", "poll_start", "first_seen"),
+    ("until_accepted", "post_end", "accepted"),
+)
+TIMELINE_PERCENTILES = (50, 90, 95, 99)
+DEFAULT_TIMELINE_REPORT = "send_batch_report.json"
 
 # Rate Limiting
 DEFAULT_RATE_LIMIT = 10
 RATE_LIMIT_WINDOW = 1.0
 
+# Priority Scheduling
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK_SEND = "bulk_send"
+PRIORITY_POLL = "poll"
+PRIORITY_DOWNLOAD = "download"
+PRIORITY_SEARCH = "search"
+PRIORITY_CLASSES = (
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BULK_SEND,
+    PRIORITY_POLL,
+    PRIORITY_DOWNLOAD,
+    PRIORITY_SEARCH,
+)
+PRIORITY_WEIGHTS = {
+    PRIORITY_INTERACTIVE: 8.0,
+    PRIORITY_BULK_SEND: 4.0,
+    PRIORITY_POLL: 4.0,
+    PRIORITY_DOWNLOAD: 2.0,
+    PRIORITY_SEARCH: 1.0,
+}
+PRIORITY_MIN_SHARES = {
+    PRIORITY_BULK_SEND: 0.1,
+    PRIORITY_POLL: 0.1,
+    PRIORITY_DOWNLOAD: 0.05,
+    PRIORITY_SEARCH: 0.05,
+}
+SCHEDULER_MODE_STRICT = "strict"
+SCHEDULER_MODE_WEIGHTED = "weighted"
+SCHEDULER_SHARE_WINDOW = 100
+
 # File Operations
 DEFAULT_ENCODING = "utf-8"
 DEFAULT_FILE_PATTERN = "*.xml"
 DEFAULT_LOG_DIR = "logs"
 DEFAULT_DOWNLOAD_DIR = "downloaded_invoices_ksef"
 DEFAULT_SEND_DIR = "invoices_to_send_ksef"
+DIRECTORY_SORT_CHUNK_SIZE = 50000
+
+# Download Store
+KSEF_NUMBER_PATTERN = r"^(\d{10})-(\d{4})(\d{2})(\d{2})-"
+PARTIAL_DIR_NAME = ".partial"
+PARTIAL_SUFFIX = ".part"
+PARTIAL_STALE_SECONDS = 60.0
+DOWNLOAD_LAYOUT_FIELDS = ("year", "month", "day", "seller_nip")
+SINK_INDEX_SUFFIX = ".index.jsonl"
+
+# FA(3) Extraction
+EXTRACT_BATCH_SIZE = 64
+FA_RATE_FIELDS = {
+    "23": ("P_13_1", "P_14_1"),
+    "8": ("P_13_2", "P_14_2"),
+    "5": ("P_13_3", "P_14_3"),
+    "4": ("P_13_4", "P_14_4"),
+    "oss": ("P_13_5", "P_14_5"),
+    "0_kr": ("P_13_6_1",),
+    "0_wdt": ("P_13_6_2",),
+    "0_ex": ("P_13_6_3",),
+    "zw": ("P_13_7",),
+    "np_i": ("P_13_8",),
+    "np_ii": ("P_13_9",),
+    "oo": ("P_13_10",),
+    "marza": ("P_13_11",),
+}
+
+# Spool Watcher
+WATCH_INTERVAL_SECONDS = 1.0
+WATCH_BATCH_SIZE = 100
+WATCH_MAX_SEND_ATTEMPTS = 3
+SPOOL_SENT_DIR = "sent"
+SPOOL_FAILED_DIR = "failed"
+SPOOL_RESULT_SUFFIX = ".result.json"
+
+# Offline Spool
+DEFAULT_OFFLINE_SPOOL_DIR = "ksef_offline_spool"
+OFFLINE_SPOOL_DRAINED_FILE = "drained.jsonl"
+OFFLINE_SPOOL_LOCK_FILE = ".drain.lock"
+OFFLINE_SPOOL_LOCK_TTL = 3600.0
+OFFLINE_SPOOL_LOCK_REFRESH = 300.0
+OFFLINE_SPOOL_FAILED_DIR = "failed"
+OFFLINE_SPOOL_MAX_ATTEMPTS = 3
+OFFLINE_DRAIN_INITIAL_BATCH = 5
+OFFLINE_DRAIN_MAX_BATCH = 100
+OFFLINE_DRAIN_PAUSE_SECONDS = 2.0
+
+# Invoice Export
+EXPORT_POLL_INTERVAL = 1.0
+EXPORT_POLL_MAX_INTERVAL = 10.0
+EXPORT_TIMEOUT = 1800.0
+EXPORT_PART_WORKERS = 4
+EXPORT_CHUNK_SIZE = 1024 * 1024
+EXPORT_METADATA_FILE = "_metadata.json"
+
+# Result Sinks
+RESULT_SINK_COMMIT_EVERY = 50
+
+# Local Daemon
+SERVER_DEFAULT_HOST = "127.0.0.1"
+SERVER_DEFAULT_PORT = 8765
+SERVER_MAX_BODY_BYTES = 256 * 1024 * 1024
+
+# Multi-tenant Scheduling
+TENANT_WORKERS = 4
+TENANT_SEND_CHUNK_SIZE = 25
+
+# Metadata Index
+DEFAULT_INDEX_DB = "ksef_index.db"
+INDEX_DATE_COLUMNS = {
+    "Issue": "issue_date",
+    "Invoicing": "invoicing_date",
+    "Acquisition": "acquisition_date",
+}
+
+# Metadata Frame
+FRAME_AMOUNT_COLUMNS = ("net_amount", "vat_amount", "gross_amount")
+FRAME_MATCH_TOLERANCE = 0.01
 
 # Logging
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 LOG_FORMAT_CONSOLE = "%(message)s"
+LOG_FORMAT_JSON = "json"
+LOG_BACKUP_COUNT = 5
@@ -0,0 +1,133 @@
+import base64
+import hashlib
+import os
+import re
+import string
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+from ksef.constants import (
+    DOWNLOAD_LAYOUT_FIELDS,
+    KSEF_NUMBER_PATTERN,
+    PARTIAL_DIR_NAME,
+    PARTIAL_STALE_SECONDS,
+    PARTIAL_SUFFIX,
+)
+
+
+class DownloadStore:
+
+    def __init__(self, root: str, layout: str = ""):
+        self.root = Path(root)
+        self.layout = layout.strip("/")
+        self.partial_dir = self.root / PARTIAL_DIR_NAME
+        self.started_at = time.time()
+        self._validate_layout(self.layout)
+
+    def path_for(self, ksef_number: str, metadata: Optional[Dict] = None) -> Path:
+        filename = f"{ksef_number}.xml"
+
+        if not self.layout:
+            return self.root / filename
+
+        fields = self._layout_fields(ksef_number, metadata or {})
+        return self.root / self.layout.format(**fields) / filename
+
+    def is_present(self, path: Path, expected_hash: Optional[str] = None) -> bool:
+        if not path.is_file() or path.stat().st_size == 0:
+            return False
+
+        if not expected_hash:
+            return True
+
+        return self.file_hash(path) == expected_hash
+
+    def write(
+        self, path: Path, content: bytes, expected_hash: Optional[str] = None
+    ) -> bool:
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        partial = self.partial_dir / f"{os.getpid()}-{uuid.uuid4().hex}{PARTIAL_SUFFIX}"
+
+        try:
+            with open(partial, "wb") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+
+            if expected_hash and self.content_hash(content) != expected_hash:
+                return False
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(partial, path)
+            return True
+        finally:
+            if partial.exists():
+                partial.unlink()
+
+    def cleanup_partials(self) -> int:
+        if not self.partial_dir.is_dir():
+            return 0
+
+        own_prefix = f"{os.getpid()}-"
+        stale_before = self.started_at - PARTIAL_STALE_SECONDS
+        removed = 0
+
+        for entry in os.scandir(self.partial_dir):
+            if not entry.name.endswith(PARTIAL_SUFFIX):
+                continue
+            try:
+                if entry.name.startswith(own_prefix) or (
+                    entry.stat().st_mtime < stale_before
+                ):
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        return base64.b64encode(hashlib.sha256(content).digest()).decode("utf-8")
+
+    @staticmethod
+    def file_hash(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return base64.b64encode(digest.digest()).decode("utf-8")
+
+    @staticmethod
+    def _validate_layout(layout: str):
+        try:
+            fields = [
+                field
+                for _, field, _, _ in string.Formatter().parse(layout)
+                if field is not None
+            ]
+        except ValueError as e:
+            raise ValueError(f"Invalid download layout {layout!r}: {e}") from None
+
+        unknown = sorted(set(fields) - set(DOWNLOAD_LAYOUT_FIELDS))
+        if unknown:
+            raise ValueError(
+                f"Unknown download layout field(s) {', '.join(unknown)}; "
+                f"available: {', '.join(DOWNLOAD_LAYOUT_FIELDS)}"
+            )
+
+    @staticmethod
+    def _layout_fields(ksef_number: str, metadata: Dict) -> Dict[str, str]:
+        match = re.match(KSEF_NUMBER_PATTERN, ksef_number)
+        seller_nip, year, month, day = (
+            match.groups() if match else ("unknown", "0000", "00", "00")
+        )
+
+        issue_date = metadata.get("issueDate") or metadata.get("issue_date")
+        if issue_date:
+            year, month, day = issue_date[:10].split("-")
+
+        seller = metadata.get("seller") or {}
+        seller_nip = seller.get("nip") or metadata.get("seller_nip") or seller_nip
+
+        return {"year": year, "month": month, "day": day, "seller_nip": seller_nip}
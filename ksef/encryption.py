@@ -1,14 +1,14 @@
 import os
 import base64
+import binascii
 import hashlib
 from typing import Dict, Optional
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.primitives import padding as crypto_padding
-from cryptography import x509
-from dateutil import parser
-from ksef.constants import AES_KEY_SIZE, AES_BLOCK_SIZE, PKCS7_BLOCK_SIZE
+from ksef.constants import (
+    AES_KEY_SIZE,
+    AES_BLOCK_SIZE,
+    BASE64_CHUNK_SIZE,
+    PKCS7_BLOCK_SIZE,
+)
 
 
 class EncryptionManager:
@@ -44,6 +44,22 @@ class EncryptionManager:
             "encryptedInvoiceContent": base64.b64encode(encrypted_data).decode("utf-8"),
         }
 
+    def encrypt_invoice_body(self, invoice_xml: str) -> bytearray:
+        self._validate_keys()
+
+        invoice_bytes = invoice_xml.encode("utf-8")
+        encrypted_data = self._encrypt_into_buffer(invoice_bytes)
+
+        return self._build_invoice_body(
+            self._calculate_hash(invoice_bytes),
+            len(invoice_bytes),
+            encrypted_data,
+        )
+
+    def decryptor(self) -> "StreamDecryptor":
+        self._validate_keys()
+        return StreamDecryptor(self.symmetric_key, self.iv)
+
     @staticmethod
     def encrypt_token(token: str, timestamp_iso: str, public_key_b64: str) -> str:
         public_key = EncryptionManager._load_public_key(public_key_b64)
@@ -58,6 +74,8 @@ class EncryptionManager:
 
     @staticmethod
     def _load_public_key(cert_b64: str):
+        from cryptography import x509
+
         cert_der = base64.b64decode(cert_b64)
         cert = x509.load_der_x509_certificate(cert_der)
         return cert.public_key()
@@ -67,6 +85,9 @@ class EncryptionManager:
 
     @staticmethod
     def _encrypt_with_rsa(data: bytes, public_key) -> bytes:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
         return public_key.encrypt(
             data,
             padding.OAEP(
@@ -90,14 +111,69 @@ class EncryptionManager:
 
     @staticmethod
     def _apply_padding(data: bytes) -> bytes:
+        from cryptography.hazmat.primitives import padding as crypto_padding
+
         padder = crypto_padding.PKCS7(PKCS7_BLOCK_SIZE).padder()
         return padder.update(data) + padder.finalize()
 
     def _aes_encrypt(self, data: bytes) -> bytes:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
         cipher = Cipher(algorithms.AES(self.symmetric_key), modes.CBC(self.iv))
         encryptor = cipher.encryptor()
         return encryptor.update(data) + encryptor.finalize()
 
+    def _encrypt_into_buffer(self, data: bytes) -> memoryview:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+        full_blocks = len(data) - len(data) % AES_BLOCK_SIZE
+        pad = AES_BLOCK_SIZE - len(data) % AES_BLOCK_SIZE
+        last_block = bytes(data[full_blocks:]) + bytes([pad]) * pad
+
+        buffer = bytearray(full_blocks + 2 * AES_BLOCK_SIZE - 1)
+        view = memoryview(buffer)
+
+        cipher = Cipher(algorithms.AES(self.symmetric_key), modes.CBC(self.iv))
+        encryptor = cipher.encryptor()
+        written = encryptor.update_into(memoryview(data)[:full_blocks], view)
+        written += encryptor.update_into(last_block, view[written:])
+        encryptor.finalize()
+
+        return view[:written]
+
+    @staticmethod
+    def _build_invoice_body(
+        invoice_hash: bytes, invoice_size: int, encrypted_data: memoryview
+    ) -> bytearray:
+        head = (
+            '{"invoiceHash":"%s","invoiceSize":%d,"encryptedInvoiceHash":"%s",'
+            '"encryptedInvoiceSize":%d,"encryptedInvoiceContent":"'
+            % (
+                base64.b64encode(invoice_hash).decode("ascii"),
+                invoice_size,
+                base64.b64encode(hashlib.sha256(encrypted_data).digest()).decode(
+                    "ascii"
+                ),
+                len(encrypted_data),
+            )
+        ).encode("ascii")
+        tail = b'"}'
+        encoded_size = (len(encrypted_data) + 2) // 3 * 4
+
+        body = bytearray(len(head) + encoded_size + len(tail))
+        body[: len(head)] = head
+        position = len(head)
+
+        for start in range(0, len(encrypted_data), BASE64_CHUNK_SIZE):
+            chunk = binascii.b2a_base64(
+                encrypted_data[start : start + BASE64_CHUNK_SIZE], newline=False
+            )
+            body[position : position + len(chunk)] = chunk
+            position += len(chunk)
+
+        body[position:] = tail
+        return body
+
     @staticmethod
     def _prepare_token_data(token: str, timestamp_iso: str) -> bytes:
         timestamp_ms = EncryptionManager._parse_timestamp(timestamp_iso)
@@ -105,5 +181,24 @@ class EncryptionManager:
 
     @staticmethod
     def _parse_timestamp(timestamp_iso: str) -> int:
+        from dateutil import parser
+
         dt = parser.isoparse(timestamp_iso)
         return int(dt.timestamp() * 1000)
+
+
+class StreamDecryptor:
+
+    def __init__(self, key: bytes, iv: bytes):
+        from cryptography.hazmat.primitives import padding as crypto_padding
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+        self._decryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).decryptor()
+        self._unpadder = crypto_padding.PKCS7(PKCS7_BLOCK_SIZE).unpadder()
+
+    def update(self, data: bytes) -> bytes:
+        return self._unpadder.update(self._decryptor.update(data))
+
+    def finalize(self) -> bytes:
+        tail = self._unpadder.update(self._decryptor.finalize())
+        return tail + self._unpadder.finalize()
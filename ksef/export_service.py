@@ -0,0 +1,224 @@
+import base64
+import hashlib
+import json
+import os
+import time
+import zipfile
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from ksef.certificates import CertificateStore
+from ksef.encryption import EncryptionManager
+from ksef.http_client import HttpClient
+from ksef.logger_service import LoggerService
+from ksef.scheduler import PriorityScheduler
+from ksef.utils import build_search_body
+from ksef.constants import (
+    CERT_USAGE_SYMMETRIC_KEY,
+    ENDPOINT_INVOICE_EXPORT,
+    ENDPOINT_INVOICE_EXPORT_STATUS,
+    EXPORT_METADATA_FILE,
+    EXPORT_PART_WORKERS,
+    EXPORT_POLL_INTERVAL,
+    EXPORT_POLL_MAX_INTERVAL,
+    EXPORT_TIMEOUT,
+    HTTP_ACCEPTED,
+    HTTP_CREATED,
+    HTTP_OK,
+    PRIORITY_DOWNLOAD,
+    PRIORITY_POLL,
+    STATUS_ACCEPTED,
+    STATUS_ERROR_THRESHOLD,
+)
+
+
+class ExportService:
+
+    def __init__(
+        self,
+        http_client: HttpClient,
+        logger: LoggerService,
+        certificates: CertificateStore,
+        scheduler: PriorityScheduler,
+    ):
+        self.http = http_client
+        self.logger = logger
+        self.certificates = certificates
+        self.scheduler = scheduler
+
+    def start(
+        self,
+        access_token: str,
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
+        **params,
+    ) -> Optional[Tuple[str, EncryptionManager]]:
+        cert = self.certificates.find(CERT_USAGE_SYMMETRIC_KEY)
+        if not cert:
+            self.logger.error("Failed to get encryption certificate")
+            return None
+
+        encryption = EncryptionManager()
+        payload = {
+            "encryption": encryption.generate_session_keys(cert),
+            "filters": build_search_body(params),
+        }
+
+        if not self.scheduler.acquire(priority, deadline):
+            self.logger.error("Deadline exceeded waiting to start export")
+            return None
+
+        response = self.http.post_json(ENDPOINT_INVOICE_EXPORT, payload, access_token)
+        if response.status_code not in (HTTP_OK, HTTP_CREATED, HTTP_ACCEPTED):
+            self.logger.error("Export request failed: %s", response.status_code)
+            return None
+
+        reference = response.json().get("referenceNumber")
+        self.logger.info("Export started: %s", reference)
+        return reference, encryption
+
+    def wait(
+        self,
+        access_token: str,
+        reference: str,
+        deadline: Optional[float] = None,
+        timeout: float = EXPORT_TIMEOUT,
+    ) -> Optional[Dict]:
+        endpoint = ENDPOINT_INVOICE_EXPORT_STATUS.format(reference=reference)
+        give_up = time.monotonic() + timeout
+        interval = EXPORT_POLL_INTERVAL
+
+        while True:
+            if not self.scheduler.acquire(PRIORITY_POLL, deadline):
+                self.logger.error("Deadline exceeded waiting for export status")
+                return None
+
+            response = self.http.get_json(endpoint, access_token)
+            if response.status_code != HTTP_OK:
+                self.logger.error(
+                    "Failed to get export status: %s", response.status_code
+                )
+                return None
+
+            data = response.json()
+            status = data.get("status", {})
+            code = status.get("code")
+
+            if code == STATUS_ACCEPTED:
+                return data.get("package") or {}
+            if code is not None and code >= STATUS_ERROR_THRESHOLD:
+                self.logger.error(
+                    "Export failed (code %s): %s", code, status.get("description", "")
+                )
+                return None
+
+            if time.monotonic() + interval > give_up:
+                self.logger.error("Export %s not ready after %.0fs", reference, timeout)
+                return None
+            time.sleep(interval)
+            interval = min(interval * 2, EXPORT_POLL_MAX_INTERVAL)
+
+    def download_package(
+        self,
+        package: Dict,
+        encryption: EncryptionManager,
+        path: str,
+        workers: int = EXPORT_PART_WORKERS,
+    ) -> bool:
+        parts = sorted(package.get("parts", []), key=lambda p: p["ordinalNumber"])
+        if not parts:
+            return False
+
+        offsets = [0]
+        for part in parts[:-1]:
+            offsets.append(offsets[-1] + part["partSize"])
+        with open(path, "wb") as f:
+            f.truncate(offsets[-1] + parts[-1]["partSize"])
+
+        self.logger.info("Downloading %s export parts...", len(parts))
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            results = executor.map(
+                lambda job: self._download_part(job[0], job[1], encryption, path),
+                zip(parts, offsets),
+            )
+            return all(list(results))
+
+    def read_metadata(self, path: str) -> Dict[str, Dict]:
+        with zipfile.ZipFile(path) as archive:
+            try:
+                raw = archive.read(EXPORT_METADATA_FILE)
+            except KeyError:
+                return {}
+
+        invoices: List[Dict] = json.loads(raw).get("invoices", [])
+        return {invoice["ksefNumber"]: invoice for invoice in invoices}
+
+    def iter_invoices(self, path: str) -> Iterator[Tuple[str, bytes]]:
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name.endswith(".xml"):
+                    continue
+                yield name[: -len(".xml")], archive.read(info)
+
+    def _download_part(
+        self, part: Dict, offset: int, encryption: EncryptionManager, path: str
+    ) -> bool:
+        name = part.get("partName") or part["ordinalNumber"]
+        decryptor = encryption.decryptor()
+        encrypted_hash = hashlib.sha256()
+        plain_hash = hashlib.sha256()
+        written = 0
+
+        with open(path, "r+b") as f:
+            f.seek(offset)
+
+            def write(chunk: bytes):
+                nonlocal written
+                encrypted_hash.update(chunk)
+                plain = decryptor.update(chunk)
+                plain_hash.update(plain)
+                f.write(plain)
+                written += len(plain)
+
+            try:
+                status = self.http.download(part["url"], write)
+            except requests.RequestException as e:
+                self.logger.error("Export part %s download failed: %s", name, e)
+                return False
+            if status != HTTP_OK:
+                self.logger.error("Export part %s download failed: %s", name, status)
+                return False
+
+            try:
+                tail = decryptor.finalize()
+            except ValueError:
+                self.logger.error("Export part %s could not be decrypted", name)
+                return False
+            plain_hash.update(tail)
+            f.write(tail)
+            written += len(tail)
+
+        if written != part["partSize"]:
+            self.logger.error(
+                "Export part %s size mismatch: %s != %s",
+                name,
+                written,
+                part["partSize"],
+            )
+            return False
+        if not _hash_matches(encrypted_hash, part.get("encryptedPartHash")):
+            self.logger.error("Export part %s encrypted hash mismatch", name)
+            return False
+        if not _hash_matches(plain_hash, part.get("partHash")):
+            self.logger.error("Export part %s hash mismatch", name)
+            return False
+
+        self.logger.debug("Export part %s decrypted: %s bytes", name, written)
+        return True
+
+
+def _hash_matches(digest, expected: Optional[str]) -> bool:
+    if not expected:
+        return True
+    return base64.b64encode(digest.digest()).decode("utf-8") == expected
@@ -0,0 +1,230 @@
+import csv
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, Iterator, List
+from xml.etree import ElementTree
+from ksef.constants import (
+    DEFAULT_DOWNLOAD_DIR,
+    EXTRACT_BATCH_SIZE,
+    FA_RATE_FIELDS,
+    PARTIAL_DIR_NAME,
+)
+
+_TEXT_FIELDS = {
+    ("Naglowek", "KodFormularza"): "form_code",
+    ("Podmiot1", "NIP"): "seller_nip",
+    ("Podmiot1", "Nazwa"): "seller_name",
+    ("Podmiot2", "NIP"): "buyer_nip",
+    ("Podmiot2", "NrVatUE"): "buyer_nip",
+    ("Podmiot2", "NrID"): "buyer_nip",
+    ("Podmiot2", "Nazwa"): "buyer_name",
+    ("Fa", "KodWaluty"): "currency",
+    ("Fa", "P_1"): "issue_date",
+    ("Fa", "P_2"): "invoice_number",
+    ("Fa", "P_6"): "sale_date",
+    ("Fa", "RodzajFaktury"): "invoice_type",
+}
+
+_AMOUNT_FIELDS = {
+    source: column
+    for rate, sources in FA_RATE_FIELDS.items()
+    for source, column in zip(sources, (f"net_{rate}", f"vat_{rate}"))
+}
+
+COLUMNS = (
+    ["file", "ksef_number"]
+    + list(dict.fromkeys(_TEXT_FIELDS.values()))
+    + ["line_count"]
+    + list(_AMOUNT_FIELDS.values())
+    + ["net_total", "vat_total", "gross", "error"]
+)
+
+
+def extract_invoice_fields(path: str) -> Dict:
+    record = {
+        "file": path,
+        "ksef_number": _ksef_number_from_path(path),
+        "line_count": 0,
+    }
+
+    try:
+        _parse_into(path, record)
+    except (ElementTree.ParseError, OSError) as e:
+        record["error"] = str(e)
+        return record
+
+    net = [record[c] for c in _AMOUNT_FIELDS.values() if c.startswith("net_")]
+    vat = [record[c] for c in _AMOUNT_FIELDS.values() if c.startswith("vat_")]
+    record["net_total"] = sum((v for v in net if v is not None), Decimal(0))
+    record["vat_total"] = sum((v for v in vat if v is not None), Decimal(0))
+    return record
+
+
+def iter_invoice_files(directory: str) -> Iterator[str]:
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d != PARTIAL_DIR_NAME)
+        for name in sorted(files):
+            if name.endswith(".xml"):
+                yield os.path.join(root, name)
+
+
+def iter_extracted(
+    paths: Iterable[str], workers: int = 0, batch_size: int = EXTRACT_BATCH_SIZE
+) -> Iterator[Dict]:
+    if workers == 1:
+        yield from map(extract_invoice_fields, paths)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = deque()
+
+        for batch in _batched(paths, batch_size):
+            window.append(executor.submit(_extract_batch, batch))
+            if len(window) >= max_pending:
+                yield from window.popleft().result()
+
+        while window:
+            yield from window.popleft().result()
+
+
+def export_fields(
+    directory: str = DEFAULT_DOWNLOAD_DIR, output: str = "", workers: int = 0
+) -> int:
+    records = iter_extracted(iter_invoice_files(directory), workers)
+
+    if output.endswith(".parquet"):
+        return _write_parquet(records, output)
+    return _write_csv(records, output)
+
+
+def _parse_into(path: str, record: Dict):
+    for column in COLUMNS:
+        record.setdefault(column, None)
+
+    stack: List[ElementTree.Element] = []
+    section = None
+
+    for event, elem in ElementTree.iterparse(path, events=("start", "end")):
+        tag = _local_name(elem.tag)
+
+        if event == "start":
+            if len(stack) == 1:
+                section = tag
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        _collect(record, section, tag, elem.text)
+
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+
+
+def _collect(record: Dict, section: str, tag: str, text: str):
+    if tag == "FaWiersz":
+        record["line_count"] += 1
+        return
+
+    if not text or not text.strip():
+        return
+
+    if section == "Fa" and tag == "P_15":
+        record["gross"] = _to_decimal(text)
+        return
+
+    if section == "Fa" and tag in _AMOUNT_FIELDS:
+        record[_AMOUNT_FIELDS[tag]] = _to_decimal(text)
+        return
+
+    column = _TEXT_FIELDS.get((section, tag))
+    if column and record.get(column) is None:
+        record[column] = text.strip()
+
+
+def _extract_batch(paths: List[str]) -> List[Dict]:
+    return [extract_invoice_fields(path) for path in paths]
+
+
+def _batched(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_csv(records: Iterable[Dict], output: str) -> int:
+    count = 0
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    return count
+
+
+def _write_parquet(records: Iterable[Dict], output: str) -> int:
+    try:
+        import pyarrow
+        import pyarrow.parquet as parquet
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package")
+
+    schema = pyarrow.schema(
+        [
+            (column, pyarrow.int64() if column == "line_count" else pyarrow.string())
+            for column in COLUMNS
+            if not _is_amount_column(column)
+        ]
+        + [
+            (column, pyarrow.decimal128(18, 2))
+            for column in COLUMNS
+            if _is_amount_column(column)
+        ]
+    )
+
+    count = 0
+    with parquet.ParquetWriter(output, schema) as writer:
+        for batch in _batched(records, EXTRACT_BATCH_SIZE * 16):
+            columns = {
+                name: [_parquet_value(name, row.get(name)) for row in batch]
+                for name in schema.names
+            }
+            writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+            count += len(batch)
+    return count
+
+
+def _parquet_value(column: str, value):
+    if value is not None and _is_amount_column(column):
+        return value.quantize(Decimal("0.01"))
+    return value
+
+
+def _is_amount_column(column: str) -> bool:
+    return column.startswith(("net_", "vat_")) or column == "gross"
+
+
+def _to_decimal(text: str):
+    try:
+        return Decimal(text.strip())
+    except InvalidOperation:
+        return None
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _ksef_number_from_path(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
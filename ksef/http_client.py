@@ -1,18 +1,70 @@
+import socket
+import time
 import requests
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from urllib3.exceptions import NewConnectionError
+from ksef.circuit_breaker import CircuitBreaker
 from ksef.constants import (
     CONTENT_TYPE_JSON,
     ACCEPT_JSON,
     ACCEPT_XML,
     ACCEPT_OCTET_STREAM,
     AUTH_HEADER_PREFIX,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_INTERNAL_ERROR,
+    HTTP_POOL_SIZE,
+    HTTP_READ_TIMEOUT,
+    HTTP_UNAUTHORIZED,
 )
+from ksef.metrics import MetricsRegistry, endpoint_template
+from ksef.transports import Http2Transport, RequestsTransport
+
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+def request_not_sent(error: BaseException) -> bool:
+    if isinstance(error, (CircuitOpenError, requests.ConnectTimeout)):
+        return True
+
+    pending, seen = [error], set()
+    while pending:
+        current = pending.pop()
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(
+            current, (NewConnectionError, ConnectionRefusedError, socket.gaierror)
+        ):
+            return True
+        pending.extend(
+            (current.__cause__, current.__context__, getattr(current, "reason", None))
+        )
+        pending.extend(arg for arg in current.args if isinstance(arg, BaseException))
+    return False
 
 
 class HttpClient:
 
-    def __init__(self, base_url: str):
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = HTTP_POOL_SIZE,
+        metrics: Optional[MetricsRegistry] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        timeout: Tuple[float, float] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+        transport: Optional[Union[RequestsTransport, Http2Transport]] = None,
+    ):
         self.base_url = base_url
+        self.transport = transport or RequestsTransport(pool_size)
+        self.metrics = metrics
+        self.breaker = breaker
+        self.timeout = timeout
+        self._unauthorized_listeners: List[Callable[[str], None]] = []
+
+    def add_unauthorized_listener(self, callback: Callable[[str], None]):
+        self._unauthorized_listeners.append(callback)
 
     def post_json(
         self,
@@ -21,26 +73,109 @@ class HttpClient:
         token: Optional[str] = None,
         params: Optional[Dict] = None,
     ) -> requests.Response:
-        url = self._build_url(endpoint)
         headers = self._build_json_headers(token)
-        return requests.post(url, json=payload, headers=headers, params=params)
+        return self._request(
+            "POST", endpoint, json=payload, headers=headers, params=params
+        )
+
+    def post_bytes(
+        self,
+        endpoint: str,
+        body: Union[bytes, bytearray, memoryview],
+        token: Optional[str] = None,
+    ) -> requests.Response:
+        headers = self._build_json_headers(token)
+        return self._request("POST", endpoint, data=body, headers=headers)
 
     def get_json(
         self, endpoint: str, token: Optional[str] = None, params: Optional[Dict] = None
     ) -> requests.Response:
-        url = self._build_url(endpoint)
         headers = self._build_headers(ACCEPT_JSON, token)
-        return requests.get(url, headers=headers, params=params)
+        return self._request("GET", endpoint, headers=headers, params=params)
 
     def get_xml(self, endpoint: str, token: str) -> requests.Response:
-        url = self._build_url(endpoint)
         headers = self._build_headers(ACCEPT_XML, token)
-        return requests.get(url, headers=headers)
+        return self._request("GET", endpoint, headers=headers)
 
     def get_octet_stream(self, endpoint: str, token: str) -> requests.Response:
-        url = self._build_url(endpoint)
         headers = self._build_headers(ACCEPT_OCTET_STREAM, token)
-        return requests.get(url, headers=headers)
+        return self._request("GET", endpoint, headers=headers)
+
+    def download(self, url: str, write: Callable[[bytes], None]) -> int:
+        return self.transport.download(url, write, self.timeout)
+
+    def close(self):
+        self.transport.close()
+
+    def _request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        response = self._send(method, endpoint, **kwargs)
+        if response.status_code == HTTP_UNAUTHORIZED:
+            authorization = (kwargs.get("headers") or {}).get("Authorization", "")
+            token = authorization[len(AUTH_HEADER_PREFIX) :]
+            for callback in list(self._unauthorized_listeners):
+                callback(token)
+        return response
+
+    def _send(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        url = self._build_url(endpoint)
+        kwargs.setdefault("timeout", self.timeout)
+
+        if not (self.metrics or self.breaker):
+            return self.transport.request(method, url, **kwargs)
+
+        if self.breaker and not self.breaker.allow():
+            if self.metrics:
+                self._record(method, endpoint, "circuit_open", time.perf_counter())
+            raise CircuitOpenError(f"Circuit open, request not sent: {method} {url}")
+
+        started = time.perf_counter()
+        try:
+            response = self.transport.request(method, url, **kwargs)
+        except requests.RequestException:
+            if self.breaker:
+                self.breaker.record_failure()
+            if self.metrics:
+                self._record(method, endpoint, "error", started)
+            raise
+
+        if self.breaker:
+            if response.status_code >= HTTP_INTERNAL_ERROR:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        if self.metrics:
+            self._record(method, endpoint, str(response.status_code), started, response)
+        return response
+
+    def _record(
+        self,
+        method: str,
+        endpoint: str,
+        status: str,
+        started: float,
+        response: Optional[requests.Response] = None,
+    ):
+        template = endpoint_template(endpoint)
+        self.metrics.histogram(
+            "ksef_http_request_duration_seconds", "HTTP request latency."
+        ).observe(time.perf_counter() - started, endpoint=template, method=method)
+        self.metrics.counter(
+            "ksef_http_responses_total", "HTTP responses by status code."
+        ).inc(endpoint=template, method=method, status=status)
+
+        if response is None:
+            return
+
+        request = response.request
+        body = getattr(request, "body", None) or getattr(request, "content", b"")
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.metrics.counter(
+            "ksef_http_request_bytes_total", "Request body bytes sent."
+        ).inc(len(body), endpoint=template)
+        self.metrics.counter(
+            "ksef_http_response_bytes_total", "Response body bytes received."
+        ).inc(len(response.content), endpoint=template)
 
     def _build_url(self, endpoint: str) -> str:
         return f"{self.base_url}{endpoint}"
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class InvoiceCache:
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk = (
+            _DiskLayer(disk_dir, disk_max_bytes or max_bytes * 10, ttl_seconds)
+            if disk_dir
+            else None
+        )
+
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, "_Call"] = {}
+        self._stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "collapsed": 0,
+            "evictions": 0,
+        }
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            value = self._get_memory(key)
+            if value is not None:
+                self._stats["hits"] += 1
+                return value
+
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+            else:
+                self._stats["collapsed"] += 1
+
+        if not leader:
+            return call.wait()
+
+        try:
+            call.result = self._load(key, loader)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["disk_hits"]
+            lookups += self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_ratio": (
+                    (self._stats["hits"] + self._stats["disk_hits"]) / lookups
+                    if lookups
+                    else 0.0
+                ),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _load(self, key: str, loader: Callable[[], Any]) -> Any:
+        value = self.disk.get(key) if self.disk else None
+
+        if value is not None:
+            with self._lock:
+                self._stats["disk_hits"] += 1
+                self._put_memory(key, value)
+            return value
+
+        with self._lock:
+            self._stats["misses"] += 1
+
+        value = loader()
+        if value is None:
+            return None
+
+        with self._lock:
+            self._put_memory(key, value)
+        if self.disk:
+            self.disk.put(key, value)
+        return value
+
+    def _get_memory(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, size, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def _put_memory(self, key: str, value: Any):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class _DiskLayer:
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._bytes = sum(entry.stat().st_size for entry in self._scan())
+
+    def get(self, key: str) -> Any:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            expired = record["expiresAt"] < time.time()
+            value = record["value"]
+        except (KeyError, TypeError):
+            self._unlink(path)
+            return None
+
+        if expired:
+            self._unlink(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return value
+
+    def put(self, key: str, value: Any):
+        path = self._path(key)
+        payload = json.dumps(
+            {"expiresAt": time.time() + self.ttl_seconds, "value": value},
+            ensure_ascii=False,
+        ).encode("utf-8")
+
+        partial = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(partial, "wb") as f:
+                f.write(payload)
+
+            with self._lock:
+                previous = _file_size(path)
+                os.replace(partial, path)
+                self._bytes += len(payload) - previous
+                if self._bytes > self.max_bytes:
+                    self._evict()
+        except OSError:
+            _remove_quietly(partial)
+
+    def _evict(self):
+        entries = sorted(self._scan(), key=_modified_at)
+        target = self.max_bytes * 0.9
+
+        for entry in entries:
+            if self._bytes <= target:
+                break
+            self._unlink(Path(entry.path))
+
+    def _unlink(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            self._bytes -= size
+        except OSError:
+            pass
+
+    def _scan(self):
+        return [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / f"{digest}.json"
+
+
+def _estimate_size(value: Any) -> int:
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return len(json.dumps(value))
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _modified_at(entry: os.DirEntry) -> float:
+    try:
+        return entry.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def _remove_quietly(path: Path):
+    try:
+        path.unlink()
+    except OSError:
+        pass
@@ -1,9 +1,16 @@
 import time
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from ksef.http_client import HttpClient
 from ksef.encryption import EncryptionManager
 from ksef.logger_service import LoggerService
 from ksef.rate_limiter import RateLimiter
+from ksef.scheduler import PriorityScheduler
+from ksef.invoice_cache import InvoiceCache
+from ksef.metrics import MetricsRegistry
+from ksef.poll_estimator import PollPlan, ProcessingTimeEstimator
+from ksef.records import StatusEntry
+from ksef.timeline import NULL_TIMELINE, InvoiceTimeline
+from ksef.utils import build_search_body
 from ksef.constants import (
     ENDPOINT_SESSION_INVOICES,
     ENDPOINT_SESSION_INVOICE_LIST,
@@ -16,11 +23,23 @@ from ksef.constants import (
     STATUS_PROCESSING,
     STATUS_PROCESSING_EXTENDED,
     STATUS_ERROR_THRESHOLD,
+    POLL_ATTEMPT_BUCKETS,
     DEFAULT_MAX_ATTEMPTS,
     DEFAULT_DELAY_SECONDS,
+    PRIORITY_DOWNLOAD,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_POLL,
+    PRIORITY_SEARCH,
 )
 
 
+class SearchIncompleteError(Exception):
+
+    def __init__(self, page_offset: int):
+        super().__init__(f"Invoice search failed at page {page_offset}")
+        self.page_offset = page_offset
+
+
 class InvoiceService:
 
     def __init__(
@@ -30,23 +49,47 @@ class InvoiceService:
         logger: LoggerService,
         rate_limiter: RateLimiter,
         config,
+        cache: Optional[InvoiceCache] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        scheduler: Optional[PriorityScheduler] = None,
+        estimator: Optional[ProcessingTimeEstimator] = None,
     ):
         self.http = http_client
         self.encryption = encryption
         self.logger = logger
         self.rate_limiter = rate_limiter
         self.config = config
+        self.cache = cache
+        self.metrics = metrics
+        self.scheduler = scheduler or PriorityScheduler(rate_limiter)
+        self.estimator = estimator
 
     def send_invoice(
-        self, session_reference: str, access_token: str, invoice_xml: str
+        self,
+        session_reference: str,
+        access_token: str,
+        invoice_xml: str,
+        timeline: Optional[InvoiceTimeline] = None,
+        priority: str = PRIORITY_INTERACTIVE,
+        deadline: Optional[float] = None,
     ) -> Optional[str]:
-        self.rate_limiter.wait_if_needed()
+        timeline = timeline or NULL_TIMELINE
+
+        timeline.mark("limiter_start")
+        if not self._acquire(priority, deadline):
+            return None
+        timeline.mark("limiter_end")
 
-        encrypted_data = self._encrypt_invoice(invoice_xml)
-        if not encrypted_data:
+        timeline.mark("encrypt_start")
+        body = self._encrypt_invoice(invoice_xml)
+        timeline.mark("encrypt_end")
+        if not body:
             return None
 
-        return self._post_invoice(session_reference, access_token, encrypted_data)
+        timeline.mark("post_start")
+        reference = self._post_invoice(session_reference, access_token, body)
+        timeline.mark("post_end")
+        return reference
 
     def poll_status(
         self,
@@ -55,47 +98,264 @@ class InvoiceService:
         reference_number: str,
         max_attempts: int = DEFAULT_MAX_ATTEMPTS,
         delay_sec: int = DEFAULT_DELAY_SECONDS,
+        timeline: Optional[InvoiceTimeline] = None,
+        priority: str = PRIORITY_POLL,
+        deadline: Optional[float] = None,
     ) -> Optional[Dict]:
-        self.logger.info(f"Checking invoice status: {reference_number}")
+        timeline = timeline or NULL_TIMELINE
+        self.logger.info(
+            "Checking invoice status: %s",
+            reference_number,
+            referenceNumber=reference_number,
+        )
+
+        timeline.mark("poll_start")
+        plan = self._poll_plan(timeline, delay_sec)
 
         for attempt in range(1, max_attempts + 1):
-            if attempt > 1:
-                time.sleep(delay_sec)
+            time.sleep(plan.next_delay())
+
+            if not self._acquire(priority, deadline):
+                self._record_poll_attempts(attempt, "deadline")
+                return None
 
+            checked_at = time.time()
             status = self._check_status(
                 session_reference, access_token, reference_number
             )
 
             if status is None:
+                plan.pending()
                 self.logger.debug(
-                    f"Invoice not in list yet (attempt {attempt}/{max_attempts})"
+                    "Invoice not in list yet (attempt %d/%d)",
+                    attempt,
+                    max_attempts,
+                    referenceNumber=reference_number,
                 )
                 continue
 
+            timeline.mark_once("first_seen")
             result = self._process_status(
                 status, reference_number, attempt, max_attempts
             )
-            if result != "continue":
+            if result == "continue":
+                plan.pending()
+            else:
+                plan.finished(checked_at)
+                timeline.mark(result["status"])
+                self._record_poll_attempts(attempt, result["status"])
                 return result
 
-        self.logger.error(f"Max attempts ({max_attempts}) reached")
+        self.logger.error(
+            "Max attempts (%d) reached",
+            max_attempts,
+            referenceNumber=reference_number,
+        )
+        self._record_poll_attempts(max_attempts, "timeout")
         return None
 
-    def get_invoice_xml(self, ksef_number: str, access_token: str) -> Optional[str]:
-        self.logger.info(f"Downloading invoice: {ksef_number}")
+    def poll_statuses(
+        self,
+        session_reference: str,
+        access_token: str,
+        timelines: Dict[str, InvoiceTimeline],
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        delay_sec: int = DEFAULT_DELAY_SECONDS,
+        priority: str = PRIORITY_POLL,
+        deadline: Optional[float] = None,
+    ) -> Iterator[Tuple[str, Optional[Dict]]]:
+        for timeline in timelines.values():
+            timeline.mark("poll_start")
+        plans = {
+            reference: self._poll_plan(timeline, delay_sec)
+            for reference, timeline in timelines.items()
+        }
+        due = {reference: plan.next_delay() for reference, plan in plans.items()}
+        started = time.monotonic()
+
+        for attempt in range(1, max_attempts + 1):
+            time.sleep(max(min(due.values()) - (time.monotonic() - started), 0.0))
+
+            if not self._acquire(priority, deadline):
+                for reference in list(plans):
+                    self._record_poll_attempts(attempt, "deadline")
+                    yield reference, None
+                return
+
+            checked_at = time.time()
+            invoices = self._list_session_invoices(session_reference, access_token)
+            listed = {
+                invoice.get("referenceNumber"): invoice for invoice in invoices or []
+            }
+
+            for reference in list(plans):
+                invoice = listed.get(reference)
+                if invoice is not None:
+                    timelines[reference].mark_once("first_seen")
+                    result = self._process_status(
+                        invoice, reference, attempt, max_attempts
+                    )
+                else:
+                    result = "continue"
+
+                if result == "continue":
+                    plans[reference].pending()
+                    due[reference] = (
+                        time.monotonic() - started + (plans[reference].next_delay())
+                    )
+                    continue
+
+                plans.pop(reference).finished(checked_at)
+                due.pop(reference)
+                timelines[reference].mark(result["status"])
+                self._record_poll_attempts(attempt, result["status"])
+                yield reference, result
+
+            if not plans:
+                return
+
+        self.logger.error(
+            "Max attempts (%d) reached for %d invoices", max_attempts, len(plans)
+        )
+        for reference in plans:
+            self._record_poll_attempts(max_attempts, "timeout")
+            yield reference, None
 
-        endpoint = ENDPOINT_INVOICE_XML.format(number=ksef_number)
-        response = self.http.get_xml(endpoint, access_token)
+    def get_invoice_xml(
+        self,
+        ksef_number: str,
+        access_token: str,
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
+    ) -> Optional[str]:
+        return self._cached(
+            f"xml:{ksef_number}",
+            lambda: self._fetch_invoice_xml(
+                ksef_number, access_token, priority, deadline
+            ),
+        )
+
+    def get_invoice_content(
+        self,
+        ksef_number: str,
+        access_token: str,
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
+    ) -> Optional[bytes]:
+        response = self._download_invoice(ksef_number, access_token, priority, deadline)
+        return response.content if response is not None else None
+
+    def get_metadata(
+        self,
+        ksef_number: str,
+        access_token: str,
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
+    ) -> Optional[Dict]:
+        return self._cached(
+            f"metadata:{ksef_number}",
+            lambda: self._fetch_metadata(ksef_number, access_token, priority, deadline),
+        )
+
+    def cache_stats(self) -> Optional[Dict]:
+        return self.cache.stats() if self.cache else None
+
+    def search_invoices(
+        self,
+        access_token: str,
+        priority: str = PRIORITY_SEARCH,
+        deadline: Optional[float] = None,
+        **params,
+    ) -> Optional[Dict]:
+        query_params = self._extract_query_params(params)
+        body = build_search_body(params)
+
+        if not self._acquire(priority, deadline):
+            return None
+
+        self.logger.info("Searching invoices...")
+        response = self.http.post_json(
+            ENDPOINT_INVOICE_SEARCH, body, access_token, query_params
+        )
 
         if response.status_code == HTTP_OK:
-            self.logger.info(f"Invoice downloaded: {len(response.text)} bytes")
-            return response.text
+            results = response.json()
+            count = len(results.get("invoices", []))
+            self.logger.info("Found %s invoices", count)
+            return results
 
-        self.logger.error(f"Failed to download invoice: {response.status_code}")
+        self.logger.error("Search failed: %s", response.status_code)
         return None
 
-    def get_metadata(self, ksef_number: str, access_token: str) -> Optional[Dict]:
-        self.logger.info(f"Getting metadata: {ksef_number}")
+    def iter_search_pages(
+        self,
+        access_token: str,
+        priority: str = PRIORITY_SEARCH,
+        deadline: Optional[float] = None,
+        **params,
+    ) -> Iterator[Dict]:
+        page_offset = params.pop("page_offset", 0)
+
+        while True:
+            page = self.search_invoices(
+                access_token, priority, deadline, page_offset=page_offset, **params
+            )
+            if page is None:
+                raise SearchIncompleteError(page_offset)
+            if not page:
+                return
+
+            yield page
+
+            if page.get("isTruncated"):
+                self.logger.warning(
+                    "Search result truncated by KSeF, narrow the date range"
+                )
+            if not page.get("hasMore") or not page.get("invoices"):
+                return
+            page_offset += 1
+
+    def list_session_statuses(
+        self, session_reference: str, access_token: str
+    ) -> Optional[List[StatusEntry]]:
+        invoices = self._list_session_invoices(session_reference, access_token)
+        if invoices is None:
+            return None
+        return [StatusEntry.from_api(invoice) for invoice in invoices]
+
+    def _cached(self, key: str, loader: Callable):
+        if not self.cache:
+            return loader()
+        return self.cache.get_or_load(key, loader)
+
+    def _acquire(self, priority: str, deadline: Optional[float]) -> bool:
+        if self.scheduler.acquire(priority, deadline):
+            return True
+
+        self.logger.error("Deadline exceeded waiting for a %s request slot", priority)
+        return False
+
+    def _fetch_invoice_xml(
+        self,
+        ksef_number: str,
+        access_token: str,
+        priority: str,
+        deadline: Optional[float],
+    ) -> Optional[str]:
+        response = self._download_invoice(ksef_number, access_token, priority, deadline)
+        return response.text if response is not None else None
+
+    def _fetch_metadata(
+        self,
+        ksef_number: str,
+        access_token: str,
+        priority: str,
+        deadline: Optional[float],
+    ) -> Optional[Dict]:
+        if not self._acquire(priority, deadline):
+            return None
+
+        self.logger.info("Getting metadata: %s", ksef_number)
 
         endpoint = ENDPOINT_INVOICE_METADATA.format(number=ksef_number)
         response = self.http.get_json(endpoint, access_token)
@@ -104,65 +364,105 @@ class InvoiceService:
             self.logger.info("Metadata retrieved")
             return response.json()
 
-        self.logger.error(f"Failed to get metadata: {response.status_code}")
+        self.logger.error("Failed to get metadata: %s", response.status_code)
         return None
 
-    def search_invoices(self, access_token: str, **params) -> Optional[Dict]:
-        query_params = self._extract_query_params(params)
-        body = self._build_search_body(params)
+    def _download_invoice(
+        self,
+        ksef_number: str,
+        access_token: str,
+        priority: str = PRIORITY_DOWNLOAD,
+        deadline: Optional[float] = None,
+    ):
+        if not self._acquire(priority, deadline):
+            return None
 
-        self.logger.info("Searching invoices...")
-        response = self.http.post_json(
-            ENDPOINT_INVOICE_SEARCH, body, access_token, query_params
-        )
+        self.logger.info("Downloading invoice: %s", ksef_number, ksefNumber=ksef_number)
+
+        endpoint = ENDPOINT_INVOICE_XML.format(number=ksef_number)
+        response = self.http.get_xml(endpoint, access_token)
 
         if response.status_code == HTTP_OK:
-            results = response.json()
-            count = len(results.get("invoices", []))
-            self.logger.info(f"Found {count} invoices")
-            return results
+            self.logger.info(
+                "Invoice downloaded: %d bytes",
+                len(response.content),
+                ksefNumber=ksef_number,
+            )
+            return response
 
-        self.logger.error(f"Search failed: {response.status_code}")
+        self.logger.error("Failed to download invoice: %s", response.status_code)
         return None
 
-    def _encrypt_invoice(self, invoice_xml: str) -> Optional[Dict]:
+    def _encrypt_invoice(self, invoice_xml: str) -> Optional[bytearray]:
+        started = time.perf_counter()
         try:
-            return self.encryption.encrypt_invoice(invoice_xml)
+            return self.encryption.encrypt_invoice_body(invoice_xml)
         except Exception as e:
-            self.logger.error(f"Invoice encryption failed: {e}")
+            self.logger.error("Invoice encryption failed: %s", e)
             return None
+        finally:
+            if self.metrics:
+                self.metrics.histogram(
+                    "ksef_encryption_duration_seconds", "Encryption time."
+                ).observe(time.perf_counter() - started, operation="invoice")
+
+    def _record_poll_attempts(self, attempts: int, outcome: str):
+        if self.metrics:
+            self.metrics.histogram(
+                "ksef_poll_attempts",
+                "Status checks needed per invoice.",
+                POLL_ATTEMPT_BUCKETS,
+            ).observe(attempts, outcome=outcome)
 
     def _post_invoice(
-        self, session_reference: str, access_token: str, encrypted_data: Dict
+        self, session_reference: str, access_token: str, body: bytearray
     ) -> Optional[str]:
         endpoint = ENDPOINT_SESSION_INVOICES.format(session=session_reference)
-        response = self.http.post_json(endpoint, encrypted_data, access_token)
+        response = self.http.post_bytes(endpoint, body, access_token)
 
         if response.status_code == HTTP_ACCEPTED:
             reference_number = response.json().get("referenceNumber")
-            self.logger.info(f"Invoice sent: {reference_number}")
+            self.logger.info(
+                "Invoice sent: %s", reference_number, referenceNumber=reference_number
+            )
             return reference_number
 
-        self.logger.error(f"Invoice send failed: {response.status_code}")
+        self.logger.error(
+            "Invoice send failed: %d", response.status_code, status=response.status_code
+        )
         return None
 
+    def _poll_plan(self, timeline: InvoiceTimeline, delay_sec: float) -> PollPlan:
+        sent_at = timeline.marks.get("post_end") or time.time()
+        if self.estimator is None:
+            return PollPlan(None, sent_at, delay_sec, [])
+        return self.estimator.plan(sent_at, delay_sec)
+
     def _check_status(
         self, session_reference: str, access_token: str, reference_number: str
     ) -> Optional[Dict]:
+        invoices = self._list_session_invoices(session_reference, access_token)
+
+        return next(
+            (
+                inv
+                for inv in invoices or []
+                if inv.get("referenceNumber") == reference_number
+            ),
+            None,
+        )
+
+    def _list_session_invoices(
+        self, session_reference: str, access_token: str
+    ) -> Optional[List[Dict]]:
         endpoint = ENDPOINT_SESSION_INVOICE_LIST.format(session=session_reference)
         response = self.http.get_json(endpoint, access_token)
 
         if response.status_code != HTTP_OK:
-            self.logger.error(f"Failed to get invoice list: {response.status_code}")
+            self.logger.error("Failed to get invoice list: %s", response.status_code)
             return None
 
-        data = response.json()
-        invoices = data.get("invoices", [])
-
-        return next(
-            (inv for inv in invoices if inv.get("referenceNumber") == reference_number),
-            None,
-        )
+        return response.json().get("invoices", [])
 
     def _process_status(
         self, invoice: Dict, reference_number: str, attempt: int, max_attempts: int
@@ -176,21 +476,30 @@ class InvoiceService:
 
         if code in [STATUS_PROCESSING, STATUS_PROCESSING_EXTENDED]:
             self.logger.debug(
-                f"Invoice processing (code {code}, attempt {attempt}/{max_attempts})"
+                "Invoice processing (code %s, attempt %d/%d)",
+                code,
+                attempt,
+                max_attempts,
+                referenceNumber=reference_number,
             )
             return "continue"
 
         if code >= STATUS_ERROR_THRESHOLD:
             return self._handle_rejected(code, description, reference_number)
 
-        self.logger.warning(f"Unknown status code: {code}")
+        self.logger.warning("Unknown status code: %s", code)
         return "continue"
 
     def _handle_accepted(self, invoice: Dict, reference_number: str) -> Dict:
         ksef_number = invoice.get("ksefNumber")
         link = self.config.get_invoice_url(ksef_number)
 
-        self.logger.info(f"Invoice accepted: {ksef_number}")
+        self.logger.info(
+            "Invoice accepted: %s",
+            ksef_number,
+            ksefNumber=ksef_number,
+            referenceNumber=reference_number,
+        )
         return {
             "ksefNumber": ksef_number,
             "status": "accepted",
@@ -201,7 +510,13 @@ class InvoiceService:
     def _handle_rejected(
         self, code: int, description: str, reference_number: str
     ) -> Dict:
-        self.logger.error(f"Invoice rejected (code {code}): {description}")
+        self.logger.error(
+            "Invoice rejected (code %s): %s",
+            code,
+            description,
+            referenceNumber=reference_number,
+            code=code,
+        )
         return {
             "status": "rejected",
             "code": code,
@@ -216,38 +531,3 @@ class InvoiceService:
             "pageOffset": params.get("page_offset", 0),
             "pageSize": params.get("page_size", 250),
         }
-
-    @staticmethod
-    def _build_search_body(params: Dict) -> Dict:
-        body = {
-            "subjectType": params["subject_type"],
-            "dateRange": {"dateType": params["date_type"], "from": params["date_from"]},
-        }
-
-        InvoiceService._add_optional_params(body, params)
-        return body
-
-    @staticmethod
-    def _add_optional_params(body: Dict, params: Dict):
-        optional_fields = {
-            "date_to": ("dateRange", "to"),
-            "ksef_number": ("ksefNumber",),
-            "invoice_number": ("invoiceNumber",),
-            "seller_nip": ("sellerNip",),
-            "buyer_identifier": ("buyerIdentifier",),
-            "amount": ("amount",),
-            "currency_codes": ("currencyCodes",),
-            "invoicing_mode": ("invoicingMode",),
-            "is_self_invoicing": ("isSelfInvoicing",),
-            "form_type": ("formType",),
-            "invoice_types": ("invoiceTypes",),
-            "has_attachment": ("hasAttachment",),
-        }
-
-        for param_key, body_path in optional_fields.items():
-            value = params.get(param_key)
-            if value is not None:
-                if len(body_path) == 2:
-                    body[body_path[0]][body_path[1]] = value
-                else:
-                    body[body_path[0]] = value
@@ -1,11 +1,37 @@
+import atexit
+import json
 import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from ksef.constants import LOG_FORMAT, LOG_FORMAT_CONSOLE
+from typing import List, Optional
+from ksef.constants import (
+    LOG_BACKUP_COUNT,
+    LOG_FORMAT,
+    LOG_FORMAT_CONSOLE,
+    LOG_FORMAT_JSON,
+)
 
 
 class LoggerService:
 
-    def __init__(self, name: str, log_file: str, level_file: str, level_console: str):
+    def __init__(
+        self,
+        name: str,
+        log_file: str,
+        level_file: str,
+        level_console: str,
+        log_format: str = "text",
+        async_logging: bool = False,
+        max_bytes: int = 0,
+        backup_count: int = LOG_BACKUP_COUNT,
+    ):
+        self.log_format = log_format
+        self.async_logging = async_logging
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.listener: Optional[QueueListener] = None
         self.logger = self._setup_logger(name, log_file, level_file, level_console)
 
     def _setup_logger(
@@ -15,11 +41,14 @@ class LoggerService:
         self._ensure_log_directory(log_file)
 
         logger = logging.getLogger(name)
-        logger.setLevel(logging.DEBUG)
 
         if not logger.handlers:
-            self._add_file_handler(logger, log_file, level_file)
-            self._add_console_handler(logger, level_console)
+            handlers = [
+                self._build_file_handler(log_file, level_file),
+                self._build_console_handler(level_console),
+            ]
+            logger.setLevel(min(handler.level for handler in handlers))
+            self._attach_handlers(logger, handlers)
 
         return logger
 
@@ -28,26 +57,91 @@ class LoggerService:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
 
-    def _add_file_handler(self, logger: logging.Logger, log_file: str, level: str):
-        handler = logging.FileHandler(log_file, encoding="utf-8")
+    def _attach_handlers(self, logger: logging.Logger, handlers: List[logging.Handler]):
+        if not self.async_logging:
+            for handler in handlers:
+                logger.addHandler(handler)
+            return
+
+        records = queue.SimpleQueue()
+        logger.addHandler(_DeferredQueueHandler(records))
+
+        self.listener = QueueListener(records, *handlers, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def _build_file_handler(self, log_file: str, level: str) -> logging.Handler:
+        if self.max_bytes > 0:
+            handler = RotatingFileHandler(
+                log_file,
+                maxBytes=self.max_bytes,
+                backupCount=self.backup_count,
+                encoding="utf-8",
+            )
+        else:
+            handler = logging.FileHandler(log_file, encoding="utf-8")
+
         handler.setLevel(getattr(logging, level))
-        handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        logger.addHandler(handler)
+        if self.log_format == LOG_FORMAT_JSON:
+            handler.setFormatter(_JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        return handler
 
-    def _add_console_handler(self, logger: logging.Logger, level: str):
+    @staticmethod
+    def _build_console_handler(level: str) -> logging.Handler:
         handler = logging.StreamHandler()
         handler.setLevel(getattr(logging, level))
         handler.setFormatter(logging.Formatter(LOG_FORMAT_CONSOLE))
-        logger.addHandler(handler)
+        return handler
+
+    def info(self, message: str, *args, **fields):
+        self._log(logging.INFO, message, args, fields)
+
+    def debug(self, message: str, *args, **fields):
+        self._log(logging.DEBUG, message, args, fields)
+
+    def warning(self, message: str, *args, **fields):
+        self._log(logging.WARNING, message, args, fields)
+
+    def error(self, message: str, *args, exc_info: bool = False, **fields):
+        self._log(logging.ERROR, message, args, fields, exc_info)
+
+    def close(self):
+        if self.listener:
+            self.listener.stop()
+            self.listener = None
+
+    def _log(self, level: int, message: str, args: tuple, fields: dict, exc_info=False):
+        if not self.logger.isEnabledFor(level):
+            return
+
+        self.logger.log(
+            level,
+            message,
+            *args,
+            exc_info=exc_info,
+            extra={"fields": fields} if fields else None,
+            stacklevel=3,
+        )
+
+
+class _DeferredQueueHandler(QueueHandler):
 
-    def info(self, message: str):
-        self.logger.info(message)
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
-    def debug(self, message: str):
-        self.logger.debug(message)
 
-    def warning(self, message: str):
-        self.logger.warning(message)
+class _JsonFormatter(logging.Formatter):
 
-    def error(self, message: str, exc_info: bool = False):
-        self.logger.error(message, exc_info=exc_info)
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
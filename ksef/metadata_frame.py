@@ -0,0 +1,460 @@
+import math
+from array import array
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+from ksef.constants import FRAME_AMOUNT_COLUMNS, FRAME_MATCH_TOLERANCE
+from ksef.records import InvoiceMetadata
+
+_NAN = float("nan")
+_NO_MATCH = -2
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class _Categorical(NamedTuple):
+    codes: Any
+    categories: List
+
+
+class MetadataFrame:
+
+    def __init__(
+        self,
+        columns: Optional[Dict[str, Sequence]] = None,
+        use_numpy: Optional[bool] = None,
+    ):
+        self._np = _resolve_numpy(use_numpy)
+        self._columns: Dict[str, Any] = {}
+        self._size = 0
+
+        for name, values in (columns or {}).items():
+            values = list(values)
+            if self._columns and len(values) != self._size:
+                raise ValueError(f"Column {name!r} has {len(values)} rows")
+            self._size = len(values)
+            self._columns[name] = self._encode(values, name in FRAME_AMOUNT_COLUMNS)
+
+    @classmethod
+    def from_records(
+        cls, records: Iterable[Any], use_numpy: Optional[bool] = None
+    ) -> "MetadataFrame":
+        fields = [name for name in InvoiceMetadata.__slots__ if name != "extra"]
+        values = attrgetter(*fields)
+        rows = []
+        flat_rows = []
+
+        for record in records:
+            if isinstance(record, dict):
+                if "ksefNumber" not in record:
+                    flat_rows.append(record)
+                    continue
+                record = InvoiceMetadata.from_api(record)
+            rows.append(values(record))
+
+        if rows and flat_rows:
+            raise ValueError("Cannot mix invoice metadata with plain rows")
+        if flat_rows:
+            return cls(_flat_columns(flat_rows), use_numpy)
+        return cls(
+            dict(zip(fields, zip(*rows) if rows else [()] * len(fields))), use_numpy
+        )
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    @property
+    def uses_numpy(self) -> bool:
+        return self._np is not None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __repr__(self) -> str:
+        return f"MetadataFrame(rows={self._size}, columns={self.columns})"
+
+    def column(self, name: str):
+        column = self._column(name)
+        if not isinstance(column, _Categorical):
+            return column
+        categories = column.categories + [None]
+        return [categories[code] for code in column.codes]
+
+    def sum(self, name: str) -> float:
+        values = self._numeric(name)
+        if self._np is not None:
+            return float(self._np.nansum(values))
+        return math.fsum(value for value in values if value == value)
+
+    def eq(self, name: str, value: Any):
+        return self.isin(name, (value,))
+
+    def isin(self, name: str, values: Iterable[Any]):
+        wanted = set(values)
+        column = self._column(name)
+
+        if isinstance(column, _Categorical):
+            table = [category in wanted for category in column.categories]
+            return self._lookup(table + [None in wanted], column.codes)
+
+        if self._np is not None:
+            return self._np.isin(column, list(wanted))
+        return [value in wanted for value in column]
+
+    def between(self, name: str, low: Any = None, high: Any = None):
+        column = self._column(name)
+
+        if isinstance(column, _Categorical):
+            table = [_within(category, low, high) for category in column.categories]
+            return self._lookup(table + [False], column.codes)
+
+        if self._np is not None:
+            mask = self._np.ones(self._size, dtype=bool)
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+            return mask
+        return [_within(value, low, high) for value in column]
+
+    def mismatches(
+        self,
+        name: str,
+        other: str,
+        tolerance: float = FRAME_MATCH_TOLERANCE,
+    ):
+        left = self._numeric(name)
+        right = self._numeric(other)
+
+        if self._np is not None:
+            np = self._np
+            with np.errstate(invalid="ignore"):
+                differs = np.abs(left - right) > tolerance
+            return differs | (np.isnan(left) ^ np.isnan(right))
+
+        return [
+            (a != a) != (b != b) or abs(a - b) > tolerance for a, b in zip(left, right)
+        ]
+
+    def filter(self, *masks) -> "MetadataFrame":
+        if not masks:
+            return self._take(range(self._size))
+
+        if self._np is not None:
+            combined = self._np.logical_and.reduce([self._np.asarray(m) for m in masks])
+            return self._take(self._np.flatnonzero(combined))
+
+        return self._take([i for i, row in enumerate(zip(*masks)) if all(row)])
+
+    def where(self, **conditions) -> "MetadataFrame":
+        masks = [
+            (
+                self.isin(name, value)
+                if isinstance(value, (list, tuple, set, frozenset))
+                else self.eq(name, value)
+            )
+            for name, value in conditions.items()
+        ]
+        return self.filter(*masks)
+
+    def group_sum(
+        self, by: Sequence[str], values: Sequence[str] = FRAME_AMOUNT_COLUMNS
+    ) -> "MetadataFrame":
+        if isinstance(by, str):
+            by = (by,)
+        keys = [self._categorical(name) for name in by]
+
+        if self._np is not None and _fits_int64(keys):
+            first, inverse, groups = self._group_numpy(keys)
+            np = self._np
+            sums = {
+                name: np.bincount(
+                    inverse,
+                    weights=np.nan_to_num(self._numeric(name)),
+                    minlength=groups,
+                )
+                for name in values
+            }
+            counts = np.bincount(inverse, minlength=groups)
+        else:
+            first, sums, counts = self._group_python(keys, values)
+
+        result = self._wrap(len(first))
+        for name, key in zip(by, keys):
+            result._columns[name] = _Categorical(
+                self._take_codes(key.codes, first), key.categories
+            )
+        for name in values:
+            result._columns[name] = sums[name]
+        result._columns["count"] = counts
+        return result
+
+    def join(
+        self,
+        other: "MetadataFrame",
+        on: Sequence[str],
+        how: str = "inner",
+        suffix: str = "_ledger",
+    ) -> "MetadataFrame":
+        if how not in ("inner", "left"):
+            raise ValueError(f"Unsupported join type: {how}")
+        if isinstance(on, str):
+            on = (on,)
+        if other._np is not self._np:
+            raise ValueError("Cannot join frames with and without NumPy")
+
+        right = self._match_rows(other, on)
+
+        if how == "inner":
+            if self._np is not None:
+                left = self._np.flatnonzero(right >= 0)
+                right = right[left]
+            else:
+                left = [i for i, index in enumerate(right) if index >= 0]
+                right = [right[i] for i in left]
+        else:
+            left = range(self._size)
+
+        result = self._take(left)
+        for name, column in other._columns.items():
+            if name in on:
+                continue
+            target = f"{name}{suffix}" if name in result._columns else name
+            result._columns[target] = result._take_column(column, right, missing=True)
+        return result
+
+    def to_dicts(self) -> List[Dict]:
+        return list(self.iter_rows())
+
+    def iter_rows(self) -> Iterator[Dict]:
+        decoded = {
+            name: (
+                self.column(name)
+                if isinstance(column, _Categorical)
+                else [None if value != value else value for value in _tolist(column)]
+            )
+            for name, column in self._columns.items()
+        }
+        for i in range(self._size):
+            yield {name: values[i] for name, values in decoded.items()}
+
+    def _encode(self, values: List, numeric: bool = False):
+        if numeric or _is_numeric(values):
+            return self._floats([_NAN if v is None else float(v) for v in values])
+
+        lookup: Dict[Any, int] = {}
+        categories: List = []
+        codes = []
+        for value in values:
+            if value is None:
+                codes.append(-1)
+                continue
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(categories)
+                categories.append(value)
+            codes.append(code)
+        return _Categorical(self._ints(codes), categories)
+
+    def _floats(self, values):
+        if self._np is not None:
+            return self._np.asarray(values, dtype=self._np.float64)
+        return array("d", values)
+
+    def _ints(self, values):
+        if self._np is not None:
+            return self._np.asarray(values, dtype=self._np.int64)
+        return array("q", values)
+
+    def _lookup(self, table: List, codes):
+        if self._np is not None:
+            return self._np.asarray(table, dtype=bool)[codes]
+        return [table[code] for code in codes]
+
+    def _column(self, name: str):
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise KeyError(f"Unknown column: {name}") from None
+
+    def _numeric(self, name: str):
+        column = self._column(name)
+        if isinstance(column, _Categorical):
+            raise TypeError(f"Column {name!r} is not numeric")
+        return column
+
+    def _categorical(self, name: str) -> _Categorical:
+        column = self._column(name)
+        if not isinstance(column, _Categorical):
+            raise TypeError(f"Column {name!r} is numeric, cannot group or join on it")
+        return column
+
+    def _wrap(self, size: int) -> "MetadataFrame":
+        frame = MetadataFrame.__new__(MetadataFrame)
+        frame._np = self._np
+        frame._columns = {}
+        frame._size = size
+        return frame
+
+    def _take(self, indices) -> "MetadataFrame":
+        if self._np is not None:
+            indices = self._np.asarray(indices, dtype=self._np.int64)
+        frame = self._wrap(len(indices))
+        for name, column in self._columns.items():
+            frame._columns[name] = self._take_column(column, indices)
+        return frame
+
+    def _take_column(self, column, indices, missing: bool = False):
+        if isinstance(column, _Categorical):
+            codes = self._take_codes(column.codes, indices, missing)
+            return _Categorical(codes, column.categories)
+
+        if self._np is not None:
+            if not missing:
+                return column[indices]
+            taken = _np_take(self._np, column, indices, _NAN)
+            return taken.astype(self._np.float64)
+        if missing:
+            return array("d", (column[i] if i >= 0 else _NAN for i in indices))
+        return array("d", (column[i] for i in indices))
+
+    def _take_codes(self, codes, indices, missing: bool = False):
+        if self._np is not None:
+            if not missing:
+                return codes[indices]
+            return _np_take(self._np, codes, indices, -1)
+        return array("q", (codes[i] if i >= 0 else -1 for i in indices))
+
+    def _group_numpy(self, keys: List[_Categorical]):
+        np = self._np
+        group_ids = np.zeros(self._size, dtype=np.int64)
+        for key in keys:
+            group_ids = group_ids * (len(key.categories) + 1) + (key.codes + 1)
+
+        _, first, inverse = np.unique(group_ids, return_index=True, return_inverse=True)
+        return first, inverse.reshape(-1), len(first)
+
+    def _group_python(self, keys: List[_Categorical], values: Sequence[str]):
+        columns = [self._numeric(name) for name in values]
+        groups: Dict[tuple, list] = {}
+
+        for i, key in enumerate(zip(*(k.codes for k in keys))):
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [i, 0] + [0.0] * len(columns)
+            group[1] += 1
+            for j, column in enumerate(columns):
+                value = column[i]
+                if value == value:
+                    group[2 + j] += value
+
+        ordered = [groups[key] for key in sorted(groups)]
+        first = array("q", (group[0] for group in ordered))
+        sums = {
+            name: array("d", (group[2 + j] for group in ordered))
+            for j, name in enumerate(values)
+        }
+        counts = array("q", (group[1] for group in ordered))
+        return first, sums, counts
+
+    def _match_rows(self, other: "MetadataFrame", on: Sequence[str]):
+        np = self._np
+        own_keys = [self._categorical(name) for name in on]
+        other_keys = [other._categorical(name) for name in on]
+
+        own_ids = self._ints([0] * self._size)
+        other_ids = other._ints([0] * len(other))
+        valid = [True] * self._size if np is None else np.ones(self._size, dtype=bool)
+
+        for own, theirs in zip(own_keys, other_keys):
+            lookup = {value: code for code, value in enumerate(theirs.categories)}
+            table = [lookup.get(value, _NO_MATCH) for value in own.categories]
+            translated = self._ints(table + [_NO_MATCH])
+            base = len(theirs.categories) + 1
+
+            if np is not None:
+                codes = translated[own.codes]
+                valid &= codes >= 0
+                own_ids = own_ids * base + (codes + 1)
+                other_ids = other_ids * base + (np.asarray(theirs.codes) + 1)
+            else:
+                codes = [translated[code] for code in own.codes]
+                valid = [ok and code >= 0 for ok, code in zip(valid, codes)]
+                own_ids = [i * base + code + 1 for i, code in zip(own_ids, codes)]
+                other_ids = [
+                    i * base + code + 1 for i, code in zip(other_ids, theirs.codes)
+                ]
+
+        if np is None:
+            index: Dict[int, int] = {}
+            for position, key in enumerate(other_ids):
+                index.setdefault(key, position)
+            return [index.get(key, -1) if ok else -1 for key, ok in zip(own_ids, valid)]
+
+        if not len(other):
+            return np.full(self._size, -1, dtype=np.int64)
+        order = np.argsort(other_ids, kind="stable")
+        ordered = other_ids[order]
+        positions = np.minimum(np.searchsorted(ordered, own_ids), len(ordered) - 1)
+        matched = valid & (ordered[positions] == own_ids)
+        return np.where(matched, order[positions], -1)
+
+
+def _resolve_numpy(use_numpy: Optional[bool]):
+    if use_numpy is False:
+        return None
+    np = _numpy()
+    if use_numpy and np is None:
+        raise RuntimeError("MetadataFrame(use_numpy=True) requires the 'numpy' package")
+    return np
+
+
+def _flat_columns(rows: List[Dict]) -> Dict[str, List]:
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    return {name: [row.get(name) for row in rows] for name in names}
+
+
+def _is_numeric(values: List) -> bool:
+    seen = False
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        seen = True
+    return seen
+
+
+def _within(value: Any, low: Any, high: Any) -> bool:
+    if value is None or value != value:
+        return False
+    if low is not None and value < low:
+        return False
+    if high is not None and value > high:
+        return False
+    return True
+
+
+def _fits_int64(keys: List[_Categorical]) -> bool:
+    return math.prod(len(key.categories) + 1 for key in keys) < 2**62
+
+
+def _np_take(np, values, indices, fill):
+    indices = np.asarray(indices, dtype=np.int64)
+    if not len(values):
+        return np.full(len(indices), fill, dtype=values.dtype)
+    taken = values[np.maximum(indices, 0)]
+    taken[indices < 0] = fill
+    return taken
+
+
+def _tolist(values) -> List:
+    return values.tolist()
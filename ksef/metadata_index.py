@@ -0,0 +1,207 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from ksef.constants import INDEX_DATE_COLUMNS
+
+
+class MetadataIndex:
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS invoices (
+            ksef_number TEXT PRIMARY KEY,
+            invoice_number TEXT,
+            seller_nip TEXT,
+            seller_name TEXT,
+            buyer_identifier TEXT,
+            buyer_name TEXT,
+            issue_date TEXT,
+            invoicing_date TEXT,
+            acquisition_date TEXT,
+            net_amount REAL,
+            vat_amount REAL,
+            gross_amount REAL,
+            currency TEXT,
+            form_type TEXT,
+            invoice_type TEXT,
+            invoice_hash TEXT,
+            downloaded INTEGER NOT NULL DEFAULT 0,
+            download_path TEXT,
+            raw TEXT
+        );
+        CREATE INDEX IF NOT EXISTS ix_invoices_seller ON invoices (seller_nip);
+        CREATE INDEX IF NOT EXISTS ix_invoices_buyer ON invoices (buyer_identifier);
+        CREATE INDEX IF NOT EXISTS ix_invoices_issue ON invoices (issue_date);
+        CREATE INDEX IF NOT EXISTS ix_invoices_invoicing ON invoices (invoicing_date);
+        CREATE INDEX IF NOT EXISTS ix_invoices_currency ON invoices (currency);
+        CREATE INDEX IF NOT EXISTS ix_invoices_gross ON invoices (gross_amount);
+    """
+
+    _UPSERT = """
+        INSERT INTO invoices (
+            ksef_number, invoice_number, seller_nip, seller_name,
+            buyer_identifier, buyer_name, issue_date, invoicing_date,
+            acquisition_date, net_amount, vat_amount, gross_amount, currency,
+            form_type, invoice_type, invoice_hash, raw
+        ) VALUES (
+            :ksef_number, :invoice_number, :seller_nip, :seller_name,
+            :buyer_identifier, :buyer_name, :issue_date, :invoicing_date,
+            :acquisition_date, :net_amount, :vat_amount, :gross_amount, :currency,
+            :form_type, :invoice_type, :invoice_hash, :raw
+        )
+        ON CONFLICT (ksef_number) DO UPDATE SET
+            invoice_number = excluded.invoice_number,
+            seller_nip = excluded.seller_nip,
+            seller_name = excluded.seller_name,
+            buyer_identifier = excluded.buyer_identifier,
+            buyer_name = excluded.buyer_name,
+            issue_date = excluded.issue_date,
+            invoicing_date = excluded.invoicing_date,
+            acquisition_date = excluded.acquisition_date,
+            net_amount = excluded.net_amount,
+            vat_amount = excluded.vat_amount,
+            gross_amount = excluded.gross_amount,
+            currency = excluded.currency,
+            form_type = excluded.form_type,
+            invoice_type = excluded.invoice_type,
+            invoice_hash = excluded.invoice_hash,
+            raw = excluded.raw
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._connection = self._connect(db_path)
+
+    def add_invoices(self, invoices: Iterable[Dict]) -> int:
+        rows = [self._to_row(invoice) for invoice in invoices]
+
+        with self._lock, self._connection:
+            self._connection.executemany(self._UPSERT, rows)
+
+        return len(rows)
+
+    def mark_downloaded(self, ksef_number: str, path: str):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE invoices SET downloaded = 1, download_path = ? "
+                "WHERE ksef_number = ?",
+                (path, ksef_number),
+            )
+
+    def get(self, ksef_number: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM invoices WHERE ksef_number = ?", (ksef_number,)
+            ).fetchone()
+        return self._from_row(row) if row else None
+
+    def query(self, **filters) -> List[Dict]:
+        where, args = self._build_where(filters)
+        sql = f"SELECT * FROM invoices{where} ORDER BY issue_date DESC, ksef_number"
+
+        if filters.get("limit"):
+            sql += " LIMIT ?"
+            args.append(int(filters["limit"]))
+
+        with self._lock:
+            rows = self._connection.execute(sql, args).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def count(self, **filters) -> int:
+        where, args = self._build_where(filters)
+
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT COUNT(*) FROM invoices{where}", args
+            ).fetchone()
+        return row[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _connect(self, db_path: str) -> sqlite3.Connection:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        connection = sqlite3.connect(db_path, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(self._SCHEMA)
+        return connection
+
+    @staticmethod
+    def _to_row(invoice: Dict) -> Dict:
+        seller = invoice.get("seller") or {}
+        buyer = invoice.get("buyer") or {}
+        buyer_id = buyer.get("identifier") or {}
+        form_code = invoice.get("formCode") or {}
+
+        return {
+            "ksef_number": invoice["ksefNumber"],
+            "invoice_number": invoice.get("invoiceNumber"),
+            "seller_nip": seller.get("nip"),
+            "seller_name": seller.get("name"),
+            "buyer_identifier": buyer_id.get("value"),
+            "buyer_name": buyer.get("name"),
+            "issue_date": invoice.get("issueDate"),
+            "invoicing_date": invoice.get("invoicingDate"),
+            "acquisition_date": invoice.get("acquisitionDate"),
+            "net_amount": invoice.get("netAmount"),
+            "vat_amount": invoice.get("vatAmount"),
+            "gross_amount": invoice.get("grossAmount"),
+            "currency": invoice.get("currency"),
+            "form_type": form_code.get("value"),
+            "invoice_type": invoice.get("invoiceType"),
+            "invoice_hash": invoice.get("invoiceHash"),
+            "raw": json.dumps(invoice, ensure_ascii=False),
+        }
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        record["downloaded"] = bool(record["downloaded"])
+        record.pop("raw", None)
+        return record
+
+    @staticmethod
+    def _build_where(filters: Dict):
+        clauses = []
+        args = []
+
+        equality_fields = {
+            "seller_nip": "seller_nip",
+            "buyer_identifier": "buyer_identifier",
+            "currency": "currency",
+            "form_type": "form_type",
+            "invoice_type": "invoice_type",
+        }
+
+        for param_key, column in equality_fields.items():
+            value = filters.get(param_key)
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+
+        date_column = INDEX_DATE_COLUMNS[filters.get("date_type") or "Issue"]
+        if filters.get("date_from"):
+            clauses.append(f"{date_column} >= ?")
+            args.append(filters["date_from"])
+        if filters.get("date_to"):
+            clauses.append(f"substr({date_column}, 1, 10) <= ?")
+            args.append(filters["date_to"])
+
+        if filters.get("min_amount") is not None:
+            clauses.append("gross_amount >= ?")
+            args.append(filters["min_amount"])
+        if filters.get("max_amount") is not None:
+            clauses.append("gross_amount <= ?")
+            args.append(filters["max_amount"])
+
+        if filters.get("downloaded") is not None:
+            clauses.append("downloaded = ?")
+            args.append(1 if filters["downloaded"] else 0)
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, args
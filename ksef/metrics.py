@@ -0,0 +1,251 @@
+import bisect
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+from ksef import constants
+from ksef.constants import (
+    HTTP_OK,
+    LATENCY_BUCKETS,
+    METRICS_CONTENT_TYPE,
+    METRICS_WRITE_INTERVAL,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format(value)}")
+        return lines
+
+
+class Gauge:
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format(value)}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = sorted(buckets)
+        self._values: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 3)
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    labels = _format_labels(key + (("le", _format(bound)),))
+                    lines.append(f"{self.name}_bucket{labels} {_format(cumulative)}")
+
+                labels = _format_labels(key + (("le", "+Inf"),))
+                lines.append(f"{self.name}_bucket{labels} {_format(state[-1])}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {state[-2]!r}")
+                lines.append(
+                    f"{self.name}_count{_format_labels(key)} {_format(state[-1])}"
+                )
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get_or_create(name, lambda: Gauge(name, help_text))
+
+    def histogram(
+        self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_to_file(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        partial = f"{path}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(partial, path)
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+
+class MetricsExporter:
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        file_path: str = "",
+        port: int = 0,
+        interval: float = METRICS_WRITE_INTERVAL,
+    ):
+        self.registry = registry
+        self.file_path = file_path
+        self.port = port
+        self.interval = interval
+        self._stop = threading.Event()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._writer: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.port:
+            self._httpd = ThreadingHTTPServer(
+                ("127.0.0.1", self.port), _make_handler(self.registry)
+            )
+            threading.Thread(
+                target=self._httpd.serve_forever, name="ksef-metrics", daemon=True
+            ).start()
+
+        if self.file_path:
+            self._writer = threading.Thread(
+                target=self._write_loop, name="ksef-metrics-file", daemon=True
+            )
+            self._writer.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        if self._writer:
+            self._writer.join()
+        if self.file_path:
+            self.registry.write_to_file(self.file_path)
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            self.registry.write_to_file(self.file_path)
+
+
+def endpoint_template(endpoint: str) -> str:
+    for pattern, template in _ENDPOINT_PATTERNS:
+        if pattern.fullmatch(endpoint):
+            return template
+    return "other"
+
+
+def _build_endpoint_patterns() -> List[Tuple["re.Pattern", str]]:
+    templates = [
+        value
+        for name, value in vars(constants).items()
+        if name.startswith("ENDPOINT_") and isinstance(value, str)
+    ]
+    templates.sort(key=lambda template: ("{" in template, -len(template)))
+
+    return [
+        (re.compile(re.sub(r"\\{\w+\\}", "[^/]+", re.escape(template))), template)
+        for template in templates
+    ]
+
+
+_ENDPOINT_PATTERNS = _build_endpoint_patterns()
+
+
+def _make_handler(registry: MetricsRegistry):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            data = registry.render().encode("utf-8")
+            self.send_response(HTTP_OK)
+            self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args):
+            pass
+
+    return Handler
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    pairs = (f'{name}="{_escape(value)}"' for name, value in key)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
@@ -0,0 +1,204 @@
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from ksef.constants import (
+    DEFAULT_ENCODING,
+    OFFLINE_SPOOL_DRAINED_FILE,
+    OFFLINE_SPOOL_FAILED_DIR,
+    OFFLINE_SPOOL_LOCK_FILE,
+    OFFLINE_SPOOL_LOCK_REFRESH,
+    OFFLINE_SPOOL_LOCK_TTL,
+    OFFLINE_SPOOL_MAX_ATTEMPTS,
+)
+from ksef.metrics import MetricsRegistry
+
+
+class SpoolEntry(NamedTuple):
+    entry_id: str
+    path: str
+    source: Dict
+    spooled_at: str
+
+
+class OfflineSpool:
+
+    def __init__(self, directory: str, metrics: Optional[MetricsRegistry] = None):
+        self.directory = directory
+        self.metrics = metrics
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._depth = len(self._entry_ids())
+        self._publish_depth()
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def put(self, invoice_xml: str, source: Optional[Dict] = None) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        entry_id = f"{time.time_ns():020d}-{os.getpid()}-{next(self._sequence):06d}"
+
+        meta = {
+            "source": source or {},
+            "spooledAt": datetime.now(timezone.utc).isoformat(),
+        }
+        self._write_durably(
+            self._meta_path(entry_id), json.dumps(meta, ensure_ascii=False)
+        )
+        self._write_durably(self._xml_path(entry_id), invoice_xml)
+
+        with self._lock:
+            self._depth += 1
+        self._count("spooled")
+        return entry_id
+
+    def peek(self, limit: int) -> List[SpoolEntry]:
+        entries = []
+        for entry_id in self._entry_ids()[:limit]:
+            meta = self._read_meta(entry_id)
+            entries.append(
+                SpoolEntry(
+                    entry_id,
+                    self._xml_path(entry_id),
+                    meta.get("source", {}),
+                    meta.get("spooledAt", ""),
+                )
+            )
+        return entries
+
+    def load(self, entry: SpoolEntry) -> str:
+        with open(entry.path, "r", encoding=DEFAULT_ENCODING) as f:
+            return f.read()
+
+    def complete(self, entry: SpoolEntry, record: Dict):
+        line = json.dumps(
+            {
+                **record,
+                "spoolId": entry.entry_id,
+                "spooledAt": entry.spooled_at,
+                "drainedAt": datetime.now(timezone.utc).isoformat(),
+            },
+            ensure_ascii=False,
+        )
+        drained = os.path.join(self.directory, OFFLINE_SPOOL_DRAINED_FILE)
+        with open(drained, "a", encoding=DEFAULT_ENCODING) as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.remove(entry.path)
+        if os.path.exists(self._meta_path(entry.entry_id)):
+            os.remove(self._meta_path(entry.entry_id))
+
+        with self._lock:
+            self._depth = max(self._depth - 1, 0)
+        self._count("drained")
+
+    def fail(self, entry: SpoolEntry, record: Dict) -> bool:
+        meta = self._read_meta(entry.entry_id)
+        meta["attempts"] = meta.get("attempts", 0) + 1
+        meta["lastResult"] = record
+        content = json.dumps(meta, ensure_ascii=False)
+
+        if meta["attempts"] < OFFLINE_SPOOL_MAX_ATTEMPTS:
+            self._write_durably(self._meta_path(entry.entry_id), content)
+            return False
+
+        failed_dir = os.path.join(self.directory, OFFLINE_SPOOL_FAILED_DIR)
+        os.makedirs(failed_dir, exist_ok=True)
+        self._write_durably(os.path.join(failed_dir, f"{entry.entry_id}.json"), content)
+        os.replace(entry.path, os.path.join(failed_dir, f"{entry.entry_id}.xml"))
+        if os.path.exists(self._meta_path(entry.entry_id)):
+            os.remove(self._meta_path(entry.entry_id))
+
+        with self._lock:
+            self._depth = max(self._depth - 1, 0)
+        self._count("failed")
+        return True
+
+    @contextmanager
+    def drain_lock(self) -> Iterator[bool]:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, OFFLINE_SPOOL_LOCK_FILE)
+
+        if os.path.exists(path):
+            if time.time() - os.path.getmtime(path) < OFFLINE_SPOOL_LOCK_TTL:
+                yield False
+                return
+            os.remove(path)
+
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            yield False
+            return
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._refresh_lock, args=(path, stop), daemon=True
+        )
+        try:
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            heartbeat.start()
+            yield True
+        finally:
+            stop.set()
+            if heartbeat.is_alive():
+                heartbeat.join()
+            os.remove(path)
+
+    @staticmethod
+    def _refresh_lock(path: str, stop: threading.Event):
+        while not stop.wait(OFFLINE_SPOOL_LOCK_REFRESH):
+            try:
+                os.utime(path)
+            except OSError:
+                return
+
+    def _entry_ids(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-4] for name in names if name.endswith(".xml"))
+
+    def _read_meta(self, entry_id: str) -> Dict:
+        try:
+            with open(self._meta_path(entry_id), "r", encoding=DEFAULT_ENCODING) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _xml_path(self, entry_id: str) -> str:
+        return os.path.join(self.directory, f"{entry_id}.xml")
+
+    def _meta_path(self, entry_id: str) -> str:
+        return os.path.join(self.directory, f"{entry_id}.json")
+
+    @staticmethod
+    def _write_durably(path: str, content: str):
+        partial = f"{path}.tmp"
+        with open(partial, "w", encoding=DEFAULT_ENCODING) as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, path)
+
+    def _count(self, event: str):
+        self._publish_depth()
+        if self.metrics:
+            self.metrics.counter(
+                "ksef_offline_spool_total", "Invoices spooled and drained offline."
+            ).inc(event=event)
+
+    def _publish_depth(self):
+        if self.metrics:
+            self.metrics.gauge(
+                "ksef_offline_spool_depth", "Invoices waiting in the offline spool."
+            ).set(self._depth)
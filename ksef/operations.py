@@ -1,9 +1,14 @@
 import os
-from typing import Dict, Tuple
+from itertools import chain
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Tuple
 from ksef.client import KSeFClient
-from ksef.utils import load_invoice_from_file, load_invoices_from_directory
+from ksef.records import InvoiceMetadata
+from ksef.utils import load_invoice_from_file, iter_invoices_from_directory
 from ksef.constants import DEFAULT_DOWNLOAD_DIR, DEFAULT_SEND_DIR
 
+if TYPE_CHECKING:
+    from ksef.result_sinks import ResultSink
+
 
 def send_xml_from_file(client: KSeFClient, xml_path: str) -> Dict:
     _validate_file_exists(xml_path)
@@ -12,21 +17,35 @@ def send_xml_from_file(client: KSeFClient, xml_path: str) -> Dict:
 
 
 def send_xmls_from_directory(
-    client: KSeFClient, directory: str = DEFAULT_SEND_DIR
+    client: KSeFClient,
+    directory: str = DEFAULT_SEND_DIR,
+    result_sink: Optional["ResultSink"] = None,
 ) -> Dict:
     _validate_directory_exists(directory)
 
-    invoices = load_invoices_from_directory(directory)
-    if not invoices:
-        return _empty_results()
+    invoices = iter_invoices_from_directory(directory)
+    first = next(invoices, None)
+    if first is None:
+        results = _empty_results()
+        if result_sink is not None:
+            del results["results"]
+        return results
 
-    return client.send_multiple_invoices(invoices)
+    return client.send_multiple_invoices(
+        chain([first], invoices), result_sink=result_sink
+    )
 
 
 def search_invoices_from_ksef(client: KSeFClient, **search_params) -> Dict:
     return client.search_invoices(**search_params)
 
 
+def iter_search_from_ksef(
+    client: KSeFClient, **search_params
+) -> Iterator[InvoiceMetadata]:
+    return client.iter_search(**search_params)
+
+
 def download_invoice(
     client: KSeFClient, ksef_number: str, output_dir: str = DEFAULT_DOWNLOAD_DIR
 ) -> Tuple[bool, str]:
@@ -55,4 +74,4 @@ def _build_output_path(output_dir: str, ksef_number: str) -> str:
 
 
 def _empty_results() -> Dict:
-    return {"total": 0, "successful": 0, "failed": 0, "results": []}
+    return {"total": 0, "successful": 0, "failed": 0, "spooled": 0, "results": []}
@@ -0,0 +1,193 @@
+import gzip
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Optional
+from ksef.download_store import DownloadStore
+from ksef.constants import PARTIAL_SUFFIX, SINK_INDEX_SUFFIX
+
+
+class OutputSink(ABC):
+
+    def find_existing(self, ksef_number: str, metadata: Dict) -> Optional[str]:
+        return None
+
+    @abstractmethod
+    def write(self, ksef_number: str, content: bytes, metadata: Dict) -> Optional[str]:
+        pass
+
+    def cleanup_partials(self) -> int:
+        return 0
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class DirectorySink(OutputSink):
+
+    def __init__(self, root: str, layout: str = ""):
+        self.store = DownloadStore(root, layout)
+
+    def cleanup_partials(self) -> int:
+        return self.store.cleanup_partials()
+
+    def find_existing(self, ksef_number: str, metadata: Dict) -> Optional[str]:
+        path = self.store.path_for(ksef_number, metadata)
+        if self.store.is_present(path, _expected_hash(metadata)):
+            return str(path)
+        return None
+
+    def write(self, ksef_number: str, content: bytes, metadata: Dict) -> Optional[str]:
+        path = self.store.path_for(ksef_number, metadata)
+        if not self.store.write(path, content, _expected_hash(metadata)):
+            return None
+        return str(path)
+
+
+class _ArchiveSink(OutputSink):
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.partial_path = Path(f"{path}{PARTIAL_SUFFIX}")
+        self.index_path = Path(f"{path}{SINK_INDEX_SUFFIX}")
+        self._index_partial = Path(f"{self.index_path}{PARTIAL_SUFFIX}")
+        self._index = open(self._index_partial, "w", encoding="utf-8")
+        self._closed = False
+
+    def write(self, ksef_number: str, content: bytes, metadata: Dict) -> Optional[str]:
+        expected_hash = _expected_hash(metadata)
+        if expected_hash and DownloadStore.content_hash(content) != expected_hash:
+            return None
+        return self._write(ksef_number, content)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+
+        self._close_archive()
+        self._index.close()
+        os.replace(self.partial_path, self.path)
+        os.replace(self._index_partial, self.index_path)
+
+    def abort(self):
+        if self._closed:
+            return
+        self._closed = True
+
+        try:
+            self._close_archive()
+        except (OSError, ValueError, zipfile.BadZipFile, tarfile.TarError):
+            pass
+        self._index.close()
+        for path in (self.partial_path, self._index_partial):
+            if path.exists():
+                path.unlink()
+
+    def _record(
+        self, ksef_number: str, name: str, size: int, offset: Optional[int] = None
+    ) -> str:
+        entry = {"ksefNumber": ksef_number, "name": name, "size": size}
+        if offset is not None:
+            entry["offset"] = offset
+        self._index.write(json.dumps(entry) + "\n")
+        return f"{self.path}:{name}"
+
+    @abstractmethod
+    def _write(self, ksef_number: str, content: bytes) -> str:
+        pass
+
+    @abstractmethod
+    def _close_archive(self):
+        pass
+
+
+class ZipSink(_ArchiveSink):
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._zip = zipfile.ZipFile(
+            self.partial_path, "w", compression=zipfile.ZIP_DEFLATED
+        )
+
+    def _write(self, ksef_number: str, content: bytes) -> str:
+        name = f"{ksef_number}.xml"
+        self._zip.writestr(name, content)
+        info = self._zip.getinfo(name)
+        return self._record(ksef_number, name, len(content), info.header_offset)
+
+    def _close_archive(self):
+        self._zip.close()
+
+
+class TarGzSink(_ArchiveSink):
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._tar = tarfile.open(self.partial_path, "w:gz")
+
+    def _write(self, ksef_number: str, content: bytes) -> str:
+        name = f"{ksef_number}.xml"
+        info = tarfile.TarInfo(name)
+        info.size = len(content)
+        info.mtime = int(time.time())
+
+        self._tar.addfile(info, io.BytesIO(content))
+        self._tar.members.clear()
+        blocks = -(-len(content) // tarfile.BLOCKSIZE)
+        offset = self._tar.offset - blocks * tarfile.BLOCKSIZE
+        return self._record(ksef_number, name, len(content), offset)
+
+    def _close_archive(self):
+        self._tar.close()
+
+
+class NdjsonGzSink(_ArchiveSink):
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = gzip.open(self.partial_path, "wb")
+        self._offset = 0
+
+    def _write(self, ksef_number: str, content: bytes) -> str:
+        record = {"ksefNumber": ksef_number, "xml": content.decode("utf-8")}
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+        self._file.write(line)
+        offset, self._offset = self._offset, self._offset + len(line)
+        return self._record(ksef_number, ksef_number, len(line), offset)
+
+    def _close_archive(self):
+        self._file.close()
+
+
+def create_output_sink(target: str, layout: str = "") -> OutputSink:
+    if target.endswith(".zip"):
+        return ZipSink(target)
+    if target.endswith((".tar.gz", ".tgz")):
+        return TarGzSink(target)
+    if target.endswith((".jsonl.gz", ".ndjson.gz")):
+        return NdjsonGzSink(target)
+    return DirectorySink(target, layout)
+
+
+def _expected_hash(metadata: Dict) -> Optional[str]:
+    return metadata.get("invoiceHash") or metadata.get("invoice_hash")
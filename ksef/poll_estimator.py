@@ -0,0 +1,154 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+from ksef.constants import (
+    POLL_BACKOFF_JITTER,
+    POLL_ESTIMATE_MIN_SAMPLES,
+    POLL_ESTIMATE_QUANTILES,
+    POLL_ESTIMATE_WINDOW,
+    POLL_MAX_DELAY,
+    POLL_MIN_DELAY,
+    POLL_PROBE_FACTOR,
+)
+
+
+class ProcessingTimeEstimator:
+
+    def __init__(
+        self,
+        path: str = "",
+        key: str = "default",
+        window: int = POLL_ESTIMATE_WINDOW,
+    ):
+        self.path = path
+        self.key = key
+        self._samples: deque = deque(maxlen=window)
+        self._targets: List[float] = []
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def plan(self, sent_at: float, fallback_delay: float) -> "PollPlan":
+        with self._lock:
+            targets = list(self._targets)
+        return PollPlan(self, sent_at, fallback_delay, targets)
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(round(seconds, 4))
+            self._targets = self._compute_targets()
+            self._dirty = True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "samples": len(self._samples),
+                "targets": dict(zip(POLL_ESTIMATE_QUANTILES, self._targets)),
+            }
+
+    def save(self):
+        with self._lock:
+            if not (self.path and self._dirty):
+                return
+            samples = list(self._samples)
+            self._dirty = False
+
+        data = self._read_file()
+        data.setdefault("samples", {})[self.key] = samples
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        partial = f"{self.path}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(partial, self.path)
+
+    def _load(self):
+        samples = self._read_file().get("samples", {}).get(self.key, [])
+        self._samples.extend(float(value) for value in samples)
+        self._targets = self._compute_targets()
+
+    def _read_file(self) -> dict:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _compute_targets(self) -> List[float]:
+        if len(self._samples) < POLL_ESTIMATE_MIN_SAMPLES:
+            return []
+
+        ordered = sorted(self._samples)
+        return [
+            ordered[min(math.ceil(q * len(ordered)), len(ordered)) - 1]
+            for q in POLL_ESTIMATE_QUANTILES
+        ]
+
+
+class PollPlan:
+
+    def __init__(
+        self,
+        estimator: Optional[ProcessingTimeEstimator],
+        sent_at: float,
+        fallback_delay: float,
+        targets: List[float],
+    ):
+        self.estimator = estimator
+        self.sent_at = sent_at
+        self._delays = self._generate(fallback_delay, targets)
+
+        first_check = targets[0] if targets else fallback_delay
+        self._fresh = time.time() - sent_at <= first_check
+        self._bracketed = False
+
+    def next_delay(self) -> float:
+        return next(self._delays)
+
+    def pending(self):
+        self._bracketed = True
+
+    def finished(self, checked_at: float):
+        if self.estimator is None:
+            return
+
+        elapsed = checked_at - self.sent_at
+        if self._bracketed:
+            self.estimator.observe(elapsed)
+        elif self._fresh:
+            self.estimator.observe(elapsed * POLL_PROBE_FACTOR)
+
+    def _generate(self, fallback_delay: float, targets: List[float]) -> Iterator[float]:
+        yield from self._ladder(targets)
+
+        if not targets:
+            while True:
+                yield fallback_delay
+
+        backoff = max(targets[-1] - targets[0], POLL_MIN_DELAY)
+        while True:
+            yield backoff * random.uniform(
+                1 - POLL_BACKOFF_JITTER, 1 + POLL_BACKOFF_JITTER
+            )
+            backoff = min(backoff * 2, POLL_MAX_DELAY)
+
+    def _ladder(self, targets: List[float]) -> Iterator[float]:
+        checked = False
+        for target in targets:
+            remaining = target - (time.time() - self.sent_at)
+            if remaining > 0:
+                yield max(remaining, POLL_MIN_DELAY) if checked else remaining
+                checked = True
+
+        if not checked:
+            yield 0.0
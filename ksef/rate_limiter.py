@@ -1,11 +1,14 @@
 import time
+from typing import Optional
 from ksef.constants import RATE_LIMIT_WINDOW
+from ksef.metrics import MetricsRegistry
 
 
 class RateLimiter:
 
-    def __init__(self, rate_limit: int):
+    def __init__(self, rate_limit: int, metrics: Optional[MetricsRegistry] = None):
         self.rate_limit = rate_limit
+        self.metrics = metrics
         self.last_request_time = 0
         self.request_count = 0
 
@@ -20,6 +23,11 @@ class RateLimiter:
 
         self.request_count += 1
 
+        if self.metrics:
+            self.metrics.histogram(
+                "ksef_rate_limiter_wait_seconds", "Time spent waiting for rate budget."
+            ).observe(time.time() - current_time)
+
     def _should_reset_counter(self, current_time: float) -> bool:
         return current_time - self.last_request_time >= RATE_LIMIT_WINDOW
 
@@ -0,0 +1,301 @@
+import sys
+from typing import Any, Dict, Optional
+
+_intern = sys.intern
+
+
+def _interned(value: Any) -> Any:
+    return _intern(value) if isinstance(value, str) else value
+
+
+def _amount(value: Any) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+class _Record:
+
+    __slots__ = ()
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for name in self.__slots__
+            if getattr(self, name) is not None
+        )
+        return f"{type(self).__name__}({fields})"
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+class InvoiceMetadata(_Record):
+
+    __slots__ = (
+        "ksef_number",
+        "invoice_number",
+        "seller_nip",
+        "seller_name",
+        "buyer_identifier_type",
+        "buyer_identifier",
+        "buyer_name",
+        "issue_date",
+        "invoicing_date",
+        "acquisition_date",
+        "net_amount",
+        "vat_amount",
+        "gross_amount",
+        "currency",
+        "form_code",
+        "invoice_type",
+        "invoice_hash",
+        "extra",
+    )
+
+    _KNOWN_KEYS = frozenset(
+        (
+            "ksefNumber",
+            "invoiceNumber",
+            "seller",
+            "buyer",
+            "issueDate",
+            "invoicingDate",
+            "acquisitionDate",
+            "netAmount",
+            "vatAmount",
+            "grossAmount",
+            "currency",
+            "formCode",
+            "invoiceType",
+            "invoiceHash",
+        )
+    )
+
+    def __init__(
+        self,
+        ksef_number: str,
+        invoice_number: Optional[str] = None,
+        seller_nip: Optional[str] = None,
+        seller_name: Optional[str] = None,
+        buyer_identifier_type: Optional[str] = None,
+        buyer_identifier: Optional[str] = None,
+        buyer_name: Optional[str] = None,
+        issue_date: Optional[str] = None,
+        invoicing_date: Optional[str] = None,
+        acquisition_date: Optional[str] = None,
+        net_amount: Optional[float] = None,
+        vat_amount: Optional[float] = None,
+        gross_amount: Optional[float] = None,
+        currency: Optional[str] = None,
+        form_code: Optional[str] = None,
+        invoice_type: Optional[str] = None,
+        invoice_hash: Optional[str] = None,
+        extra: Optional[Dict] = None,
+    ):
+        self.ksef_number = ksef_number
+        self.invoice_number = invoice_number
+        self.seller_nip = seller_nip
+        self.seller_name = seller_name
+        self.buyer_identifier_type = buyer_identifier_type
+        self.buyer_identifier = buyer_identifier
+        self.buyer_name = buyer_name
+        self.issue_date = issue_date
+        self.invoicing_date = invoicing_date
+        self.acquisition_date = acquisition_date
+        self.net_amount = net_amount
+        self.vat_amount = vat_amount
+        self.gross_amount = gross_amount
+        self.currency = currency
+        self.form_code = form_code
+        self.invoice_type = invoice_type
+        self.invoice_hash = invoice_hash
+        self.extra = extra
+
+    @classmethod
+    def from_api(cls, data: Dict) -> "InvoiceMetadata":
+        seller = data.get("seller") or {}
+        buyer = data.get("buyer") or {}
+        buyer_id = buyer.get("identifier") or {}
+        form_code = data.get("formCode") or {}
+
+        extra = {k: v for k, v in data.items() if k not in cls._KNOWN_KEYS}
+        return cls(
+            data["ksefNumber"],
+            data.get("invoiceNumber"),
+            _interned(seller.get("nip")),
+            _interned(seller.get("name")),
+            _interned(buyer_id.get("type")),
+            _interned(buyer_id.get("value")),
+            _interned(buyer.get("name")),
+            _interned(data.get("issueDate")),
+            data.get("invoicingDate"),
+            data.get("acquisitionDate"),
+            _amount(data.get("netAmount")),
+            _amount(data.get("vatAmount")),
+            _amount(data.get("grossAmount")),
+            _interned(data.get("currency")),
+            _interned(form_code.get("value")),
+            _interned(data.get("invoiceType")),
+            data.get("invoiceHash"),
+            extra or None,
+        )
+
+    def to_dict(self) -> Dict:
+        data: Dict[str, Any] = {"ksefNumber": self.ksef_number}
+        _put(data, "invoiceNumber", self.invoice_number)
+
+        seller = _compact({"nip": self.seller_nip, "name": self.seller_name})
+        if seller:
+            data["seller"] = seller
+
+        identifier = _compact(
+            {"type": self.buyer_identifier_type, "value": self.buyer_identifier}
+        )
+        buyer = _compact({"identifier": identifier or None, "name": self.buyer_name})
+        if buyer:
+            data["buyer"] = buyer
+
+        _put(data, "issueDate", self.issue_date)
+        _put(data, "invoicingDate", self.invoicing_date)
+        _put(data, "acquisitionDate", self.acquisition_date)
+        _put(data, "netAmount", self.net_amount)
+        _put(data, "vatAmount", self.vat_amount)
+        _put(data, "grossAmount", self.gross_amount)
+        _put(data, "currency", self.currency)
+        if self.form_code is not None:
+            data["formCode"] = {"value": self.form_code}
+        _put(data, "invoiceType", self.invoice_type)
+        _put(data, "invoiceHash", self.invoice_hash)
+
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class StatusEntry(_Record):
+
+    __slots__ = ("reference_number", "ksef_number", "code", "description", "extra")
+
+    def __init__(
+        self,
+        reference_number: str,
+        ksef_number: Optional[str] = None,
+        code: Optional[int] = None,
+        description: Optional[str] = None,
+        extra: Optional[Dict] = None,
+    ):
+        self.reference_number = reference_number
+        self.ksef_number = ksef_number
+        self.code = code
+        self.description = description
+        self.extra = extra
+
+    @classmethod
+    def from_api(cls, data: Dict) -> "StatusEntry":
+        status = data.get("status") or {}
+        extra = {
+            k: v
+            for k, v in data.items()
+            if k not in ("referenceNumber", "ksefNumber", "status")
+        }
+        return cls(
+            data.get("referenceNumber"),
+            data.get("ksefNumber"),
+            status.get("code"),
+            _interned(status.get("description")),
+            extra or None,
+        )
+
+    def to_dict(self) -> Dict:
+        data: Dict[str, Any] = {"referenceNumber": self.reference_number}
+        _put(data, "ksefNumber", self.ksef_number)
+        data["status"] = _compact({"code": self.code, "description": self.description})
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class ResultRecord(_Record):
+
+    __slots__ = (
+        "index",
+        "status",
+        "ksef_number",
+        "reference_number",
+        "link",
+        "path",
+        "error",
+        "extra",
+    )
+
+    _KEYS = (
+        ("index", "index"),
+        ("status", "status"),
+        ("ksef_number", "ksefNumber"),
+        ("reference_number", "referenceNumber"),
+        ("link", "link"),
+        ("path", "path"),
+        ("error", "error"),
+    )
+
+    def __init__(
+        self,
+        index: Optional[int] = None,
+        status: Optional[str] = None,
+        ksef_number: Optional[str] = None,
+        reference_number: Optional[str] = None,
+        link: Optional[str] = None,
+        path: Optional[str] = None,
+        error: Optional[str] = None,
+        extra: Optional[Dict] = None,
+    ):
+        self.index = index
+        self.status = status
+        self.ksef_number = ksef_number
+        self.reference_number = reference_number
+        self.link = link
+        self.path = path
+        self.error = error
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ResultRecord":
+        known = {key for _, key in cls._KEYS}
+        extra = {k: v for k, v in data.items() if k not in known}
+        return cls(
+            data.get("index"),
+            _interned(data.get("status")),
+            data.get("ksefNumber"),
+            data.get("referenceNumber"),
+            data.get("link"),
+            data.get("path"),
+            _interned(data.get("error")),
+            extra or None,
+        )
+
+    def to_dict(self) -> Dict:
+        data: Dict[str, Any] = {}
+        for attribute, key in self._KEYS:
+            _put(data, key, getattr(self, attribute))
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def _put(data: Dict, key: str, value: Any):
+    if value is not None:
+        data[key] = value
+
+
+def _compact(data: Dict) -> Dict:
+    return {k: v for k, v in data.items() if v is not None}
@@ -0,0 +1,175 @@
+import json
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+from ksef.constants import RESULT_SINK_COMMIT_EVERY
+from ksef.records import ResultRecord
+
+
+class ResultSink:
+
+    def __init__(self, callback: Optional[Callable[[Dict], None]] = None):
+        self.callback = callback
+        self.counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def append(self, record: Dict):
+        with self._lock:
+            self.counts[record.get("status", "unknown")] += 1
+            self._write(record)
+        if self.callback:
+            self.callback(record)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {"records": sum(self.counts.values()), **self.counts}
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._close()
+
+    def _write(self, record: Dict):
+        pass
+
+    def _close(self):
+        pass
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CallbackResultSink(ResultSink):
+
+    def __init__(self, callback: Callable[[Dict], None]):
+        super().__init__(callback)
+
+
+class JsonlResultSink(ResultSink):
+
+    def __init__(self, path: str, callback: Optional[Callable[[Dict], None]] = None):
+        super().__init__(callback)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+
+    def _write(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _close(self):
+        summary = {"records": sum(self.counts.values()), **self.counts}
+        self._file.write(json.dumps({"summary": summary}) + "\n")
+        self._file.close()
+
+
+class SqliteResultSink(ResultSink):
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recorded_at TEXT NOT NULL,
+            item_index INTEGER,
+            status TEXT,
+            ksef_number TEXT,
+            reference_number TEXT,
+            path TEXT,
+            error TEXT,
+            record TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_results_status ON results (status);
+    """
+
+    _INSERT = """
+        INSERT INTO results (
+            recorded_at, item_index, status, ksef_number, reference_number,
+            path, error, record
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        callback: Optional[Callable[[Dict], None]] = None,
+        commit_every: int = RESULT_SINK_COMMIT_EVERY,
+    ):
+        super().__init__(callback)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.commit_every = max(commit_every, 1)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self._SCHEMA)
+        self._uncommitted = 0
+
+    def _write(self, record: Dict):
+        self._conn.execute(
+            self._INSERT,
+            (
+                datetime.now(timezone.utc).isoformat(),
+                record.get("index"),
+                record.get("status"),
+                record.get("ksefNumber"),
+                record.get("referenceNumber"),
+                record.get("path"),
+                record.get("error"),
+                json.dumps(record, ensure_ascii=False),
+            ),
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def _close(self):
+        self._conn.commit()
+        self._conn.close()
+
+
+_SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+_JSONL_SUFFIXES = (".jsonl", ".ndjson")
+
+
+def result_sink_class(target: str) -> type:
+    if target.endswith(_SQLITE_SUFFIXES):
+        return SqliteResultSink
+    if target.endswith(_JSONL_SUFFIXES):
+        return JsonlResultSink
+    raise ValueError(f"Unsupported result sink (use .jsonl or .db): {target}")
+
+
+def create_result_sink(
+    target: str, callback: Optional[Callable[[Dict], None]] = None
+) -> ResultSink:
+    return result_sink_class(target)(target, callback)
+
+
+def iter_results(source: str) -> Iterator[ResultRecord]:
+    if source.endswith(_SQLITE_SUFFIXES):
+        conn = sqlite3.connect(source)
+        try:
+            for (record,) in conn.execute("SELECT record FROM results ORDER BY id"):
+                yield ResultRecord.from_dict(json.loads(record))
+        finally:
+            conn.close()
+        return
+
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "summary" not in record:
+                yield ResultRecord.from_dict(record)
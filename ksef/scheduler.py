@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from ksef.constants import (
+    PRIORITY_CLASSES,
+    PRIORITY_MIN_SHARES,
+    PRIORITY_WEIGHTS,
+    SCHEDULER_MODE_STRICT,
+    SCHEDULER_MODE_WEIGHTED,
+    SCHEDULER_SHARE_WINDOW,
+)
+from ksef.metrics import MetricsRegistry
+from ksef.rate_limiter import RateLimiter
+
+
+class PriorityGate:
+
+    def __init__(
+        self,
+        mode: str = SCHEDULER_MODE_WEIGHTED,
+        weights: Optional[Dict[str, float]] = None,
+        min_shares: Optional[Dict[str, float]] = None,
+    ):
+        if mode not in (SCHEDULER_MODE_STRICT, SCHEDULER_MODE_WEIGHTED):
+            raise ValueError(f"Unknown scheduler mode: {mode}")
+
+        self.mode = mode
+        self.weights = {**PRIORITY_WEIGHTS, **(weights or {})}
+        self.min_shares = {**PRIORITY_MIN_SHARES, **(min_shares or {})}
+
+        self._waiting: Dict[str, List[Tuple[float, int]]] = {
+            priority: [] for priority in PRIORITY_CLASSES
+        }
+        self._pass = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self._floor = 0.0
+        self._recent: deque = deque(maxlen=SCHEDULER_SHARE_WINDOW)
+        self._granted = Counter()
+        self._expired = Counter()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._busy = False
+
+    @contextmanager
+    def hold(self, priority: str, deadline: Optional[float] = None):
+        if not self._enter(priority, deadline):
+            raise TimeoutError(f"No {priority} slot before the deadline")
+        try:
+            yield
+        finally:
+            self._leave(priority)
+
+    def _enter(self, priority: str, deadline: Optional[float]) -> bool:
+        if priority not in self._waiting:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        ticket = (
+            deadline if deadline is not None else float("inf"),
+            next(self._sequence),
+        )
+
+        with self._condition:
+            if not self._waiting[priority]:
+                self._activate(priority)
+            heapq.heappush(self._waiting[priority], ticket)
+            self._condition.notify_all()
+
+            while not (not self._busy and self._select() == (priority, ticket)):
+                timeout = None if deadline is None else deadline - time.time()
+                if timeout is not None and timeout <= 0:
+                    self._waiting[priority].remove(ticket)
+                    heapq.heapify(self._waiting[priority])
+                    self._expired[priority] += 1
+                    self._condition.notify_all()
+                    return False
+                self._condition.wait(timeout)
+
+            heapq.heappop(self._waiting[priority])
+            self._floor = self._pass[priority]
+            self._busy = True
+            return True
+
+    def _leave(self, priority: str):
+        with self._condition:
+            self._busy = False
+            self._record_grant(priority)
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._condition:
+            total = len(self._recent)
+            recent = Counter(self._recent)
+            return {
+                priority: {
+                    "waiting": len(self._waiting[priority]),
+                    "granted": self._granted[priority],
+                    "expired": self._expired[priority],
+                    "recent_share": recent[priority] / total if total else 0.0,
+                }
+                for priority in PRIORITY_CLASSES
+            }
+
+    def _select(self) -> Optional[Tuple[str, Tuple[float, int]]]:
+        ready = [p for p in PRIORITY_CLASSES if self._waiting[p]]
+        if not ready:
+            return None
+
+        priority = self._starved(ready) or self._by_mode(ready)
+        return priority, self._waiting[priority][0]
+
+    def _starved(self, ready: List[str]) -> Optional[str]:
+        total = len(self._recent)
+        if not total:
+            return None
+
+        recent = Counter(self._recent)
+        deficits = {
+            p: self.min_shares.get(p, 0.0) - recent[p] / total
+            for p in ready
+            if recent[p] / total < self.min_shares.get(p, 0.0)
+        }
+        return max(deficits, key=deficits.get) if deficits else None
+
+    def _by_mode(self, ready: List[str]) -> str:
+        if self.mode == SCHEDULER_MODE_STRICT:
+            return ready[0]
+        return min(ready, key=lambda p: (self._pass[p], PRIORITY_CLASSES.index(p)))
+
+    def _activate(self, priority: str):
+        ready = [self._pass[p] for p in PRIORITY_CLASSES if self._waiting[p]]
+        floor = min(ready) if ready else self._floor
+        self._pass[priority] = max(self._pass[priority], floor)
+
+    def _record_grant(self, priority: str):
+        self._recent.append(priority)
+        self._granted[priority] += 1
+        self._pass[priority] += 1.0 / self.weights[priority]
+
+
+class PriorityScheduler(PriorityGate):
+
+    def __init__(
+        self,
+        rate_limiter: RateLimiter,
+        mode: str = SCHEDULER_MODE_WEIGHTED,
+        weights: Optional[Dict[str, float]] = None,
+        min_shares: Optional[Dict[str, float]] = None,
+        metrics: Optional[MetricsRegistry] = None,
+    ):
+        super().__init__(mode, weights, min_shares)
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+
+    def acquire(self, priority: str, deadline: Optional[float] = None) -> bool:
+        started = time.time()
+        if not self._enter(priority, deadline):
+            return False
+
+        try:
+            self.rate_limiter.wait_if_needed()
+        finally:
+            self._leave(priority)
+
+        if self.metrics:
+            self.metrics.histogram(
+                "ksef_scheduler_wait_seconds", "Time waiting for a request slot."
+            ).observe(time.time() - started, priority=priority)
+        return True
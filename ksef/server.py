@@ -0,0 +1,254 @@
+import hmac
+import json
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from ksef.client import KSeFClient
+from ksef.utils import SEARCH_PARAMS
+from ksef.constants import (
+    DEFAULT_DOWNLOAD_DIR,
+    CONTENT_TYPE_JSON,
+    HTTP_BAD_REQUEST,
+    HTTP_FORBIDDEN,
+    HTTP_INTERNAL_ERROR,
+    HTTP_NOT_FOUND,
+    HTTP_OK,
+    HTTP_PAYLOAD_TOO_LARGE,
+    HTTP_UNAUTHORIZED,
+    HTTP_UNSUPPORTED_MEDIA_TYPE,
+    PRIORITY_BULK_SEND,
+    PRIORITY_DOWNLOAD,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_SEARCH,
+    SERVER_DEFAULT_HOST,
+    SERVER_DEFAULT_PORT,
+    SERVER_MAX_BODY_BYTES,
+)
+
+
+class KSeFServer:
+
+    def __init__(
+        self,
+        client: KSeFClient,
+        socket_path: Optional[str] = None,
+        host: str = SERVER_DEFAULT_HOST,
+        port: int = SERVER_DEFAULT_PORT,
+        token: str = "",
+        output_root: str = DEFAULT_DOWNLOAD_DIR,
+    ):
+        if not socket_path and not token:
+            raise ValueError("TCP mode requires an API token (KSEF_SERVER_TOKEN)")
+
+        self.client = client
+        self.logger = client.logger
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.token = token
+        self.output_root = os.path.realpath(output_root)
+        self._httpd = None
+        self._routes: Dict[Tuple[str, str], Callable[[Dict], Tuple[int, Dict]]] = {
+            ("GET", "/health"): self._health,
+            ("POST", "/send"): self._send,
+            ("POST", "/search"): self._search,
+            ("POST", "/download"): self._download,
+            ("POST", "/drain"): self._drain,
+        }
+
+    def serve_forever(self):
+        self._httpd = self._create_server()
+        self.logger.info("KSeF daemon listening on %s", self._address())
+
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.client.terminate_session()
+            self.logger.info("KSeF daemon stopped")
+
+    def shutdown(self):
+        if self._httpd:
+            threading.Thread(target=self._httpd.shutdown, daemon=True).start()
+
+    def check_request(self, method: str, headers) -> Optional[Tuple[int, str]]:
+        if self.token:
+            scheme, _, credentials = (headers.get("Authorization") or "").partition(" ")
+            if scheme.lower() != "bearer" or not hmac.compare_digest(
+                credentials.strip().encode("utf-8"), self.token.encode("utf-8")
+            ):
+                return HTTP_UNAUTHORIZED, "Missing or invalid API token"
+
+        if not self.socket_path:
+            host = headers.get("Host", "")
+            if host not in self._allowed_hosts():
+                return HTTP_FORBIDDEN, f"Host not allowed: {host}"
+
+        origin = headers.get("Origin")
+        if origin is not None and origin not in self._allowed_origins():
+            return HTTP_FORBIDDEN, f"Origin not allowed: {origin}"
+
+        if method == "POST":
+            content_type = (headers.get("Content-Type") or "").split(";")[0]
+            if content_type.strip().lower() != CONTENT_TYPE_JSON:
+                return HTTP_UNSUPPORTED_MEDIA_TYPE, "Content-Type must be JSON"
+        return None
+
+    def dispatch(self, method: str, path: str, body: Dict) -> Tuple[int, Dict]:
+        route = self._routes.get((method, path))
+        if not route:
+            return HTTP_NOT_FOUND, {"error": f"Unknown endpoint: {method} {path}"}
+
+        try:
+            return route(body)
+        except (KeyError, TypeError, ValueError) as e:
+            return HTTP_BAD_REQUEST, {"error": f"Invalid request: {e}"}
+        except Exception as e:
+            self.logger.error("Job failed: %s", e, exc_info=True)
+            return HTTP_INTERNAL_ERROR, {"error": str(e)}
+
+    def _health(self, body: Dict) -> Tuple[int, Dict]:
+        return HTTP_OK, {
+            "authenticated": bool(self.client.access_token),
+            "sessionReference": self.client.session_reference,
+            "cache": self.client.cache_stats(),
+            "resilience": self.client.resilience_stats(),
+            "transport": self.client.http.transport.stats(),
+            "pollEstimate": (
+                self.client.poll_estimator.stats()
+                if self.client.poll_estimator
+                else None
+            ),
+        }
+
+    def _send(self, body: Dict) -> Tuple[int, Dict]:
+        if "xml" in body:
+            result = self.client.send_single_invoice(
+                body["xml"], priority=PRIORITY_INTERACTIVE
+            )
+            return HTTP_OK, result or {"status": "failed"}
+
+        results = self.client.send_multiple_invoices(
+            list(body["invoices"]), keep_session=True, priority=PRIORITY_BULK_SEND
+        )
+        return HTTP_OK, results
+
+    def _search(self, body: Dict) -> Tuple[int, Dict]:
+        unknown = sorted(set(body) - SEARCH_PARAMS)
+        if unknown:
+            return HTTP_BAD_REQUEST, {
+                "error": f"Unknown search parameters: {', '.join(unknown)}"
+            }
+
+        if not self.client.ensure_authenticated():
+            return HTTP_OK, {"error": "Authentication failed"}
+
+        results = self.client.search_invoices(priority=PRIORITY_SEARCH, **body)
+        return HTTP_OK, results or {"invoices": []}
+
+    def _download(self, body: Dict) -> Tuple[int, Dict]:
+        if not self.client.ensure_authenticated():
+            return HTTP_OK, {"error": "Authentication failed"}
+
+        output_dir = self._resolve_output_dir(body.get("outputDir", ""))
+        if output_dir is None:
+            return HTTP_FORBIDDEN, {
+                "error": f"outputDir must be inside {self.output_root}"
+            }
+
+        results = self.client.download_multiple_invoices(
+            list(body["ksefNumbers"]), output_dir, priority=PRIORITY_DOWNLOAD
+        )
+        return HTTP_OK, results
+
+    def _drain(self, body: Dict) -> Tuple[int, Dict]:
+        return HTTP_OK, self.client.drain_offline_spool(
+            body.get("limit"), keep_session=True
+        )
+
+    def _resolve_output_dir(self, output_dir: str) -> Optional[str]:
+        path = os.path.realpath(os.path.join(self.output_root, output_dir))
+        if os.path.commonpath([path, self.output_root]) != self.output_root:
+            return None
+        return path
+
+    def _allowed_hosts(self):
+        names = {self.host, "localhost", "127.0.0.1", "[::1]"}
+        return {f"{name}:{self.port}" for name in names}
+
+    def _allowed_origins(self):
+        return {f"http://{host}" for host in self._allowed_hosts()}
+
+    def _create_server(self):
+        handler = _make_handler(self)
+
+        if not self.socket_path:
+            return ThreadingHTTPServer((self.host, self.port), handler)
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = _UnixHTTPServer(self.socket_path, handler)
+        os.chmod(self.socket_path, 0o600)
+        return server
+
+    def _address(self) -> str:
+        if self.socket_path:
+            return f"unix:{self.socket_path}"
+        return f"http://{self.host}:{self.port}"
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _make_handler(server: KSeFServer):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def address_string(self) -> str:
+            return self.client_address[0] if self.client_address else "local"
+
+        def log_message(self, format: str, *args):
+            server.logger.debug("%s " + format, self.address_string(), *args)
+
+        def _handle(self, method: str):
+            rejected = server.check_request(method, self.headers)
+            if rejected:
+                status, message = rejected
+                self._respond(status, {"error": message})
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > SERVER_MAX_BODY_BYTES:
+                self._respond(HTTP_PAYLOAD_TOO_LARGE, {"error": "Request too large"})
+                return
+
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._respond(HTTP_BAD_REQUEST, {"error": "Invalid JSON"})
+                return
+
+            status, payload = server.dispatch(method, self.path, body)
+            self._respond(status, payload)
+
+        def _respond(self, status: int, payload: Dict):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
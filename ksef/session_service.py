@@ -1,11 +1,14 @@
+import time
+import requests
 from typing import Optional
+from ksef.certificates import CertificateStore
 from ksef.http_client import HttpClient
 from ksef.encryption import EncryptionManager
 from ksef.logger_service import LoggerService
+from ksef.metrics import MetricsRegistry
 from ksef.constants import (
     ENDPOINT_SESSION_ONLINE,
     ENDPOINT_SESSION_CLOSE,
-    ENDPOINT_PUBLIC_KEYS,
     HTTP_CREATED,
     HTTP_OK,
     HTTP_NO_CONTENT,
@@ -24,70 +27,76 @@ class SessionService:
         http_client: HttpClient,
         encryption: EncryptionManager,
         logger: LoggerService,
+        metrics: Optional[MetricsRegistry] = None,
+        certificates: Optional[CertificateStore] = None,
     ):
         self.http = http_client
         self.encryption = encryption
         self.logger = logger
+        self.metrics = metrics
+        self.certificates = certificates or CertificateStore(http_client, logger)
         self.session_reference: Optional[str] = None
+        self._prepared_encryption: Optional[dict] = None
 
     def initialize_session(self, access_token: str) -> bool:
-        self.logger.info("Generating session encryption...")
-
-        cert = self._get_encryption_cert()
-        if not cert:
-            self.logger.error("Failed to get encryption certificate")
-            return False
-
-        encryption_data = self._generate_encryption(cert)
+        encryption_data = self._prepared_encryption or self._build_encryption()
+        self._prepared_encryption = None
         if not encryption_data:
             return False
 
         return self._create_session(access_token, encryption_data)
 
+    def prepare_encryption(self) -> bool:
+        self._prepared_encryption = None
+        self._prepared_encryption = self._build_encryption()
+        return self._prepared_encryption is not None
+
     def terminate_session(self, access_token: str) -> bool:
         if not self.session_reference:
             return True
 
         endpoint = ENDPOINT_SESSION_CLOSE.format(session=self.session_reference)
-        response = self.http.post_json(endpoint, {}, access_token)
+        try:
+            response = self.http.post_json(endpoint, {}, access_token)
+        except requests.RequestException as e:
+            self.logger.warning("Session close failed: %s", e)
+            self.session_reference = None
+            return False
 
         if response.status_code in [HTTP_OK, HTTP_NO_CONTENT, HTTP_METHOD_NOT_ALLOWED]:
             self.logger.info("Session closed")
             self.session_reference = None
             return True
 
-        self.logger.warning(f"Session close warning: {response.status_code}")
+        self.logger.warning("Session close warning: %s", response.status_code)
         self.session_reference = None
         return True
 
-    def _get_encryption_cert(self) -> Optional[str]:
-        response = self.http.get_json(ENDPOINT_PUBLIC_KEYS)
+    def _build_encryption(self) -> Optional[dict]:
+        self.logger.info("Generating session encryption...")
 
-        if response.status_code != HTTP_OK:
+        cert = self._get_encryption_cert()
+        if not cert:
+            self.logger.error("Failed to get encryption certificate")
             return None
 
-        data = response.json()
-        return self._find_symmetric_key_cert(data)
-
-    def _find_symmetric_key_cert(self, certificates: list) -> Optional[str]:
-        for cert in certificates:
-            usage = cert.get("usage", [])
-            if CERT_USAGE_SYMMETRIC_KEY in usage:
-                self.logger.info("SymmetricKeyEncryption certificate found")
-                return cert.get("certificate")
+        return self._generate_encryption(cert)
 
-        if certificates:
-            self.logger.warning("Using first certificate for encryption")
-            return certificates[0].get("certificate")
-
-        return None
+    def _get_encryption_cert(self) -> Optional[str]:
+        return self.certificates.find(CERT_USAGE_SYMMETRIC_KEY)
 
     def _generate_encryption(self, cert: str) -> Optional[dict]:
+        started = time.perf_counter()
         try:
             return self.encryption.generate_session_keys(cert)
         except Exception as e:
-            self.logger.error(f"Session encryption failed: {e}")
+            self.logger.error("Session encryption failed: %s", e)
             return None
+        finally:
+            if self.metrics:
+                self.metrics.histogram(
+                    "ksef_encryption_duration_seconds", "Encryption time."
+                ).observe(time.perf_counter() - started, operation="session_keys")
 
     def _create_session(self, access_token: str, encryption_data: dict) -> bool:
         payload = {
@@ -102,7 +111,7 @@ class SessionService:
         response = self.http.post_json(ENDPOINT_SESSION_ONLINE, payload, access_token)
 
         if response.status_code != HTTP_CREATED:
-            self.logger.error(f"Session initialization failed: {response.status_code}")
+            self.logger.error("Session initialization failed: %s", response.status_code)
             return False
 
         data = response.json()
@@ -110,7 +119,8 @@ class SessionService:
         valid_until = data.get("validUntil")
 
         self.logger.info(
-            f"Session initialized: {self.session_reference} "
-            f"(valid until {valid_until})"
+            "Session initialized: %s (valid until %s)",
+            self.session_reference,
+            valid_until,
         )
         return True
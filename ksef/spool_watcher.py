@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from ksef.client import KSeFClient
+from ksef.timeline import InvoiceTimeline
+from ksef.utils import iter_sorted_files, load_invoice_from_file
+from ksef.constants import (
+    DEFAULT_FILE_PATTERN,
+    DEFAULT_SEND_DIR,
+    SPOOL_FAILED_DIR,
+    SPOOL_RESULT_SUFFIX,
+    SPOOL_SENT_DIR,
+    WATCH_BATCH_SIZE,
+    WATCH_INTERVAL_SECONDS,
+    WATCH_MAX_SEND_ATTEMPTS,
+)
+
+
+class SpoolWatcher:
+
+    def __init__(
+        self,
+        client: KSeFClient,
+        directory: str = DEFAULT_SEND_DIR,
+        interval: float = WATCH_INTERVAL_SECONDS,
+        batch_size: int = WATCH_BATCH_SIZE,
+        pattern: str = DEFAULT_FILE_PATTERN,
+    ):
+        self.client = client
+        self.logger = client.logger
+        self.directory = directory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pattern = pattern
+        self.sent_dir = os.path.join(directory, SPOOL_SENT_DIR)
+        self.failed_dir = os.path.join(directory, SPOOL_FAILED_DIR)
+        self.stop_event = threading.Event()
+        self._last_seen: Dict[str, Tuple[int, float]] = {}
+        self._send_failures: Dict[str, int] = {}
+
+    def run(self):
+        from requests import RequestException
+
+        os.makedirs(self.sent_dir, exist_ok=True)
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self.logger.info("Watching %s for invoices...", self.directory)
+
+        try:
+            while not self.stop_event.is_set():
+                ready = self._collect_ready_files()
+
+                if not ready:
+                    self.stop_event.wait(self.interval)
+                    continue
+
+                try:
+                    self._process_batch(ready)
+                except RequestException as e:
+                    self.logger.error("KSeF request failed, retrying later: %s", e)
+                    self._reset_session()
+                    self.stop_event.wait(self.interval)
+        finally:
+            self.client.terminate_session()
+            self.logger.info("Watcher stopped")
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _collect_ready_files(self) -> List[str]:
+        ready = []
+        seen = {}
+
+        for path, size in iter_sorted_files(self.directory, self.pattern):
+            try:
+                mtime = os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            seen[path] = (size, mtime)
+
+            if self._last_seen.get(path) == (size, mtime) and size > 0:
+                ready.append(path)
+                if len(ready) >= self.batch_size:
+                    break
+
+        self._last_seen = seen
+        return ready
+
+    def _process_batch(self, paths: List[str]):
+        if not self.client.ensure_session():
+            self.logger.error("No session available, retrying later")
+            self._reset_session(reauthenticate=True)
+            self.stop_event.wait(self.interval)
+            return
+
+        self.logger.info("Sending %d new invoices...", len(paths))
+        pending: Dict[str, str] = {}
+        timelines: Dict[str, InvoiceTimeline] = {}
+        session_failed = False
+
+        try:
+            for path in paths:
+                timeline = InvoiceTimeline()
+                reference = self._send_file(path, timeline)
+                if reference:
+                    pending[reference] = path
+                    timelines[reference] = timeline
+                elif reference is None:
+                    session_failed = True
+                    break
+
+            if timelines:
+                for reference, result in self.client.poll_invoice_statuses(timelines):
+                    self._finish_polled(pending.pop(reference), reference, result)
+        finally:
+            for reference, path in pending.items():
+                self._finish_polled(path, reference, None)
+            self.client.save_poll_estimate()
+
+        if session_failed:
+            self.logger.warning("Send failed, reopening session")
+            self._reset_session()
+
+    def _finish_polled(self, path: str, reference: str, result: Optional[Dict]):
+        if result and result.get("status") == "accepted":
+            self._finish(path, self.sent_dir, result)
+        else:
+            self._finish(
+                path,
+                self.failed_dir,
+                result or {"status": "unknown", "referenceNumber": reference},
+            )
+
+    def _send_file(self, path: str, timeline: InvoiceTimeline) -> Optional[str]:
+        try:
+            invoice_xml = load_invoice_from_file(path)
+        except (OSError, UnicodeDecodeError) as e:
+            self._finish(path, self.failed_dir, {"status": "failed", "error": str(e)})
+            return ""
+
+        from requests import RequestException
+
+        try:
+            reference = self.client.send_invoice_to_session(invoice_xml, timeline)
+        except RequestException:
+            self._record_send_failure(path)
+            raise
+
+        if reference:
+            self._send_failures.pop(path, None)
+            return reference
+        return self._record_send_failure(path)
+
+    def _record_send_failure(self, path: str) -> Optional[str]:
+        failures = self._send_failures[path] = self._send_failures.get(path, 0) + 1
+        if failures >= WATCH_MAX_SEND_ATTEMPTS:
+            self._send_failures.pop(path)
+            self._finish(
+                path, self.failed_dir, {"status": "failed", "error": "Failed to send"}
+            )
+            return ""
+
+        self._last_seen.pop(path, None)
+        return None
+
+    def _reset_session(self, reauthenticate: bool = False):
+        self.client.terminate_session()
+        if reauthenticate:
+            self.client.invalidate_token()
+
+    def _finish(self, path: str, target_dir: str, result: Dict):
+        name = os.path.basename(path)
+        target = os.path.join(target_dir, name)
+
+        record = {
+            **result,
+            "file": name,
+            "processedAt": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(f"{target}{SPOOL_RESULT_SUFFIX}", "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+
+        os.replace(path, target)
+        self._last_seen.pop(path, None)
+        self.logger.info("%s -> %s/", name, os.path.basename(target_dir))
@@ -0,0 +1,262 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+from ksef.client import KSeFClient
+from ksef.config import KSeFConfig
+from ksef.constants import (
+    DEFAULT_SEND_DIR,
+    TENANT_SEND_CHUNK_SIZE,
+    TENANT_WORKERS,
+)
+
+
+@dataclass
+class _Job:
+
+    finish_tag: float
+    work: Callable[[KSeFClient], Any]
+    future: Future
+
+
+@dataclass
+class Tenant:
+
+    name: str
+    client: KSeFClient
+    weight: float = 1.0
+    directory: str = DEFAULT_SEND_DIR
+    last_finish: float = 0.0
+    busy: bool = False
+    completed: int = 0
+    queue: Deque[_Job] = field(default_factory=deque)
+
+
+class TenantManager:
+
+    def __init__(self, workers: int = TENANT_WORKERS):
+        self.workers = workers
+        self.tenants: Dict[str, Tenant] = {}
+        self._http_clients: Dict[str, Any] = {}
+        self._ready: List[Tuple[float, int, Tenant]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+    @classmethod
+    def from_file(cls, path: str, workers: int = TENANT_WORKERS) -> "TenantManager":
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+
+        manager = cls(workers)
+        for entry in entries:
+            manager.add_tenant(
+                entry.get("name") or entry["nip"],
+                KSeFConfig(
+                    nip=entry["nip"],
+                    ksef_token=entry["token"],
+                    environment=entry.get("environment", KSeFConfig.environment),
+                ),
+                weight=float(entry.get("weight", 1.0)),
+                directory=entry.get("directory", DEFAULT_SEND_DIR),
+            )
+        return manager
+
+    def add_tenant(
+        self,
+        name: str,
+        config: KSeFConfig,
+        weight: float = 1.0,
+        directory: str = DEFAULT_SEND_DIR,
+    ) -> Tenant:
+        if weight <= 0:
+            raise ValueError(f"Tenant weight must be positive: {name}")
+        if name in ("", ".", "..") or os.sep in name or "/" in name:
+            raise ValueError(f"Tenant name must be a plain file name: {name!r}")
+
+        config = self._tenant_config(name, config)
+        client = KSeFClient(config, self._shared_http(config))
+        tenant = Tenant(name, client, weight, directory)
+
+        with self._condition:
+            self.tenants[name] = tenant
+        return tenant
+
+    def submit(
+        self, name: str, work: Callable[[KSeFClient], Any], cost: float = 1.0
+    ) -> Future:
+        future = Future()
+
+        with self._condition:
+            tenant = self.tenants[name]
+            start = max(self._virtual_time, tenant.last_finish)
+            tenant.last_finish = start + cost / tenant.weight
+
+            tenant.queue.append(_Job(tenant.last_finish, work, future))
+            self._pending += 1
+            if not tenant.busy and len(tenant.queue) == 1:
+                self._push_ready(tenant)
+            self._condition.notify()
+
+        return future
+
+    def submit_send(
+        self,
+        name: str,
+        invoices: Iterable,
+        chunk_size: int = TENANT_SEND_CHUNK_SIZE,
+    ) -> Future:
+        done = Future()
+        source = iter(invoices)
+        totals = {
+            "total": 0,
+            "successful": 0,
+            "failed": 0,
+            "spooled": 0,
+            "results": [],
+        }
+
+        def send_next_chunk(client: KSeFClient):
+            try:
+                chunk = list(itertools.islice(source, chunk_size))
+                if not chunk:
+                    done.set_result(totals)
+                    return
+
+                results = client.send_multiple_invoices(chunk, keep_session=True)
+                for key in ("total", "successful", "failed", "spooled"):
+                    totals[key] += results[key]
+                totals["results"].extend(results["results"])
+            except Exception as e:
+                done.set_exception(e)
+                raise
+
+            self.submit(name, send_next_chunk, cost=chunk_size)
+
+        self.submit(name, send_next_chunk, cost=chunk_size)
+        return done
+
+    def start(self):
+        self._stopping = False
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"ksef-tenant-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, wait: bool = True):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+        for tenant in self.tenants.values():
+            tenant.client.terminate_session()
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._condition:
+            return {
+                name: {
+                    "weight": tenant.weight,
+                    "queued": len(tenant.queue),
+                    "completed": tenant.completed,
+                    "busy": tenant.busy,
+                }
+                for name, tenant in self.tenants.items()
+            }
+
+    @staticmethod
+    def _tenant_config(name: str, config: KSeFConfig) -> KSeFConfig:
+        def scoped_file(path: str) -> str:
+            if not path:
+                return path
+            directory, filename = os.path.split(path)
+            return os.path.join(directory, name, filename)
+
+        def scoped_dir(path: str) -> str:
+            return os.path.join(path, name) if path else path
+
+        return replace(
+            config,
+            index_db=scoped_file(config.index_db),
+            poll_stats_file=scoped_file(config.poll_stats_file),
+            offline_spool_dir=scoped_dir(config.offline_spool_dir),
+            cache_dir=scoped_dir(config.cache_dir),
+        )
+
+    def _shared_http(self, config: KSeFConfig):
+        base_url = config.base_url
+        if base_url not in self._http_clients:
+            from ksef.circuit_breaker import CircuitBreaker
+            from ksef.http_client import HttpClient
+            from ksef.transports import create_transport
+
+            breaker = None
+            if config.breaker_threshold > 0:
+                breaker = CircuitBreaker(
+                    config.breaker_threshold, config.breaker_reset_timeout
+                )
+
+            pool_size = max(self.workers, 1) * 2
+            self._http_clients[base_url] = HttpClient(
+                base_url,
+                pool_size=pool_size,
+                breaker=breaker,
+                transport=create_transport(config.http2, pool_size),
+            )
+        return self._http_clients[base_url]
+
+    def _push_ready(self, tenant: Tenant):
+        head = tenant.queue[0]
+        heapq.heappush(self._ready, (head.finish_tag, next(self._sequence), tenant))
+
+    def _worker(self):
+        while True:
+            tenant, job = self._next_job()
+            if job is None:
+                return
+
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    job.future.set_result(job.work(tenant.client))
+            except Exception as e:
+                tenant.client.logger.error(
+                    "[%s] Job failed: %s", tenant.name, e, exc_info=True
+                )
+                job.future.set_exception(e)
+            finally:
+                self._release(tenant)
+
+    def _next_job(self) -> Tuple[Optional[Tenant], Optional[_Job]]:
+        with self._condition:
+            while not self._ready:
+                if self._stopping and self._pending == 0:
+                    return None, None
+                self._condition.wait()
+
+            finish_tag, _, tenant = heapq.heappop(self._ready)
+            tenant.busy = True
+            self._virtual_time = max(self._virtual_time, finish_tag)
+            return tenant, tenant.queue.popleft()
+
+    def _release(self, tenant: Tenant):
+        with self._condition:
+            tenant.busy = False
+            tenant.completed += 1
+            self._pending -= 1
+            if tenant.queue:
+                self._push_ready(tenant)
+            self._condition.notify_all()
@@ -0,0 +1,109 @@
+import json
+import math
+import time
+from typing import Dict, List, Optional
+from ksef.constants import TIMELINE_PERCENTILES, TIMELINE_PHASES
+
+
+class InvoiceTimeline:
+
+    def __init__(self):
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str):
+        self.marks[name] = time.time()
+
+    def mark_once(self, name: str):
+        self.marks.setdefault(name, time.time())
+
+    def durations(self) -> Dict[str, float]:
+        return {
+            phase: round(self.marks[end] - self.marks[start], 6)
+            for phase, start, end in TIMELINE_PHASES
+            if start in self.marks and end in self.marks
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "timestamps": {name: round(t, 6) for name, t in self.marks.items()},
+            "durations": self.durations(),
+        }
+
+
+class _NullTimeline(InvoiceTimeline):
+
+    def mark(self, name: str):
+        pass
+
+    def mark_once(self, name: str):
+        pass
+
+
+NULL_TIMELINE = _NullTimeline()
+
+
+class TimelineAggregator:
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {
+            phase: [] for phase, _, _ in TIMELINE_PHASES
+        }
+
+    def add(self, record: Dict):
+        durations = record.get("timeline", {}).get("durations", {})
+        for phase, value in durations.items():
+            self.samples[phase].append(value)
+
+    def report(self, results: Dict) -> Dict:
+        return {
+            "total": results.get("total", 0),
+            "successful": results.get("successful", 0),
+            "failed": results.get("failed", 0),
+            "spooled": results.get("spooled", 0),
+            "phases": {
+                phase: _summarize(values)
+                for phase, values in self.samples.items()
+                if values
+            },
+        }
+
+
+def build_timeline_report(results: Dict) -> Dict:
+    aggregator = TimelineAggregator()
+    for record in results.get("results", []):
+        aggregator.add(record)
+    return aggregator.report(results)
+
+
+def write_timeline_report(
+    results: Dict, path: str, aggregator: Optional[TimelineAggregator] = None
+) -> Dict:
+    if aggregator is None:
+        report = build_timeline_report(results)
+    else:
+        report = aggregator.report(results)
+
+    if "results" in results:
+        report["results"] = results["results"]
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+def _summarize(values: List[float]) -> Dict:
+    values = sorted(values)
+    summary = {
+        "count": len(values),
+        "min": values[0],
+        "mean": round(sum(values) / len(values), 6),
+        "max": values[-1],
+    }
+    for pct in TIMELINE_PERCENTILES:
+        summary[f"p{pct}"] = _percentile(values, pct)
+    return summary
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
@@ -0,0 +1,176 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple, Union
+import requests
+from requests.adapters import HTTPAdapter
+from ksef.constants import (
+    EXPORT_CHUNK_SIZE,
+    HTTP2_MAX_CONNECTIONS,
+    HTTP_OK,
+    HTTP_POOL_SIZE,
+    TRANSPORT_HTTP1,
+    TRANSPORT_HTTP2,
+)
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class RequestsTransport:
+
+    name = TRANSPORT_HTTP1
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, data=None, **kwargs):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = _BufferBody(data)
+        return self.session.request(method, url, data=data, **kwargs)
+
+    def download(
+        self,
+        url: str,
+        write: Callable[[bytes], None],
+        timeout: Optional[Tuple[float, float]] = None,
+    ) -> int:
+        with self.session.get(url, stream=True, timeout=timeout) as response:
+            if response.status_code == HTTP_OK:
+                for chunk in response.iter_content(EXPORT_CHUNK_SIZE):
+                    write(chunk)
+            return response.status_code
+
+    def stats(self) -> Dict:
+        return {"transport": self.name}
+
+    def close(self):
+        self.session.close()
+
+
+class Http2Transport:
+
+    name = TRANSPORT_HTTP2
+
+    def __init__(
+        self,
+        max_connections: int = HTTP2_MAX_CONNECTIONS,
+        prior_knowledge: bool = False,
+        verify: bool = True,
+    ):
+        import httpx
+
+        self._httpx = httpx
+        self.client = httpx.Client(
+            http1=not prior_knowledge,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            verify=verify,
+        )
+        self._versions: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        data: Optional[Buffer] = None,
+        timeout: Optional[Tuple[float, float]] = None,
+        **kwargs,
+    ):
+        if data is not None and not isinstance(data, bytes):
+            data = bytes(data)
+
+        with self._translate_errors():
+            response = self.client.request(
+                method, url, content=data, timeout=self._timeout(timeout), **kwargs
+            )
+
+        with self._lock:
+            self._versions[response.http_version] += 1
+        return response
+
+    def download(
+        self,
+        url: str,
+        write: Callable[[bytes], None],
+        timeout: Optional[Tuple[float, float]] = None,
+    ) -> int:
+        with self._translate_errors():
+            with self.client.stream(
+                "GET", url, timeout=self._timeout(timeout)
+            ) as response:
+                if response.status_code == HTTP_OK:
+                    for chunk in response.iter_bytes(EXPORT_CHUNK_SIZE):
+                        write(chunk)
+                return response.status_code
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"transport": self.name, "responses": dict(self._versions)}
+
+    def close(self):
+        self.client.close()
+
+    def _timeout(self, timeout: Optional[Tuple[float, float]]):
+        if timeout is None:
+            return None
+        connect, read = timeout
+        return self._httpx.Timeout(read, connect=connect)
+
+    @contextmanager
+    def _translate_errors(self):
+        httpx = self._httpx
+        try:
+            yield
+        except httpx.ConnectTimeout as e:
+            raise requests.ConnectTimeout(str(e)) from e
+        except httpx.TimeoutException as e:
+            raise requests.ReadTimeout(str(e)) from e
+        except httpx.NetworkError as e:
+            raise requests.ConnectionError(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.RequestException(str(e)) from e
+
+
+def create_transport(
+    http2: bool = False, pool_size: int = HTTP_POOL_SIZE, logger=None
+) -> Union[RequestsTransport, Http2Transport]:
+    if http2:
+        try:
+            return Http2Transport()
+        except ImportError:
+            if logger:
+                logger.warning(
+                    "HTTP/2 requires 'httpx[http2]', falling back to HTTP/1.1"
+                )
+    return RequestsTransport(pool_size)
+
+
+class _BufferBody:
+
+    def __init__(self, buffer: Buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def read(self, size: int = -1) -> memoryview:
+        end = len(self._view) if size < 0 else self._position + size
+        chunk = self._view[self._position : end]
+        self._position += len(chunk)
+        return chunk
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        base = (0, self._position, len(self._view))[whence]
+        self._position = base + offset
+        return self._position
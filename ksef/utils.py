@@ -1,8 +1,22 @@
 """Utility functions for KSeF"""
 
-from pathlib import Path
-from typing import List
-from ksef.constants import DEFAULT_ENCODING, DEFAULT_FILE_PATTERN
+import fnmatch
+import heapq
+import json
+import os
+import tempfile
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+from ksef.constants import (
+    DEFAULT_ENCODING,
+    DEFAULT_FILE_PATTERN,
+    DIRECTORY_SORT_CHUNK_SIZE,
+)
+
+
+class InvoiceFile(NamedTuple):
+    path: str
+    size: int
+    content: str
 
 
 def load_invoice_from_file(file_path: str) -> str:
@@ -12,9 +26,92 @@ def load_invoice_from_file(file_path: str) -> str:
 def load_invoices_from_directory(
     directory_path: str, pattern: str = DEFAULT_FILE_PATTERN
 ) -> List[str]:
-    directory = Path(directory_path)
-    xml_files = _get_sorted_files(directory, pattern)
-    return [_read_file(f) for f in xml_files]
+    return [f.content for f in iter_invoices_from_directory(directory_path, pattern)]
+
+
+def iter_invoices_from_directory(
+    directory_path: str,
+    pattern: str = DEFAULT_FILE_PATTERN,
+    chunk_size: int = DIRECTORY_SORT_CHUNK_SIZE,
+) -> Iterator[InvoiceFile]:
+    for path, size in iter_sorted_files(directory_path, pattern, chunk_size):
+        yield InvoiceFile(path, size, _read_file(path))
+
+
+def iter_sorted_files(
+    directory_path: str,
+    pattern: str = DEFAULT_FILE_PATTERN,
+    chunk_size: int = DIRECTORY_SORT_CHUNK_SIZE,
+) -> Iterator[Tuple[str, int]]:
+    chunk = []
+    runs = []
+
+    try:
+        for entry in _scan_matching(directory_path, pattern):
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                runs.append(_spill_sorted_run(chunk))
+                chunk = []
+
+        chunk.sort()
+        if not runs:
+            yield from chunk
+            return
+
+        runs.append(_spill_sorted_run(chunk))
+        readers = [_read_run(run) for run in runs]
+        yield from heapq.merge(*readers)
+    finally:
+        for run in runs:
+            run.close()
+
+
+_OPTIONAL_SEARCH_FIELDS = {
+    "date_to": ("dateRange", "to"),
+    "ksef_number": ("ksefNumber",),
+    "invoice_number": ("invoiceNumber",),
+    "seller_nip": ("sellerNip",),
+    "buyer_identifier": ("buyerIdentifier",),
+    "amount": ("amount",),
+    "currency_codes": ("currencyCodes",),
+    "invoicing_mode": ("invoicingMode",),
+    "is_self_invoicing": ("isSelfInvoicing",),
+    "form_type": ("formType",),
+    "invoice_types": ("invoiceTypes",),
+    "has_attachment": ("hasAttachment",),
+}
+
+SEARCH_PARAMS = frozenset(
+    {
+        "subject_type",
+        "date_type",
+        "date_from",
+        "sort_order",
+        "page_offset",
+        "page_size",
+        *_OPTIONAL_SEARCH_FIELDS,
+    }
+)
+
+
+def build_search_body(params: Dict) -> Dict:
+    body = {
+        "subjectType": params["subject_type"],
+        "dateRange": {"dateType": params["date_type"], "from": params["date_from"]},
+    }
+
+    _add_optional_search_params(body, params)
+    return body
+
+
+def _add_optional_search_params(body: Dict, params: Dict):
+    for param_key, body_path in _OPTIONAL_SEARCH_FIELDS.items():
+        value = params.get(param_key)
+        if value is not None:
+            if len(body_path) == 2:
+                body[body_path[0]][body_path[1]] = value
+            else:
+                body[body_path[0]] = value
 
 
 def _read_file(file_path: str) -> str:
@@ -22,5 +119,23 @@ def _read_file(file_path: str) -> str:
         return f.read()
 
 
-def _get_sorted_files(directory: Path, pattern: str) -> List[Path]:
-    return sorted(directory.glob(pattern))
+def _scan_matching(directory_path: str, pattern: str) -> Iterator[Tuple[str, int]]:
+    with os.scandir(directory_path) as entries:
+        for entry in entries:
+            if fnmatch.fnmatch(entry.name, pattern) and entry.is_file():
+                yield entry.path, entry.stat().st_size
+
+
+def _spill_sorted_run(chunk: List[Tuple[str, int]]):
+    chunk.sort()
+    run = tempfile.TemporaryFile("w+", encoding=DEFAULT_ENCODING)
+    for entry in chunk:
+        run.write(json.dumps(entry) + "\n")
+    run.seek(0)
+    return run
+
+
+def _read_run(run) -> Iterator[Tuple[str, int]]:
+    for line in run:
+        path, size = json.loads(line)
+        yield path, size
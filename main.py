@@ -1,26 +1,44 @@
 import argparse
+import json
+import signal
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from ksef.config import KSeFConfig
 from ksef.client import KSeFClient
+from ksef.spool_watcher import SpoolWatcher
+from ksef.constants import (
+    DEFAULT_DOWNLOAD_DIR,
+    DEFAULT_SEND_DIR,
+    DEFAULT_TIMELINE_REPORT,
+    EXPORT_PART_WORKERS,
+)
 from ksef.operations import (
     send_xml_from_file,
     send_xmls_from_directory,
     download_invoice,
-    search_invoices_from_ksef,
+    iter_search_from_ksef,
 )
 
+SPOOLING_COMMANDS = ("send-single", "send-batch")
+
 
-def search_and_download(client: KSeFClient, date_from: str, date_to: str):
+def search_and_download(
+    client: KSeFClient,
+    date_from: str,
+    date_to: str,
+    output: str = DEFAULT_DOWNLOAD_DIR,
+    results_path: str = "",
+):
 
     date_from_ksef = f"{date_from}T00:00:00.000+00:00"
     date_to_ksef = f"{date_to}T23:59:59.999+00:00"
 
     print(f"Searching invoices from {date_from_ksef} to {date_to_ksef}...")
 
-    invoices = search_invoices_from_ksef(
+    invoices = iter_search_from_ksef(
         client=client,
         subject_type="Subject2",
         date_type="Invoicing",
@@ -29,31 +47,177 @@ def search_and_download(client: KSeFClient, date_from: str, date_to: str):
         sort_order="Desc",
     )
 
-    if not invoices or not invoices.get("invoices"):
+    from ksef.invoice_service import SearchIncompleteError
+
+    try:
+        metadata = {record.ksef_number: record for record in invoices}
+    except SearchIncompleteError as e:
+        print(f"Error: {e}; nothing downloaded, the result would be incomplete")
+        return
+    if not metadata:
         print("No invoices found")
         return
 
-    ksef_numbers = [inv["ksefNumber"] for inv in invoices["invoices"]]
+    ksef_numbers = list(metadata)
     print(f"Found {len(ksef_numbers)} invoices. Starting download...")
 
-    client.download_multiple_invoices(ksef_numbers)
+    from ksef.output_sinks import create_output_sink
+
+    from ksef.result_sinks import create_result_sink
+
+    with create_output_sink(output, client.config.download_layout) as sink:
+        if not results_path:
+            client.download_multiple_invoices(
+                ksef_numbers, metadata=metadata, sink=sink
+            )
+        else:
+            with create_result_sink(results_path) as result_sink:
+                client.download_multiple_invoices(
+                    ksef_numbers, metadata=metadata, sink=sink, result_sink=result_sink
+                )
+            print(f"Results saved to: {results_path}")
     print("Download of found invoices completed.")
 
 
+def export(
+    client: KSeFClient,
+    date_from: str,
+    date_to: str,
+    output: str = DEFAULT_DOWNLOAD_DIR,
+    results_path: str = "",
+    workers: int = EXPORT_PART_WORKERS,
+):
+    from ksef.output_sinks import create_output_sink
+    from ksef.result_sinks import create_result_sink
+
+    params = dict(
+        subject_type="Subject2",
+        date_type="Invoicing",
+        date_from=f"{date_from}T00:00:00.000+00:00",
+        date_to=f"{date_to}T23:59:59.999+00:00",
+        workers=workers,
+    )
+    print(f"Exporting invoices from {date_from} to {date_to}...")
+
+    with create_output_sink(output, client.config.download_layout) as sink:
+        if not results_path:
+            results = client.export_invoices(sink=sink, **params)
+        else:
+            with create_result_sink(results_path) as result_sink:
+                results = client.export_invoices(
+                    sink=sink, result_sink=result_sink, **params
+                )
+            print(f"Results saved to: {results_path}")
+
+    if results is None:
+        print("Export failed")
+        return
+
+    print(
+        f"Export {results['reference']}: {results['successful']}/{results['total']} "
+        f"saved, {results['failed']} failed"
+    )
+    if results["truncated"]:
+        print("KSeF truncated the export, run again with a narrower date range")
+
+
 def send_single(client: KSeFClient, xml_path: str):
     result = send_xml_from_file(client, xml_path)
 
     if result and result.get("status") == "accepted":
         print(f"Invoice sent: {result['ksefNumber']}")
         print(f"Link: {result['link']}")
+    elif result and result.get("status") == "spooled":
+        print(f"KSeF unavailable, invoice spooled offline: {result['spoolId']}")
     else:
         print(
             f"Failed: {result.get('description', 'Unknown error') if result else 'Send error'}"
         )
 
 
-def send_batch(client: KSeFClient, directory: str):
-    send_xmls_from_directory(client, directory)
+def send_batch(client: KSeFClient, directory: str, report: str, results_path: str):
+    if client.offline_spool and client.offline_spool.depth:
+        drain_spool(client, None)
+
+    from ksef.timeline import TimelineAggregator
+
+    aggregator = TimelineAggregator()
+    if results_path:
+        from ksef.result_sinks import create_result_sink
+
+        with create_result_sink(results_path, aggregator.add) as result_sink:
+            results = send_xmls_from_directory(client, directory, result_sink)
+        print(f"Results saved to: {results_path}")
+    else:
+        results = send_xmls_from_directory(client, directory)
+
+    if results.get("spooled"):
+        print(
+            f"KSeF unavailable, {results['spooled']} invoices spooled offline "
+            f"(send later with drain-spool)"
+        )
+
+    if not report:
+        return
+
+    from ksef.timeline import write_timeline_report
+
+    summary = write_timeline_report(
+        results, report, aggregator if results_path else None
+    )
+    print(f"Timeline report saved to: {report}")
+    for phase, stats in summary["phases"].items():
+        print(
+            f"  {phase:<15} p50={stats['p50']:.3f}s  p95={stats['p95']:.3f}s  "
+            f"max={stats['max']:.3f}s"
+        )
+
+
+def drain_spool(client: KSeFClient, limit: Optional[int]):
+    summary = client.drain_offline_spool(limit)
+    print(
+        f"Spool drain: {summary['successful']}/{summary['drained']} successful, "
+        f"{summary['failed']} failed, {summary['retrying']} retrying, "
+        f"{summary['quarantined']} quarantined, {summary['remaining']} remaining"
+    )
+
+
+def spool_status(client: KSeFClient):
+    print(json.dumps(client.resilience_stats(), indent=2))
+
+
+def watch(client: KSeFClient, directory: str, interval: float):
+    watcher = SpoolWatcher(client, directory, interval)
+    signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+def serve(
+    client: KSeFClient,
+    socket_path: str,
+    host: str,
+    port: int,
+    output_root: str = DEFAULT_DOWNLOAD_DIR,
+):
+    from ksef.server import KSeFServer
+
+    try:
+        server = KSeFServer(
+            client, socket_path, host, port, client.config.server_token, output_root
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    signal.signal(signal.SIGTERM, lambda *_: server.shutdown())
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
 
 
 def download_single(client: KSeFClient, ksef_number: str):
@@ -61,6 +225,79 @@ def download_single(client: KSeFClient, ksef_number: str):
     print(f"Downloaded: {path}" if success else "Download failed")
 
 
+def query_index(config: KSeFConfig, args: argparse.Namespace):
+    if not config.index_db:
+        print("Error: metadata index disabled (KSEF_INDEX_DB is empty)")
+        return
+
+    from ksef.metadata_index import MetadataIndex
+
+    index = MetadataIndex(config.index_db)
+    rows = index.query(
+        seller_nip=args.seller_nip,
+        buyer_identifier=args.buyer,
+        date_type=args.date_type,
+        date_from=args.date_from,
+        date_to=args.date_to,
+        min_amount=args.min_amount,
+        max_amount=args.max_amount,
+        currency=args.currency,
+        form_type=args.form_type,
+        downloaded=args.downloaded,
+        limit=args.limit,
+    )
+    index.close()
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+
+    for row in rows:
+        print(
+            f"{row['ksef_number']}  {row['issue_date'] or '':10}  "
+            f"{row['seller_nip'] or '':10}  {row['gross_amount'] or 0:>12.2f} "
+            f"{row['currency'] or ''}  {'downloaded' if row['downloaded'] else ''}"
+        )
+    print(f"{len(rows)} invoices")
+
+
+def extract_fields(directory: str, output: str, workers: int):
+    from ksef.extraction import export_fields
+
+    count = export_fields(directory, output, workers)
+    print(f"Extracted {count} invoices to {output}")
+
+
+def tenant_send(tenants_file: str, workers: int):
+    from ksef.tenant_manager import TenantManager
+    from ksef.utils import iter_invoices_from_directory
+
+    manager = TenantManager.from_file(tenants_file, workers)
+    manager.start()
+
+    futures = {
+        name: manager.submit_send(name, iter_invoices_from_directory(tenant.directory))
+        for name, tenant in manager.tenants.items()
+    }
+
+    try:
+        for name, future in futures.items():
+            try:
+                results = future.result()
+                print(
+                    f"{name}: {results['successful']}/{results['total']} successful, "
+                    f"{results['failed']} failed, {results['spooled']} spooled offline"
+                )
+            except Exception as e:
+                print(f"{name}: error: {e}")
+    finally:
+        manager.stop()
+
+
+def _parse_bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Command Line Interface (CLI) tool for KSeF.",
@@ -82,7 +319,48 @@ def main():
         "send-batch", help="Send all XML files from a directory."
     )
     parser_send_batch.add_argument(
-        "--directory", type=str, help=f"Directory containing XML files to send."
+        "--directory",
+        type=str,
+        default=DEFAULT_SEND_DIR,
+        help=f"Directory containing XML files to send.",
+    )
+    parser_send_batch.add_argument(
+        "--report",
+        type=str,
+        default=DEFAULT_TIMELINE_REPORT,
+        help="JSON file for the per-invoice timeline report (empty to disable).",
+    )
+    parser_send_batch.add_argument(
+        "--results",
+        type=str,
+        default="",
+        help="Stream per-invoice results to a .jsonl or SQLite (.db) file.",
+    )
+
+    parser_drain_spool = subparsers.add_parser(
+        "drain-spool",
+        help="Send invoices spooled offline during a KSeF outage.",
+    )
+    parser_drain_spool.add_argument(
+        "--limit", type=int, help="Maximum number of invoices to send."
+    )
+
+    subparsers.add_parser(
+        "spool-status", help="Show circuit breaker state and offline spool depth."
+    )
+
+    parser_watch = subparsers.add_parser(
+        "watch",
+        help="Watch a directory and send new XML files as they arrive.",
+    )
+    parser_watch.add_argument(
+        "--directory",
+        type=str,
+        default=DEFAULT_SEND_DIR,
+        help="Spool directory; results go to its sent/ and failed/ subdirectories.",
+    )
+    parser_watch.add_argument(
+        "--interval", type=float, default=1.0, help="Scan interval in seconds."
     )
 
     parser_search_download = subparsers.add_parser(
@@ -101,6 +379,45 @@ def main():
         default="2025-11-30",
         help="End date for the search (e.g., 2025-11-30).",
     )
+    parser_search_download.add_argument(
+        "--output",
+        type=str,
+        default=DEFAULT_DOWNLOAD_DIR,
+        help="Output directory, or an archive path ending in .zip, .tar.gz "
+        "or .jsonl.gz.",
+    )
+    parser_search_download.add_argument(
+        "--results",
+        type=str,
+        default="",
+        help="Stream per-invoice results to a .jsonl or SQLite (.db) file.",
+    )
+
+    parser_export = subparsers.add_parser(
+        "export",
+        help="Export all invoices from a date range as encrypted KSeF packages.",
+    )
+    parser_export.add_argument("--date-from", type=str, default="2025-11-01")
+    parser_export.add_argument("--date-to", type=str, default="2025-11-30")
+    parser_export.add_argument(
+        "--output",
+        type=str,
+        default=DEFAULT_DOWNLOAD_DIR,
+        help="Output directory, or an archive path ending in .zip, .tar.gz "
+        "or .jsonl.gz.",
+    )
+    parser_export.add_argument(
+        "--results",
+        type=str,
+        default="",
+        help="Stream per-invoice results to a .jsonl or SQLite (.db) file.",
+    )
+    parser_export.add_argument(
+        "--workers",
+        type=int,
+        default=EXPORT_PART_WORKERS,
+        help="Package parts downloaded in parallel.",
+    )
 
     parser_download_single = subparsers.add_parser(
         "download-single", help="Download a single invoice using its KSeF number."
@@ -109,25 +426,192 @@ def main():
         "ksef_number", type=str, help="The KSeF number of the invoice to download."
     )
 
+    parser_index_query = subparsers.add_parser(
+        "index-query",
+        help="Query the local metadata index of searched invoices (offline).",
+    )
+    parser_index_query.add_argument("--seller-nip", type=str, help="Seller NIP.")
+    parser_index_query.add_argument("--buyer", type=str, help="Buyer identifier.")
+    parser_index_query.add_argument(
+        "--date-type",
+        type=str,
+        default="Issue",
+        choices=["Issue", "Invoicing", "Acquisition"],
+        help="Date used by --date-from/--date-to.",
+    )
+    parser_index_query.add_argument("--date-from", type=str, help="e.g. 2025-07-01")
+    parser_index_query.add_argument("--date-to", type=str, help="e.g. 2025-09-30")
+    parser_index_query.add_argument("--min-amount", type=float, help="Min gross.")
+    parser_index_query.add_argument("--max-amount", type=float, help="Max gross.")
+    parser_index_query.add_argument("--currency", type=str, help="e.g. PLN")
+    parser_index_query.add_argument("--form-type", type=str, help="e.g. FA")
+    parser_index_query.add_argument(
+        "--downloaded", type=_parse_bool, help="Filter by download status."
+    )
+    parser_index_query.add_argument("--limit", type=int, help="Max rows.")
+    parser_index_query.add_argument(
+        "--json", action="store_true", help="Print rows as JSON."
+    )
+
+    parser_serve = subparsers.add_parser(
+        "serve",
+        help="Run a local daemon sharing one authenticated client (JSON API).",
+    )
+    parser_serve.add_argument(
+        "--socket", type=str, help="Unix socket path (instead of TCP)."
+    )
+    parser_serve.add_argument(
+        "--host", type=str, default="127.0.0.1", help="TCP bind address."
+    )
+    parser_serve.add_argument("--port", type=int, default=8765, help="TCP port.")
+    parser_serve.add_argument(
+        "--output-root",
+        type=str,
+        default=DEFAULT_DOWNLOAD_DIR,
+        help="Directory that /download outputDir values must stay inside.",
+    )
+
+    parser_tenant_send = subparsers.add_parser(
+        "tenant-send",
+        help="Send invoices for many NIPs with fair scheduling between them.",
+    )
+    parser_tenant_send.add_argument(
+        "--tenants",
+        type=str,
+        required=True,
+        help="JSON file: [{name, nip, token, weight, directory, environment}].",
+    )
+    parser_tenant_send.add_argument(
+        "--workers", type=int, default=4, help="Concurrent tenant jobs."
+    )
+
+    parser_extract = subparsers.add_parser(
+        "extract",
+        help="Extract key FA(3) fields from downloaded invoices (offline).",
+    )
+    parser_extract.add_argument(
+        "--directory",
+        type=str,
+        default=DEFAULT_DOWNLOAD_DIR,
+        help="Directory with downloaded XML invoices.",
+    )
+    parser_extract.add_argument(
+        "--output",
+        type=str,
+        default="invoices.csv",
+        help="Output file (.csv, or .parquet when pyarrow is installed).",
+    )
+    parser_extract.add_argument(
+        "--workers", type=int, default=0, help="Worker processes (0 = all CPUs)."
+    )
+
     args = parser.parse_args()
 
-    client = KSeFClient(KSeFConfig())
+    if getattr(args, "results", ""):
+        from ksef.result_sinks import result_sink_class
+
+        try:
+            result_sink_class(args.results)
+        except ValueError as e:
+            parser.error(str(e))
+
+    config = KSeFConfig()
+
+    if args.command == "index-query":
+        query_index(config, args)
+        return
+
+    if args.command == "extract":
+        extract_fields(args.directory, args.output, args.workers)
+        return
+
+    if args.command == "tenant-send":
+        tenant_send(args.tenants, args.workers)
+        return
+
+    client = KSeFClient(config)
 
-    if not client.authenticate():
-        print("Error: Authentication failed")
+    if args.command == "spool-status":
+        spool_status(client)
         return
+    exporter = start_metrics_exporter(client)
+
+    try:
+        run_online_command(client, args)
+    finally:
+        if exporter:
+            exporter.stop()
 
-    print("Authentication successful")
+
+def run_online_command(client: KSeFClient, args):
+    if not authenticate(client, args.command in SPOOLING_COMMANDS):
+        if not (args.command in SPOOLING_COMMANDS and client.is_outage()):
+            print("Error: Authentication failed")
+            return
+        print("KSeF unavailable, invoices will be spooled offline")
+    else:
+        print("Authentication successful")
 
     if args.command == "send-single":
         send_single(client, args.xml_path)
     elif args.command == "send-batch":
-        send_batch(client, args.directory)
+        send_batch(client, args.directory, args.report, args.results)
+    elif args.command == "drain-spool":
+        drain_spool(client, args.limit)
     elif args.command == "search-download":
-        search_and_download(client, args.date_from, args.date_to)
+        search_and_download(
+            client, args.date_from, args.date_to, args.output, args.results
+        )
+    elif args.command == "export":
+        export(
+            client,
+            args.date_from,
+            args.date_to,
+            args.output,
+            args.results,
+            args.workers,
+        )
+    elif args.command == "watch":
+        watch(client, args.directory, args.interval)
+    elif args.command == "serve":
+        serve(client, args.socket, args.host, args.port, args.output_root)
     elif args.command == "download-single":
         download_single(client, args.ksef_number)
 
+    if args.command in SPOOLING_COMMANDS:
+        report_time_to_first_send(client)
+
+
+def report_time_to_first_send(client: KSeFClient):
+    elapsed = client.time_to_first_send()
+    if elapsed is not None:
+        print(f"Time to first send: {elapsed:.3f}s")
+
+
+def authenticate(client: KSeFClient, with_session: bool = False) -> bool:
+    from requests import RequestException
+
+    try:
+        if with_session:
+            return client.ensure_session()
+        return client.authenticate()
+    except RequestException as e:
+        print(f"Error: KSeF unavailable: {e}")
+        return False
+
+
+def start_metrics_exporter(client: KSeFClient):
+    if client.metrics is None:
+        return None
+
+    from ksef.metrics import MetricsExporter
+
+    exporter = MetricsExporter(
+        client.metrics, client.config.metrics_file, client.config.metrics_port
+    )
+    exporter.start()
+    return exporter
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_ksef import MockKSeF  # noqa: E402
+from ksef.client import KSeFClient  # noqa: E402
+from ksef.config import KSeFConfig  # noqa: E402
+from ksef.http_client import HttpClient  # noqa: E402
+
+
+@pytest.fixture
+def mock_ksef():
+    with MockKSeF(stored_invoices=50) as mock:
+        yield mock
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    clients = []
+
+    def build(mock, **overrides):
+        options = dict(
+            nip="5260250274",
+            ksef_token="token",
+            log_file=str(tmp_path / "ksef.log"),
+            log_level_console="ERROR",
+            rate_limit=1000,
+            adaptive_poll=False,
+            poll_stats_file="",
+            index_db="",
+            offline_spool_dir="",
+        )
+        options.update(overrides)
+        client = KSeFClient(KSeFConfig(**options), HttpClient(mock.base_url))
+        clients.append(client)
+        return client
+
+    yield build
+    for client in clients:
+        client.http.close()
@@ -0,0 +1,76 @@
+import time
+import benchmarks.mock_ksef as mock_ksef_module
+from ksef.client import KSeFClient
+from ksef.constants import ENDPOINT_INVOICE_METADATA
+
+
+def test_authenticate_tracks_token_expiry(mock_ksef, make_client):
+    client = make_client(mock_ksef)
+
+    assert client.ensure_authenticated()
+    auth = client.auth_service
+    assert auth.is_valid()
+    assert auth.access_valid_until > time.monotonic() + 600
+    assert auth.refresh_valid_until > auth.access_valid_until
+
+
+def test_expired_token_is_refreshed(mock_ksef, make_client):
+    client = make_client(mock_ksef)
+    assert client.ensure_authenticated()
+    auth = client.auth_service
+    old_token = auth.access_token
+
+    auth.authenticate = lambda ksef_token: False
+    auth.access_valid_until = time.monotonic()
+
+    assert client.ensure_authenticated()
+    assert auth.access_token != old_token
+    assert auth.is_valid()
+
+
+def test_reauthenticates_when_refresh_token_expired(mock_ksef, make_client):
+    client = make_client(mock_ksef)
+    assert client.ensure_authenticated()
+    auth = client.auth_service
+    auth.access_valid_until = auth.refresh_valid_until = time.monotonic()
+    reference = auth.auth_reference
+
+    assert client.ensure_authenticated()
+    assert auth.auth_reference != reference
+    assert auth.is_valid()
+
+
+def test_unauthorized_response_expires_token(mock_ksef, make_client, monkeypatch):
+    client = make_client(mock_ksef)
+    assert client.ensure_authenticated()
+
+    monkeypatch.setitem(
+        mock_ksef_module.ROUTES,
+        ("GET", ENDPOINT_INVOICE_METADATA),
+        lambda mock, params, query, body: (401, {"error": "expired"}),
+    )
+    assert client.get_invoice_metadata("X") is None
+    assert not client.auth_service.is_valid()
+
+    assert client.ensure_authenticated()
+    assert client.auth_service.is_valid()
+
+
+def test_unauthorized_expires_only_the_rejected_client(
+    mock_ksef, make_client, monkeypatch
+):
+    first = make_client(mock_ksef)
+    second = KSeFClient(first.config, first.http)
+    assert first.ensure_authenticated()
+    assert second.ensure_authenticated()
+    assert first.access_token != second.access_token
+
+    monkeypatch.setitem(
+        mock_ksef_module.ROUTES,
+        ("GET", ENDPOINT_INVOICE_METADATA),
+        lambda mock, params, query, body: (401, {"error": "expired"}),
+    )
+    assert first.get_invoice_metadata("X") is None
+
+    assert not first.auth_service.is_valid()
+    assert second.auth_service.is_valid()
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_benchmark(*args):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+
+
+def test_cpu_benchmark_runs(tmp_path):
+    baseline = str(tmp_path / "cpu.json")
+    result = run_benchmark(
+        "benchmarks/cpu.py",
+        "--min-time",
+        "0.01",
+        "--repeats",
+        "1",
+        "--baseline",
+        baseline,
+        "--save-baseline",
+    )
+    assert result.returncode == 0, result.stderr
+    assert "generate_session_keys" in result.stdout
+    assert os.path.exists(baseline)
+
+
+def test_cold_paths_do_not_import_heavy_modules():
+    result = run_benchmark(
+        "benchmarks/import_time.py", "--runs", "1", "--max-ms", "5000"
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
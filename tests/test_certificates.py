@@ -0,0 +1,80 @@
+from ksef.certificates import CertificateStore
+from ksef.constants import CERT_USAGE_SYMMETRIC_KEY, ENDPOINT_PUBLIC_KEYS, HTTP_OK
+from ksef.http_client import HttpClient
+from ksef.utils import build_search_body
+import benchmarks.mock_ksef as mock_ksef_module
+
+
+class RecordingLogger:
+
+    def __init__(self):
+        self.warnings = []
+
+    def info(self, message, *args):
+        pass
+
+    def warning(self, message, *args):
+        self.warnings.append(message % args)
+
+
+def serve_certificates(monkeypatch, certificates):
+    calls = []
+
+    def public_keys(mock, params, query, body):
+        calls.append(1)
+        return HTTP_OK, certificates
+
+    monkeypatch.setitem(
+        mock_ksef_module.ROUTES, ("GET", ENDPOINT_PUBLIC_KEYS), public_keys
+    )
+    return calls
+
+
+def test_find_returns_matching_certificate_once(mock_ksef, monkeypatch):
+    calls = serve_certificates(
+        monkeypatch,
+        [
+            {"certificate": "token-cert", "usage": ["KsefTokenEncryption"]},
+            {"certificate": "key-cert", "usage": [CERT_USAGE_SYMMETRIC_KEY]},
+        ],
+    )
+    logger = RecordingLogger()
+    store = CertificateStore(HttpClient(mock_ksef.base_url), logger)
+
+    assert store.find(CERT_USAGE_SYMMETRIC_KEY) == "key-cert"
+    assert store.find(CERT_USAGE_SYMMETRIC_KEY) == "key-cert"
+    assert len(calls) == 1
+    assert logger.warnings == []
+
+
+def test_find_warns_when_falling_back(mock_ksef, monkeypatch):
+    serve_certificates(
+        monkeypatch,
+        [{"certificate": "token-cert", "usage": ["KsefTokenEncryption"]}],
+    )
+    logger = RecordingLogger()
+    store = CertificateStore(HttpClient(mock_ksef.base_url), logger)
+
+    assert store.find(CERT_USAGE_SYMMETRIC_KEY) == "token-cert"
+    assert len(logger.warnings) == 1
+
+
+def test_build_search_body_maps_optional_params():
+    body = build_search_body(
+        {
+            "subject_type": "Subject1",
+            "date_type": "Issue",
+            "date_from": "2025-11-01",
+            "date_to": "2025-11-30",
+            "seller_nip": "5260250274",
+            "currency_codes": ["PLN"],
+            "invoice_number": None,
+        }
+    )
+
+    assert body == {
+        "subjectType": "Subject1",
+        "dateRange": {"dateType": "Issue", "from": "2025-11-01", "to": "2025-11-30"},
+        "sellerNip": "5260250274",
+        "currencyCodes": ["PLN"],
+    }
@@ -0,0 +1,75 @@
+from ksef.circuit_breaker import CircuitBreaker
+from ksef.constants import BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_breaker(clock, **overrides):
+    options = dict(
+        failure_threshold=3,
+        reset_timeout=10.0,
+        half_open_probes=2,
+        max_reset_timeout=40.0,
+        clock=clock,
+    )
+    options.update(overrides)
+    return CircuitBreaker(**options)
+
+
+def test_opens_after_consecutive_failures():
+    breaker = make_breaker(FakeClock())
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.degraded
+
+    breaker.record_failure()
+
+    assert breaker.state == BREAKER_OPEN
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_half_open_limits_probes_and_closes_on_success():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.now = 10.0
+    assert breaker.allow()
+    assert breaker.state == BREAKER_HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == BREAKER_HALF_OPEN
+    breaker.record_success()
+
+    assert breaker.state == BREAKER_CLOSED
+    assert not breaker.degraded
+    assert breaker.stats()["opens"] == 1
+
+
+def test_failed_probe_reopens_with_backoff():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+
+    for expected_timeout in (20.0, 40.0, 40.0):
+        clock.now += breaker.stats()["retryIn"]
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == BREAKER_OPEN
+        assert breaker.stats()["retryIn"] == expected_timeout
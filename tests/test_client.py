@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+import requests
+import ksef.invoice_service
+
+
+def test_services_are_built_once_across_threads(mock_ksef, make_client, monkeypatch):
+    client = make_client(mock_ksef)
+    built = []
+    original = ksef.invoice_service.InvoiceService.__init__
+
+    def slow_init(self, *args, **kwargs):
+        built.append(self)
+        time.sleep(0.05)
+        original(self, *args, **kwargs)
+
+    monkeypatch.setattr(ksef.invoice_service.InvoiceService, "__init__", slow_init)
+    services = []
+    threads = [
+        threading.Thread(target=lambda: services.append(client.invoice_service))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(built) == 1
+    assert len({id(service) for service in services}) == 1
+
+
+def test_concurrent_jobs_open_one_session(mock_ksef, make_client):
+    client = make_client(mock_ksef)
+    opened = []
+    threads = [
+        threading.Thread(target=lambda: opened.append(client.ensure_session()))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert opened == [True] * 4
+    assert len(mock_ksef.sessions) == 1
+
+
+def test_session_needs_both_auth_and_encryption(mock_ksef, make_client, monkeypatch):
+    client = make_client(mock_ksef)
+    monkeypatch.setattr(client.session_service, "_build_encryption", lambda: None)
+
+    assert client.ensure_session() is False
+    assert client.access_token
+    assert client.session_reference is None
+    assert mock_ksef.sessions == {}
+
+
+def test_encryption_error_is_surfaced(mock_ksef, make_client, monkeypatch):
+    client = make_client(mock_ksef)
+
+    def fail():
+        raise requests.ConnectionError("certificates unavailable")
+
+    monkeypatch.setattr(client.session_service, "_build_encryption", fail)
+
+    with pytest.raises(requests.ConnectionError):
+        client.ensure_session()
+    assert client.session_service._prepared_encryption is None
+    assert mock_ksef.sessions == {}
+
+
+def test_auth_failure_is_surfaced(mock_ksef, make_client, monkeypatch):
+    client = make_client(mock_ksef)
+    monkeypatch.setattr(client, "authenticate", lambda: False)
+
+    assert client.ensure_session() is False
+    assert mock_ksef.sessions == {}
+
+    def fail():
+        raise requests.ConnectionError("auth unavailable")
+
+    monkeypatch.setattr(client, "authenticate", fail)
+    with pytest.raises(requests.ConnectionError):
+        client.ensure_session()
+    assert mock_ksef.sessions == {}
+    assert client._ensure_online_session() is False
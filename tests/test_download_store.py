@@ -0,0 +1,78 @@
+import os
+import time
+import pytest
+from ksef.constants import PARTIAL_STALE_SECONDS
+from ksef.download_store import DownloadStore
+
+NUMBER = "5260250274-20251105-0000000000AB-CD"
+
+
+def test_flat_and_layout_paths(tmp_path):
+    assert DownloadStore(str(tmp_path)).path_for(NUMBER) == tmp_path / f"{NUMBER}.xml"
+
+    store = DownloadStore(str(tmp_path), "{year}/{month}/{seller_nip}")
+    assert store.path_for(NUMBER) == (
+        tmp_path / "2025" / "11" / "5260250274" / f"{NUMBER}.xml"
+    )
+    assert store.path_for(NUMBER, {"issueDate": "2024-02-29"}).parts[-4:-1] == (
+        "2024",
+        "02",
+        "5260250274",
+    )
+
+
+@pytest.mark.parametrize("layout", ["{year}/{nip}", "{year", "{0}", "{}"])
+def test_invalid_layout_rejected_upfront(tmp_path, layout):
+    with pytest.raises(ValueError):
+        DownloadStore(str(tmp_path), layout)
+
+
+def test_write_verifies_hash(tmp_path):
+    store = DownloadStore(str(tmp_path))
+    path = store.path_for(NUMBER)
+    content = b"<Faktura/>"
+
+    assert not store.write(path, content, "wrong")
+    assert not path.exists()
+    assert store.write(path, content, DownloadStore.content_hash(content))
+    assert store.is_present(path, DownloadStore.content_hash(content))
+    assert not store.is_present(path, "other")
+    assert os.listdir(store.partial_dir) == []
+
+
+def test_cleanup_keeps_fresh_partials_of_other_runs(tmp_path):
+    store = DownloadStore(str(tmp_path))
+    store.partial_dir.mkdir()
+    own = store.partial_dir / f"{os.getpid()}-a.part"
+    other = store.partial_dir / "999999999-b.part"
+    stale = store.partial_dir / "999999999-c.part"
+    for path in (own, other, stale):
+        path.write_bytes(b"x")
+    old = time.time() - PARTIAL_STALE_SECONDS * 2
+    os.utime(stale, (old, old))
+
+    assert store.cleanup_partials() == 2
+    assert sorted(os.listdir(store.partial_dir)) == [other.name]
+
+
+def test_disk_error_fails_one_invoice_only(mock_ksef, make_client, tmp_path):
+    from ksef.output_sinks import DirectorySink
+
+    class FlakySink(DirectorySink):
+        def write(self, ksef_number, content, metadata):
+            if ksef_number == numbers[1]:
+                raise OSError(28, "No space left on device")
+            return super().write(ksef_number, content, metadata)
+
+    client = make_client(mock_ksef)
+    assert client.ensure_authenticated()
+    numbers = [invoice["ksefNumber"] for invoice in mock_ksef.stored[:3]]
+
+    with FlakySink(str(tmp_path / "out")) as sink:
+        results = client.download_multiple_invoices(numbers, sink=sink)
+
+    assert results["successful"] == 2
+    assert results["failed"] == 1
+    failed = [r for r in results["results"] if r["status"] == "failed"]
+    assert failed[0]["ksefNumber"] == numbers[1]
+    assert "No space left" in failed[0]["error"]
@@ -0,0 +1,63 @@
+import base64
+import json
+import pytest
+from ksef.constants import AES_BLOCK_SIZE, BASE64_CHUNK_SIZE
+from ksef.encryption import EncryptionManager
+
+SIZES = [
+    0,
+    1,
+    AES_BLOCK_SIZE - 1,
+    AES_BLOCK_SIZE,
+    AES_BLOCK_SIZE + 1,
+    1000,
+    BASE64_CHUNK_SIZE - 1,
+    BASE64_CHUNK_SIZE,
+    2 * BASE64_CHUNK_SIZE + 7,
+]
+
+
+@pytest.fixture
+def manager():
+    manager = EncryptionManager()
+    manager._generate_random_keys()
+    return manager
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_streamed_body_matches_dict_encoding(manager, size):
+    invoice_xml = ("<Faktura>" + "x" * size)[:size]
+
+    body = manager.encrypt_invoice_body(invoice_xml)
+
+    expected = json.dumps(manager.encrypt_invoice(invoice_xml), separators=(",", ":"))
+    assert bytes(body) == expected.encode("ascii")
+
+
+def test_multibyte_invoice_uses_encoded_size(manager):
+    invoice_xml = "<Faktura>Zażółć gęślą jaźń</Faktura>"
+
+    record = json.loads(bytes(manager.encrypt_invoice_body(invoice_xml)))
+
+    assert record == manager.encrypt_invoice(invoice_xml)
+    assert record["invoiceSize"] == len(invoice_xml.encode("utf-8"))
+
+
+@pytest.mark.parametrize("size", [0, AES_BLOCK_SIZE, 1000])
+def test_body_decrypts_to_invoice(manager, size):
+    invoice_xml = "a" * size
+    record = json.loads(bytes(manager.encrypt_invoice_body(invoice_xml)))
+    encrypted = base64.b64decode(record["encryptedInvoiceContent"])
+
+    decryptor = manager.decryptor()
+    plain = decryptor.update(encrypted) + decryptor.finalize()
+
+    assert plain == invoice_xml.encode("utf-8")
+    assert (
+        record["encryptedInvoiceSize"] == (size // AES_BLOCK_SIZE + 1) * AES_BLOCK_SIZE
+    )
+
+
+def test_keys_are_required():
+    with pytest.raises(RuntimeError):
+        EncryptionManager().encrypt_invoice_body("<Faktura/>")
@@ -0,0 +1,75 @@
+import os
+
+from ksef.constants import ENDPOINT_INVOICE_EXPORT_STATUS, HTTP_OK
+import benchmarks.mock_ksef as mock_ksef_module
+
+SEARCH = dict(
+    subject_type="Subject1",
+    date_type="Issue",
+    date_from="2025-11-01T00:00:00",
+    date_to="2025-11-30T23:59:59",
+)
+
+
+def test_export_decrypts_parts_into_sink(mock_ksef, make_client, tmp_path):
+    mock_ksef.export_part_size = 4096
+    client = make_client(mock_ksef)
+    assert client.ensure_authenticated()
+    output = tmp_path / "out"
+
+    results = client.export_invoices(str(output), workers=3, **SEARCH)
+
+    package = next(iter(mock_ksef.exports.values()))["package"]
+    assert len(package["parts"]) > 3
+    assert results["successful"] == 50
+    assert results["truncated"] is False
+    saved = {
+        name[: -len(".xml")]: os.path.join(root, name)
+        for root, _, names in os.walk(output)
+        for name in names
+    }
+    assert set(saved) == set(mock_ksef.stored_by_number)
+    invoice = mock_ksef.stored[0]
+    with open(saved[invoice["ksefNumber"]], "rb") as f:
+        assert f.read() == invoice["content"]
+
+
+def test_export_rejects_tampered_part(mock_ksef, make_client, tmp_path, monkeypatch):
+    mock_ksef.export_part_size = 4096
+    client = make_client(mock_ksef)
+    assert client.ensure_authenticated()
+    route = mock_ksef_module.ROUTES[("GET", mock_ksef_module.ENDPOINT_EXPORT_PART)]
+
+    def tampered(mock, params, query, body):
+        status, blob = route(mock, params, query, body)
+        if params["part"] == "2":
+            blob = blob[:16] + bytes(16) + blob[32:]
+        return status, blob
+
+    monkeypatch.setitem(
+        mock_ksef_module.ROUTES,
+        ("GET", mock_ksef_module.ENDPOINT_EXPORT_PART),
+        tampered,
+    )
+
+    assert client.export_invoices(str(tmp_path / "out"), **SEARCH) is None
+    assert not (tmp_path / "out").exists() or not os.listdir(tmp_path / "out")
+
+
+def test_export_rejects_wrong_part_hash(mock_ksef, make_client, tmp_path, monkeypatch):
+    client = make_client(mock_ksef)
+    assert client.ensure_authenticated()
+    route = mock_ksef_module.ROUTES[("GET", ENDPOINT_INVOICE_EXPORT_STATUS)]
+
+    def wrong_hash(mock, params, query, body):
+        status, payload = route(mock, params, query, body)
+        if status == HTTP_OK and "package" in payload:
+            for part in payload["package"]["parts"]:
+                part["partHash"] = "AAAA"
+        return status, payload
+
+    monkeypatch.setitem(
+        mock_ksef_module.ROUTES, ("GET", ENDPOINT_INVOICE_EXPORT_STATUS), wrong_hash
+    )
+
+    assert client.export_invoices(str(tmp_path / "out"), **SEARCH) is None
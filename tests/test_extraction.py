@@ -0,0 +1,120 @@
+import csv
+from decimal import Decimal
+import pytest
+from ksef.constants import PARTIAL_DIR_NAME
+from ksef.extraction import (
+    COLUMNS,
+    export_fields,
+    extract_invoice_fields,
+    iter_extracted,
+    iter_invoice_files,
+)
+
+FA3 = """<?xml version="1.0" encoding="UTF-8"?>
+<Faktura xmlns="http://crd.gov.pl/wzor/2025/06/25/13775/">
+  <Naglowek>
+    <KodFormularza kodSystemowy="FA (3)" wersjaSchemy="1-0E">FA</KodFormularza>
+  </Naglowek>
+  <Podmiot1>
+    <DaneIdentyfikacyjne>
+      <NIP>5260250274</NIP>
+      <Nazwa>Sprzedawca {number}</Nazwa>
+    </DaneIdentyfikacyjne>
+  </Podmiot1>
+  <Podmiot2>
+    <DaneIdentyfikacyjne>
+      <NIP>1111111111</NIP>
+      <Nazwa>Nabywca</Nazwa>
+    </DaneIdentyfikacyjne>
+  </Podmiot2>
+  <Fa>
+    <KodWaluty>PLN</KodWaluty>
+    <P_1>2025-11-05</P_1>
+    <P_2>FV/{number}/2025</P_2>
+    <P_13_1>100.00</P_13_1>
+    <P_14_1>23.00</P_14_1>
+    <P_13_2>50.00</P_13_2>
+    <P_14_2>4.00</P_14_2>
+    <P_15>177.00</P_15>
+    <RodzajFaktury>VAT</RodzajFaktury>
+    <FaWiersz><NrWierszaFa>1</NrWierszaFa><P_7>Usluga</P_7></FaWiersz>
+    <FaWiersz><NrWierszaFa>2</NrWierszaFa><P_7>Towar</P_7></FaWiersz>
+  </Fa>
+</Faktura>
+"""
+
+
+@pytest.fixture
+def invoice_dir(tmp_path):
+    for number in range(1, 6):
+        path = tmp_path / f"5260250274-20251105-00000000000{number}-01.xml"
+        path.write_text(FA3.format(number=number), encoding="utf-8")
+    (tmp_path / "broken.xml").write_text("<Faktura><Fa>", encoding="utf-8")
+    (tmp_path / PARTIAL_DIR_NAME).mkdir()
+    (tmp_path / PARTIAL_DIR_NAME / "partial.xml").write_text(FA3, encoding="utf-8")
+    return tmp_path
+
+
+def test_extracts_fa3_fields(invoice_dir):
+    path = str(invoice_dir / "5260250274-20251105-000000000001-01.xml")
+
+    record = extract_invoice_fields(path)
+
+    assert record["ksef_number"] == "5260250274-20251105-000000000001-01"
+    assert record["form_code"] == "FA"
+    assert record["seller_nip"] == "5260250274"
+    assert record["seller_name"] == "Sprzedawca 1"
+    assert record["buyer_nip"] == "1111111111"
+    assert record["invoice_number"] == "FV/1/2025"
+    assert record["issue_date"] == "2025-11-05"
+    assert record["invoice_type"] == "VAT"
+    assert record["line_count"] == 2
+    assert record["net_23"] == Decimal("100.00")
+    assert record["vat_8"] == Decimal("4.00")
+    assert record["net_total"] == Decimal("150.00")
+    assert record["vat_total"] == Decimal("27.00")
+    assert record["gross"] == Decimal("177.00")
+    assert record["error"] is None
+
+
+def test_broken_file_reports_error(invoice_dir):
+    record = extract_invoice_fields(str(invoice_dir / "broken.xml"))
+
+    assert record["error"]
+    assert record["net_total"] is None
+
+
+def test_skips_partial_downloads(invoice_dir):
+    names = [path.rsplit("/", 1)[-1] for path in iter_invoice_files(str(invoice_dir))]
+
+    assert names[0] == "5260250274-20251105-000000000001-01.xml"
+    assert "partial.xml" not in names
+    assert len(names) == 6
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_export_csv_rows(invoice_dir, tmp_path_factory, workers):
+    output = str(tmp_path_factory.mktemp("out") / "fields.csv")
+
+    count = export_fields(str(invoice_dir), output, workers)
+
+    with open(output, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        assert reader.fieldnames == COLUMNS
+    assert count == len(rows) == 6
+    invoices = [row for row in rows if not row["error"]]
+    assert [row["invoice_number"] for row in invoices] == [
+        f"FV/{number}/2025" for number in range(1, 6)
+    ]
+    assert {row["gross"] for row in invoices} == {"177.00"}
+    assert {row["line_count"] for row in invoices} == {"2"}
+    assert rows[-1]["ksef_number"] == "broken" and rows[-1]["error"]
+
+
+def test_parallel_extraction_keeps_input_order(invoice_dir):
+    paths = list(iter_invoice_files(str(invoice_dir)))
+
+    records = list(iter_extracted(paths, workers=2, batch_size=2))
+
+    assert [record["file"] for record in records] == paths
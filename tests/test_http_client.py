@@ -0,0 +1,56 @@
+import socket
+import threading
+import pytest
+import requests
+from ksef.http_client import CircuitOpenError, HttpClient, request_not_sent
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def dropping_server():
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(65536)
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}"
+    listener.close()
+
+
+def test_refused_connection_is_not_sent():
+    client = HttpClient(f"http://127.0.0.1:{unused_port()}")
+    with pytest.raises(requests.ConnectionError) as error:
+        client.post_json("/invoices", {})
+    assert request_not_sent(error.value)
+
+
+def test_dropped_connection_after_body_is_unknown(dropping_server):
+    client = HttpClient(dropping_server)
+    with pytest.raises(requests.ConnectionError) as error:
+        client.post_json("/invoices", {"invoice": "x" * 1024})
+    assert not request_not_sent(error.value)
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (CircuitOpenError("open"), True),
+        (requests.ConnectTimeout("connect"), True),
+        (requests.ReadTimeout("read"), False),
+        (requests.ConnectionError("Connection aborted."), False),
+    ],
+)
+def test_request_not_sent_classification(error, expected):
+    assert request_not_sent(error) is expected
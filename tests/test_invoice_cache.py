@@ -0,0 +1,154 @@
+import json
+import shutil
+import threading
+import time
+import pytest
+import ksef.invoice_cache
+from ksef.invoice_cache import InvoiceCache
+
+
+def make_cache(tmp_path=None, **overrides):
+    options = dict(max_entries=10, max_bytes=1024, ttl_seconds=60)
+    if tmp_path is not None:
+        options["disk_dir"] = str(tmp_path)
+    options.update(overrides)
+    return InvoiceCache(**options)
+
+
+def test_hits_after_first_load():
+    cache = make_cache()
+    loads = []
+
+    for _ in range(3):
+        assert cache.get_or_load("k", lambda: loads.append(1) or "value") == "value"
+
+    assert len(loads) == 1
+    assert cache.stats()["hits"] == 2
+
+
+def test_none_is_not_cached():
+    cache = make_cache()
+    assert cache.get_or_load("k", lambda: None) is None
+    assert cache.get_or_load("k", lambda: "value") == "value"
+
+
+def test_evicts_least_recently_used():
+    cache = make_cache(max_entries=2)
+    cache.get_or_load("a", lambda: "1")
+    cache.get_or_load("b", lambda: "2")
+    cache.get_or_load("a", lambda: "x")
+    cache.get_or_load("c", lambda: "3")
+
+    assert cache.get_or_load("a", lambda: "reloaded") == "1"
+    assert cache.get_or_load("b", lambda: "reloaded") == "reloaded"
+
+
+def test_expired_entries_reload():
+    cache = make_cache(ttl_seconds=0.01)
+    cache.get_or_load("k", lambda: "old")
+    time.sleep(0.02)
+    assert cache.get_or_load("k", lambda: "new") == "new"
+
+
+def test_concurrent_loads_collapse():
+    cache = make_cache()
+    release = threading.Event()
+    loads = []
+    results = []
+
+    def loader():
+        loads.append(1)
+        release.wait(5)
+        return "value"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["collapsed"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert loads == [1]
+    assert results == ["value"] * 5
+
+
+def test_followers_receive_leader_exception():
+    cache = make_cache()
+    release = threading.Event()
+    errors = []
+
+    def loader():
+        release.wait(5)
+        raise ConnectionError("KSeF unavailable")
+
+    def worker():
+        try:
+            cache.get_or_load("k", loader)
+        except ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["collapsed"] < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert cache.get_or_load("k", lambda: "value") == "value"
+
+
+def test_disk_layer_survives_restart(tmp_path):
+    make_cache(tmp_path).get_or_load("k", lambda: {"xml": "<Faktura/>"})
+    assert make_cache(tmp_path).get_or_load("k", lambda: None) == {"xml": "<Faktura/>"}
+
+
+@pytest.mark.parametrize(
+    "record", [{"value": "old format"}, {"expiresAt": 1e12}, ["list"], "text"]
+)
+def test_malformed_disk_record_is_a_miss(tmp_path, record):
+    make_cache(tmp_path).get_or_load("k", lambda: "cached")
+    (path,) = tmp_path.glob("*.json")
+    path.write_text(json.dumps(record), encoding="utf-8")
+
+    assert make_cache(tmp_path).get_or_load("k", lambda: "fresh") == "fresh"
+
+
+def test_disk_write_failure_does_not_fail_the_load(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ksef.invoice_cache.os, "replace", fail)
+
+    assert cache.get_or_load("k", lambda: "value") == "value"
+    assert list(tmp_path.iterdir()) == []
+    assert cache.disk._bytes == 0
+
+
+def test_removed_cache_directory_does_not_fail_the_load(tmp_path):
+    cache = make_cache(tmp_path / "cache")
+    shutil.rmtree(tmp_path / "cache")
+
+    assert cache.get_or_load("k", lambda: "value") == "value"
+
+
+def test_concurrently_evicted_entry_is_a_miss(tmp_path, monkeypatch):
+    make_cache(tmp_path).get_or_load("k", lambda: "cached")
+
+    def evicted(path, *args):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(ksef.invoice_cache.os, "utime", evicted)
+    cache = make_cache(tmp_path)
+
+    assert cache.get_or_load("k", lambda: "fresh") == "fresh"
+    assert cache.stats()["misses"] == 1
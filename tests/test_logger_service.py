@@ -0,0 +1,109 @@
+import json
+import logging
+import threading
+from logging.handlers import QueueHandler
+import pytest
+from ksef.constants import LOG_FORMAT_JSON
+from ksef.logger_service import LoggerService
+
+
+class Rendered:
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        self.thread = threading.current_thread()
+        return self.text
+
+
+@pytest.fixture
+def make_logger(tmp_path, request):
+    services = []
+
+    def factory(level_file="DEBUG", **kwargs):
+        log_file = tmp_path / "logs" / f"{len(services)}.log"
+        service = LoggerService(
+            f"ksef-test-{request.node.name}-{len(services)}",
+            str(log_file),
+            level_file,
+            "CRITICAL",
+            **kwargs,
+        )
+        service.logger.propagate = False
+        services.append(service)
+        return service, log_file
+
+    yield factory
+
+    for service in services:
+        service.close()
+        for handler in list(service.logger.handlers):
+            service.logger.removeHandler(handler)
+            handler.close()
+
+
+def read_json(service, log_file):
+    service.close()
+    for handler in service.logger.handlers:
+        handler.flush()
+    return [json.loads(line) for line in log_file.read_text().splitlines()]
+
+
+def test_json_formatter_includes_fields(make_logger):
+    service, log_file = make_logger(log_format=LOG_FORMAT_JSON)
+
+    service.info("Sent %d/%d", 1, 2, referenceNumber="REF-1")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        service.error("Job failed: %s", "boom", exc_info=True)
+
+    first, second = read_json(service, log_file)
+    assert first["message"] == "Sent 1/2"
+    assert first["level"] == "INFO"
+    assert first["referenceNumber"] == "REF-1"
+    assert first["time"].endswith("+00:00")
+    assert second["level"] == "ERROR"
+    assert "ValueError: boom" in second["exception"]
+
+
+def test_async_logging_goes_through_the_queue(make_logger):
+    service, log_file = make_logger(log_format=LOG_FORMAT_JSON, async_logging=True)
+
+    assert isinstance(service.logger.handlers[0], QueueHandler)
+    assert service.listener is not None
+    for index in range(50):
+        service.debug("Record %d", index, index=index)
+
+    records = read_json(service, log_file)
+    assert service.listener is None
+    assert [record["message"] for record in records] == [
+        f"Record {index}" for index in range(50)
+    ]
+    assert records[-1]["index"] == 49
+
+
+def test_queued_records_are_formatted_by_the_listener(make_logger):
+    service, log_file = make_logger(async_logging=True)
+    value = Rendered("late")
+
+    service.info("Value: %s", value)
+    service.close()
+
+    assert value.calls == 1
+    assert value.thread != threading.current_thread()
+    assert log_file.read_text().rstrip().endswith("Value: late")
+
+
+def test_disabled_levels_are_not_formatted(make_logger):
+    service, _ = make_logger(level_file="WARNING")
+    value = Rendered("hidden")
+
+    service.debug("Value: %s", value)
+    service.info("Value: %s", value)
+
+    assert value.calls == 0
+    assert service.logger.level == logging.WARNING
@@ -0,0 +1,132 @@
+import math
+import pytest
+from ksef.metadata_frame import MetadataFrame
+from ksef.records import InvoiceMetadata
+
+
+def _numpy_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@pytest.fixture(
+    params=[
+        False,
+        pytest.param(
+            True,
+            marks=pytest.mark.skipif(
+                not _numpy_available(), reason="numpy not installed"
+            ),
+        ),
+    ],
+    ids=["python", "numpy"],
+)
+def use_numpy(request):
+    return request.param
+
+
+def record(number, seller, currency, net, vat, gross):
+    return InvoiceMetadata(
+        number,
+        seller_nip=seller,
+        currency=currency,
+        net_amount=net,
+        vat_amount=vat,
+        gross_amount=gross,
+    )
+
+
+RECORDS = [
+    record("A", "111", "PLN", 100.0, 23.0, 123.0),
+    record("B", "111", "PLN", 200.0, 46.0, 246.0),
+    record("C", "222", "EUR", 10.0, 2.3, 12.3),
+    record("D", "222", None, None, None, None),
+]
+
+
+def test_empty_frame_group_sum(use_numpy):
+    frame = MetadataFrame.from_records([], use_numpy)
+
+    assert len(frame) == 0
+    assert frame.sum("net_amount") == 0.0
+    grouped = frame.group_sum("currency")
+    assert len(grouped) == 0
+    assert grouped.to_dicts() == []
+
+
+def test_all_null_amounts_are_numeric(use_numpy):
+    frame = MetadataFrame.from_records(
+        [record("A", "111", "PLN", None, None, None)], use_numpy
+    )
+
+    assert frame.sum("gross_amount") == 0.0
+    rows = frame.group_sum("currency").to_dicts()
+    assert rows == [
+        {
+            "currency": "PLN",
+            "net_amount": 0.0,
+            "vat_amount": 0.0,
+            "gross_amount": 0.0,
+            "count": 1,
+        }
+    ]
+
+
+def test_plain_columns_with_null_amounts(use_numpy):
+    frame = MetadataFrame(
+        {"ksef_number": ["A", "B"], "gross_amount": [None, None]}, use_numpy
+    )
+    assert frame.sum("gross_amount") == 0.0
+
+
+def test_group_sum_by_seller_and_currency(use_numpy):
+    frame = MetadataFrame.from_records(RECORDS, use_numpy)
+    rows = {
+        (row["seller_nip"], row["currency"]): row
+        for row in frame.group_sum(("seller_nip", "currency")).to_dicts()
+    }
+
+    assert rows[("111", "PLN")]["gross_amount"] == pytest.approx(369.0)
+    assert rows[("111", "PLN")]["count"] == 2
+    assert rows[("222", "EUR")]["vat_amount"] == pytest.approx(2.3)
+    assert rows[("222", None)]["count"] == 1
+
+
+def test_filters(use_numpy):
+    frame = MetadataFrame.from_records(RECORDS, use_numpy)
+
+    assert frame.where(currency="PLN").column("ksef_number") == ["A", "B"]
+    assert frame.where(currency=["EUR", None]).column("ksef_number") == ["C", "D"]
+    assert frame.filter(frame.between("net_amount", 50, 150)).column("ksef_number") == [
+        "A"
+    ]
+    assert math.isclose(frame.sum("net_amount"), 310.0)
+
+
+def test_join_and_mismatches(use_numpy):
+    frame = MetadataFrame.from_records(RECORDS, use_numpy)
+    ledger = MetadataFrame(
+        {"ksef_number": ["A", "B", "X"], "gross_amount": [123.0, 250.0, 1.0]},
+        use_numpy,
+    )
+
+    joined = frame.join(ledger, "ksef_number")
+    assert joined.column("ksef_number") == ["A", "B"]
+    differing = joined.filter(joined.mismatches("gross_amount", "gross_amount_ledger"))
+    assert differing.column("ksef_number") == ["B"]
+
+    left = frame.join(ledger, "ksef_number", how="left")
+    assert len(left) == 4
+    assert left.to_dicts()[3]["gross_amount_ledger"] is None
+
+
+def test_flat_rows_from_index(use_numpy):
+    rows = [
+        {"ksef_number": "A", "currency": "PLN", "gross_amount": 10},
+        {"ksef_number": "B", "currency": "PLN", "gross_amount": None},
+    ]
+    frame = MetadataFrame.from_records(rows, use_numpy)
+    assert frame.sum("gross_amount") == 10.0
@@ -0,0 +1,44 @@
+import sqlite3
+
+from ksef.config import KSeFConfig
+from ksef.constants import DEFAULT_INDEX_DB
+
+SEARCH = dict(
+    subject_type="Subject1",
+    date_type="Issue",
+    date_from="2025-11-01T00:00:00",
+    date_to="2025-11-30T23:59:59",
+    page_size=10,
+)
+
+
+def test_config_defaults_to_index_constant():
+    assert KSeFConfig.index_db == DEFAULT_INDEX_DB
+
+
+def test_search_indexes_and_download_marks(mock_ksef, make_client, tmp_path):
+    client = make_client(mock_ksef, index_db=str(tmp_path / "index.db"))
+    assert client.ensure_authenticated()
+    numbers = [record.ksef_number for record in client.iter_search(**SEARCH)]
+
+    assert client.metadata_index.count() == 50
+    client.download_multiple_invoices(numbers[:3], str(tmp_path / "out"))
+
+    downloaded = client.query_index(downloaded=True)
+    assert sorted(row["ksef_number"] for row in downloaded) == sorted(numbers[:3])
+
+
+def test_index_write_failure_does_not_fail_download(
+    mock_ksef, make_client, tmp_path, monkeypatch
+):
+    client = make_client(mock_ksef, index_db=str(tmp_path / "index.db"))
+    assert client.ensure_authenticated()
+    numbers = [record.ksef_number for record in client.iter_search(**SEARCH)]
+
+    def locked(ksef_number, path):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(client.metadata_index, "mark_downloaded", locked)
+    results = client.download_multiple_invoices(numbers[:3], str(tmp_path / "out"))
+
+    assert results["successful"] == 3
@@ -0,0 +1,79 @@
+from ksef.constants import ENDPOINT_AUTH_STATUS, ENDPOINT_INVOICE_SEARCH
+from ksef.metrics import Histogram, MetricsRegistry, endpoint_template
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram("ksef_latency_seconds", "Latency.", [1.0, 0.1, 0.5])
+    for value in (0.05, 0.1, 0.3, 0.5, 2.0):
+        histogram.observe(value, endpoint="search")
+
+    assert histogram.render() == [
+        "# HELP ksef_latency_seconds Latency.",
+        "# TYPE ksef_latency_seconds histogram",
+        'ksef_latency_seconds_bucket{endpoint="search",le="0.1"} 2',
+        'ksef_latency_seconds_bucket{endpoint="search",le="0.5"} 4',
+        'ksef_latency_seconds_bucket{endpoint="search",le="1"} 4',
+        'ksef_latency_seconds_bucket{endpoint="search",le="+Inf"} 5',
+        'ksef_latency_seconds_sum{endpoint="search"} 2.95',
+        'ksef_latency_seconds_count{endpoint="search"} 5',
+    ]
+
+
+def test_histogram_series_are_kept_per_label_set():
+    histogram = Histogram("ksef_wait_seconds", "Wait.", [1.0])
+    histogram.observe(0.5, priority="poll")
+    histogram.observe(3.0, priority="bulk_send")
+
+    lines = histogram.render()
+
+    assert 'ksef_wait_seconds_bucket{priority="bulk_send",le="1"} 0' in lines
+    assert 'ksef_wait_seconds_bucket{priority="bulk_send",le="+Inf"} 1' in lines
+    assert 'ksef_wait_seconds_bucket{priority="poll",le="1"} 1' in lines
+    assert 'ksef_wait_seconds_count{priority="poll"} 1' in lines
+
+
+def test_registry_renders_counters_and_gauges():
+    registry = MetricsRegistry()
+    counter = registry.counter("ksef_requests_total", "Requests.")
+    counter.inc(status="200")
+    counter.inc(2, status="200")
+    assert registry.counter("ksef_requests_total", "Ignored.") is counter
+    registry.gauge("ksef_offline_spool_depth", "Depth.").set(3)
+
+    assert registry.render() == (
+        "# HELP ksef_requests_total Requests.\n"
+        "# TYPE ksef_requests_total counter\n"
+        'ksef_requests_total{status="200"} 3\n'
+        "# HELP ksef_offline_spool_depth Depth.\n"
+        "# TYPE ksef_offline_spool_depth gauge\n"
+        "ksef_offline_spool_depth 3\n"
+    )
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("ksef_errors_total", "Errors.").inc(
+        error='bad "quote"\\path\nnext'
+    )
+
+    assert (
+        'ksef_errors_total{error="bad \\"quote\\"\\\\path\\nnext"} 1'
+        in registry.render().splitlines()
+    )
+
+
+def test_write_to_file_replaces_atomically(tmp_path):
+    registry = MetricsRegistry()
+    registry.gauge("ksef_up", "Up.").set(1)
+    path = tmp_path / "metrics" / "ksef.prom"
+
+    registry.write_to_file(str(path))
+
+    assert path.read_text(encoding="utf-8").endswith("ksef_up 1\n")
+    assert [p.name for p in path.parent.iterdir()] == ["ksef.prom"]
+
+
+def test_endpoint_template_collapses_identifiers():
+    assert endpoint_template(ENDPOINT_INVOICE_SEARCH) == ENDPOINT_INVOICE_SEARCH
+    assert endpoint_template("/auth/20251105-AU-1234") == ENDPOINT_AUTH_STATUS
+    assert endpoint_template("/not/a/ksef/endpoint") == "other"
@@ -0,0 +1,168 @@
+import json
+import os
+import socket
+import time
+from types import SimpleNamespace
+
+from ksef import offline_spool as offline_spool_module
+from ksef.circuit_breaker import CircuitBreaker
+from ksef.constants import (
+    OFFLINE_SPOOL_DRAINED_FILE,
+    OFFLINE_SPOOL_FAILED_DIR,
+    OFFLINE_SPOOL_LOCK_FILE,
+    OFFLINE_SPOOL_MAX_ATTEMPTS,
+)
+from ksef.offline_spool import OfflineSpool
+
+
+def test_entries_survive_restart_in_order(tmp_path):
+    spool = OfflineSpool(str(tmp_path))
+    first = spool.put("<Faktura>1</Faktura>", {"path": "a.xml"})
+    spool.put("<Faktura>2</Faktura>")
+
+    reopened = OfflineSpool(str(tmp_path))
+    entries = reopened.peek(10)
+
+    assert reopened.depth == 2
+    assert [entry.entry_id for entry in entries][0] == first
+    assert entries[0].source == {"path": "a.xml"}
+    assert reopened.load(entries[1]) == "<Faktura>2</Faktura>"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_complete_removes_entry_and_records_outcome(tmp_path):
+    spool = OfflineSpool(str(tmp_path))
+    spool.put("<Faktura/>")
+    (entry,) = spool.peek(1)
+
+    spool.complete(entry, {"status": "success", "ksefNumber": "X"})
+
+    assert spool.depth == 0
+    assert spool.peek(10) == []
+    lines = (tmp_path / OFFLINE_SPOOL_DRAINED_FILE).read_text().splitlines()
+    record = json.loads(lines[0])
+    assert record["status"] == "success"
+    assert record["spoolId"] == entry.entry_id
+
+
+def test_drain_lock_is_exclusive_and_released(tmp_path):
+    spool = OfflineSpool(str(tmp_path))
+
+    with spool.drain_lock() as locked:
+        assert locked
+        with spool.drain_lock() as second:
+            assert not second
+
+    assert not (tmp_path / OFFLINE_SPOOL_LOCK_FILE).exists()
+
+
+def test_stale_drain_lock_is_taken_over(tmp_path):
+    spool = OfflineSpool(str(tmp_path))
+    lock = tmp_path / OFFLINE_SPOOL_LOCK_FILE
+    lock.write_text("12345")
+    os.utime(lock, (0, 0))
+
+    with spool.drain_lock() as locked:
+        assert locked
+
+
+def test_refused_sends_are_spooled_then_drained(mock_ksef, make_client, tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    spool_dir = str(tmp_path / "spool")
+    offline = make_client(
+        SimpleNamespace(base_url=f"http://127.0.0.1:{port}"),
+        offline_spool_dir=spool_dir,
+    )
+    offline.http.breaker = CircuitBreaker(failure_threshold=1)
+
+    results = offline.send_multiple_invoices(["<Faktura/>"] * 3)
+
+    assert results["spooled"] == 3
+    assert offline.offline_spool.depth == 3
+
+    online = make_client(mock_ksef, offline_spool_dir=spool_dir)
+    summary = online.drain_offline_spool()
+
+    assert summary == {
+        "drained": 3,
+        "successful": 3,
+        "failed": 0,
+        "retrying": 0,
+        "quarantined": 0,
+        "remaining": 0,
+    }
+
+
+def test_fail_keeps_entry_until_attempts_run_out(tmp_path):
+    spool = OfflineSpool(str(tmp_path))
+    spool.put("<Faktura/>", {"path": "a.xml"})
+    (entry,) = spool.peek(1)
+
+    for _ in range(OFFLINE_SPOOL_MAX_ATTEMPTS - 1):
+        assert not spool.fail(entry, {"status": "unknown"})
+        assert spool.depth == 1
+        assert spool.peek(1) == [entry]
+
+    assert spool.fail(entry, {"status": "failed"})
+
+    assert spool.depth == 0
+    assert spool.peek(10) == []
+    failed_dir = tmp_path / OFFLINE_SPOOL_FAILED_DIR
+    assert sorted(os.listdir(failed_dir)) == [
+        f"{entry.entry_id}.json",
+        f"{entry.entry_id}.xml",
+    ]
+    meta = json.loads((failed_dir / f"{entry.entry_id}.json").read_text())
+    assert meta["attempts"] == OFFLINE_SPOOL_MAX_ATTEMPTS
+    assert meta["lastResult"] == {"status": "failed"}
+    assert not (tmp_path / OFFLINE_SPOOL_DRAINED_FILE).exists()
+
+
+def test_drain_keeps_failed_entries_and_completes_rejected(
+    mock_ksef, make_client, tmp_path, monkeypatch
+):
+    spool_dir = str(tmp_path / "spool")
+    client = make_client(mock_ksef, offline_spool_dir=spool_dir)
+    spool = client.offline_spool
+    spool.put("<Faktura>1</Faktura>")
+    spool.put("<Faktura>2</Faktura>")
+    monkeypatch.setattr("ksef.client.OFFLINE_DRAIN_PAUSE_SECONDS", 0)
+
+    def send_batch(invoices, *args, **kwargs):
+        return {
+            "results": [
+                {
+                    "index": index,
+                    "status": "rejected" if "1" in invoice.content else "unknown",
+                }
+                for index, invoice in enumerate(invoices, 1)
+            ]
+        }
+
+    monkeypatch.setattr(client, "_send_batch", send_batch)
+    summary = client.drain_offline_spool()
+
+    assert summary["drained"] == 1
+    assert summary["failed"] == 1
+    assert summary["retrying"] == OFFLINE_SPOOL_MAX_ATTEMPTS - 1
+    assert summary["quarantined"] == 1
+    assert summary["remaining"] == 0
+    assert len(os.listdir(os.path.join(spool.directory, OFFLINE_SPOOL_FAILED_DIR))) == 2
+
+
+def test_drain_lock_mtime_is_refreshed_while_held(tmp_path, monkeypatch):
+    monkeypatch.setattr(offline_spool_module, "OFFLINE_SPOOL_LOCK_REFRESH", 0.01)
+    spool = OfflineSpool(str(tmp_path))
+    lock = tmp_path / OFFLINE_SPOOL_LOCK_FILE
+
+    with spool.drain_lock() as locked:
+        assert locked
+        os.utime(lock, (0, 0))
+        deadline = time.monotonic() + 5
+        while lock.stat().st_mtime == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert lock.stat().st_mtime > 0
+
+    assert not lock.exists()
@@ -0,0 +1,125 @@
+import gzip
+import json
+import tarfile
+import zipfile
+import pytest
+from ksef.download_store import DownloadStore
+from ksef.output_sinks import (
+    DirectorySink,
+    NdjsonGzSink,
+    OutputSink,
+    TarGzSink,
+    ZipSink,
+    create_output_sink,
+)
+
+INVOICES = {
+    "5260250274-20251105-000000000001-01": b"<Faktura>1</Faktura>",
+    "5260250274-20251105-000000000002-02": b"<Faktura>2</Faktura>",
+}
+
+
+def fill(sink):
+    for number, content in INVOICES.items():
+        metadata = {"invoiceHash": DownloadStore.content_hash(content)}
+        assert sink.write(number, content, metadata)
+
+
+def read_index(path):
+    with open(f"{path}.index.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_base_classes_are_abstract():
+    with pytest.raises(TypeError):
+        OutputSink()
+
+
+@pytest.mark.parametrize(
+    "target, expected",
+    [
+        ("out.zip", ZipSink),
+        ("out.tar.gz", TarGzSink),
+        ("out.jsonl.gz", NdjsonGzSink),
+        ("out", DirectorySink),
+    ],
+)
+def test_create_output_sink(tmp_path, target, expected):
+    sink = create_output_sink(str(tmp_path / target))
+    try:
+        assert isinstance(sink, expected)
+    finally:
+        sink.close()
+
+
+def test_zip_sink_round_trip(tmp_path):
+    path = tmp_path / "out.zip"
+    with ZipSink(str(path)) as sink:
+        fill(sink)
+        assert sink.write("X", b"<Faktura/>", {"invoiceHash": "wrong"}) is None
+
+    with zipfile.ZipFile(path) as archive:
+        assert {name[:-4] for name in archive.namelist()} == set(INVOICES)
+
+    index = read_index(path)
+    assert [entry["ksefNumber"] for entry in index] == list(INVOICES)
+    with open(path, "rb") as f:
+        f.seek(index[1]["offset"])
+        assert f.read(4) == b"PK\x03\x04"
+
+
+def test_tar_sink_records_uncompressed_member_offsets(tmp_path):
+    path = tmp_path / "out.tar.gz"
+    with TarGzSink(str(path)) as sink:
+        fill(sink)
+
+    with tarfile.open(path) as archive:
+        assert len(archive.getnames()) == 2
+
+    index = read_index(path)
+    assert [entry["ksefNumber"] for entry in index] == list(INVOICES)
+    with gzip.open(path, "rb") as f:
+        for entry, content in zip(index, INVOICES.values()):
+            f.seek(entry["offset"])
+            assert f.read(entry["size"]) == content
+
+
+def test_ndjson_sink_records_uncompressed_line_offsets(tmp_path):
+    path = tmp_path / "out.jsonl.gz"
+    with NdjsonGzSink(str(path)) as sink:
+        fill(sink)
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert [json.loads(line)["ksefNumber"] for line in f] == list(INVOICES)
+
+    index = read_index(path)
+    with gzip.open(path, "rb") as f:
+        for entry, (number, content) in zip(index, INVOICES.items()):
+            f.seek(entry["offset"])
+            line = f.read(entry["size"])
+            assert line.endswith(b"\n")
+            record = json.loads(line)
+            assert record["ksefNumber"] == number
+            assert record["xml"].encode("utf-8") == content
+
+
+@pytest.mark.parametrize("sink_class", [ZipSink, TarGzSink, NdjsonGzSink])
+def test_failed_run_discards_partial_archive(tmp_path, sink_class):
+    path = tmp_path / "out.archive"
+
+    with pytest.raises(RuntimeError):
+        with sink_class(str(path)) as sink:
+            fill(sink)
+            raise RuntimeError("interrupted")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_directory_sink_skips_present_files(tmp_path):
+    number, content = next(iter(INVOICES.items()))
+    metadata = {"invoiceHash": DownloadStore.content_hash(content)}
+
+    with DirectorySink(str(tmp_path)) as sink:
+        assert sink.find_existing(number, metadata) is None
+        location = sink.write(number, content, metadata)
+        assert sink.find_existing(number, metadata) == location
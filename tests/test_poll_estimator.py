@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from ksef.constants import (
+    POLL_ESTIMATE_MIN_SAMPLES,
+    POLL_MIN_DELAY,
+    POLL_PROBE_FACTOR,
+)
+from ksef.poll_estimator import ProcessingTimeEstimator
+
+
+def test_no_targets_until_enough_samples():
+    estimator = ProcessingTimeEstimator()
+    for _ in range(POLL_ESTIMATE_MIN_SAMPLES - 1):
+        estimator.observe(1.0)
+    assert estimator.stats()["targets"] == {}
+
+    plan = estimator.plan(time.time(), fallback_delay=0.5)
+    assert [plan.next_delay() for _ in range(3)] == [0.0, 0.5, 0.5]
+
+
+def test_targets_follow_sample_quantiles():
+    estimator = ProcessingTimeEstimator()
+    for value in range(1, 101):
+        estimator.observe(value / 100)
+
+    targets = estimator.stats()["targets"]
+
+    assert targets == {0.5: 0.5, 0.8: 0.8, 0.95: 0.95, 0.99: 0.99}
+
+
+def test_plan_skips_passed_targets_then_backs_off():
+    estimator = ProcessingTimeEstimator()
+    for value in range(1, 101):
+        estimator.observe(value / 100)
+    plan = estimator.plan(time.time() - 0.9, fallback_delay=5.0)
+
+    delays = [plan.next_delay() for _ in range(4)]
+
+    assert delays[0] == pytest.approx(0.05, abs=0.02)
+    assert delays[1] == POLL_MIN_DELAY
+    assert 0.49 * 0.8 <= delays[2] <= 0.49 * 1.2
+    assert 0.98 * 0.8 <= delays[3] <= 0.98 * 1.2
+
+
+def test_finished_records_bracketed_and_probe_samples():
+    estimator = ProcessingTimeEstimator()
+    sent_at = time.time() - 2.0
+
+    bracketed = estimator.plan(sent_at, fallback_delay=5.0)
+    bracketed.pending()
+    bracketed.finished(sent_at + 2.0)
+    probe = estimator.plan(time.time(), fallback_delay=5.0)
+    probe.finished(probe.sent_at + 1.0)
+
+    assert list(estimator._samples) == [2.0, 1.0 * POLL_PROBE_FACTOR]
+
+
+def test_samples_persist_per_key(tmp_path):
+    path = str(tmp_path / "stats.json")
+    first = ProcessingTimeEstimator(path, key="test")
+    for _ in range(POLL_ESTIMATE_MIN_SAMPLES):
+        first.observe(0.3)
+    first.save()
+    ProcessingTimeEstimator(path, key="prod").save()
+
+    reloaded = ProcessingTimeEstimator(path, key="test")
+    other = ProcessingTimeEstimator(path, key="prod")
+
+    assert reloaded.stats()["samples"] == POLL_ESTIMATE_MIN_SAMPLES
+    assert reloaded.stats()["targets"][0.5] == 0.3
+    assert other.stats()["samples"] == 0
+
+
+def test_corrupt_stats_file_is_ignored(tmp_path):
+    path = tmp_path / "stats.json"
+    path.write_text("{not json")
+
+    assert ProcessingTimeEstimator(str(path)).stats()["samples"] == 0
@@ -0,0 +1,88 @@
+import pickle
+
+from ksef.records import InvoiceMetadata, ResultRecord, StatusEntry
+
+API_INVOICE = {
+    "ksefNumber": "5260250274-20251101-0100000000AB-01",
+    "invoiceNumber": "FV/1/2025",
+    "seller": {"nip": "5260250274", "name": "Seller"},
+    "buyer": {"identifier": {"type": "Nip", "value": "1234567890"}, "name": "Buyer"},
+    "issueDate": "2025-11-01",
+    "invoicingDate": "2025-11-01T10:00:00+00:00",
+    "acquisitionDate": "2025-11-01T10:00:05+00:00",
+    "netAmount": 100.0,
+    "vatAmount": 23.0,
+    "grossAmount": 123.0,
+    "currency": "PLN",
+    "formCode": {"value": "FA"},
+    "invoiceType": "Vat",
+    "invoiceHash": "abc=",
+    "hasAttachment": False,
+}
+
+
+def test_invoice_metadata_round_trips_api_dict():
+    record = InvoiceMetadata.from_api(API_INVOICE)
+
+    assert record.seller_nip == "5260250274"
+    assert record.gross_amount == 123.0
+    assert record.extra == {"hasAttachment": False}
+    assert record.to_dict() == API_INVOICE
+
+
+def test_invoice_metadata_is_slotted_and_interned():
+    first = InvoiceMetadata.from_api(API_INVOICE)
+    second = InvoiceMetadata.from_api(
+        {**API_INVOICE, "seller": {"nip": "".join("5260250274")}}
+    )
+
+    assert not hasattr(first, "__dict__")
+    assert first.seller_nip is second.seller_nip
+    assert first.currency is second.currency
+
+
+def test_amounts_are_parsed_as_floats():
+    record = InvoiceMetadata.from_api(
+        {"ksefNumber": "X", "netAmount": "10.50", "grossAmount": 12}
+    )
+
+    assert record.net_amount == 10.5
+    assert isinstance(record.gross_amount, float)
+    assert record.vat_amount is None
+    assert record.to_dict() == {
+        "ksefNumber": "X",
+        "netAmount": 10.5,
+        "grossAmount": 12.0,
+    }
+
+
+def test_records_pickle_and_compare():
+    record = InvoiceMetadata.from_api(API_INVOICE)
+
+    assert pickle.loads(pickle.dumps(record)) == record
+    assert record != InvoiceMetadata.from_api({**API_INVOICE, "currency": "EUR"})
+
+
+def test_status_entry_round_trip():
+    data = {
+        "referenceNumber": "ref-1",
+        "ksefNumber": "X",
+        "status": {"code": 200, "description": "Accepted"},
+        "ordinalNumber": 1,
+    }
+
+    entry = StatusEntry.from_api(data)
+
+    assert entry.code == 200
+    assert entry.extra == {"ordinalNumber": 1}
+    assert entry.to_dict() == data
+
+
+def test_result_record_round_trip():
+    data = {"index": 3, "status": "failed", "error": "Invalid", "size": 10}
+
+    record = ResultRecord.from_dict(data)
+
+    assert record.status == "failed"
+    assert record.extra == {"size": 10}
+    assert record.to_dict() == data
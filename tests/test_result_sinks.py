@@ -0,0 +1,93 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ksef.result_sinks import JsonlResultSink, create_result_sink, iter_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_jsonl_sink_replaces_previous_run(tmp_path):
+    path = tmp_path / "results.jsonl"
+    with JsonlResultSink(str(path)) as sink:
+        sink.append({"index": 1, "status": "success", "ksefNumber": "A"})
+        sink.append({"index": 2, "status": "failed", "error": "boom"})
+    with JsonlResultSink(str(path)) as sink:
+        sink.append({"index": 1, "status": "success", "ksefNumber": "B"})
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    assert lines[-1] == {"summary": {"records": 1, "success": 1}}
+    assert [r.ksef_number for r in iter_results(str(path))] == ["B"]
+
+
+def test_sqlite_sink_records_each_result(tmp_path):
+    path = str(tmp_path / "results.db")
+    seen = []
+    with create_result_sink(path, seen.append) as sink:
+        sink.append({"index": 1, "status": "success", "ksefNumber": "A"})
+        sink.append({"index": 2, "status": "failed", "error": "boom"})
+        assert sink.summary() == {"records": 2, "success": 1, "failed": 1}
+
+    records = list(iter_results(path))
+
+    assert [r.status for r in records] == ["success", "failed"]
+    assert records[1].error == "boom"
+    assert len(seen) == 2
+
+
+def test_close_is_idempotent(tmp_path):
+    path = tmp_path / "results.jsonl"
+    sink = create_result_sink(str(path))
+    sink.append({"status": "success"})
+    sink.close()
+    sink.close()
+
+    assert len(path.read_text().splitlines()) == 2
+
+
+def test_unknown_target_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        create_result_sink(str(tmp_path / "results.csv"))
+    assert not (tmp_path / "results.csv").exists()
+
+
+def test_cli_rejects_unknown_target_before_sending(tmp_path):
+    directory = tmp_path / "outgoing"
+    directory.mkdir()
+    (directory / "invoice.xml").write_text("<Faktura/>")
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            os.path.join(ROOT, "main.py"),
+            "send-batch",
+            "--directory",
+            str(directory),
+            "--results",
+            str(tmp_path / "results.csv"),
+        ],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert result.returncode == 2
+    assert "Unsupported result sink" in result.stderr
+    assert sorted(os.listdir(tmp_path)) == ["outgoing"]
+
+
+def test_batch_send_streams_results_to_sink(mock_ksef, make_client, tmp_path):
+    client = make_client(mock_ksef)
+    path = str(tmp_path / "results.jsonl")
+
+    with create_result_sink(path) as sink:
+        results = client.send_multiple_invoices(["<Faktura/>"] * 3, result_sink=sink)
+
+    assert "results" not in results
+    assert results["successful"] == 3
+    assert sorted(r.index for r in iter_results(path)) == [1, 2, 3]
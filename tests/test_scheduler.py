@@ -0,0 +1,107 @@
+import threading
+import time
+
+from ksef.constants import (
+    PRIORITY_BULK_SEND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_SEARCH,
+    SCHEDULER_MODE_WEIGHTED,
+)
+from ksef.rate_limiter import RateLimiter
+from ksef.scheduler import PriorityGate, PriorityScheduler
+
+
+def wait_for_waiting(gate, priority, count):
+    for _ in range(200):
+        if gate.stats()[priority]["waiting"] >= count:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"{priority} never queued")
+
+
+def test_select_has_no_side_effects():
+    gate = PriorityGate(SCHEDULER_MODE_WEIGHTED)
+    gate._pass[PRIORITY_INTERACTIVE] = 5.0
+    gate._waiting[PRIORITY_INTERACTIVE].append((float("inf"), 0))
+    gate._waiting[PRIORITY_SEARCH].append((float("inf"), 1))
+    before = dict(gate._pass)
+
+    choices = {gate._select() for _ in range(10)}
+
+    assert choices == {(PRIORITY_SEARCH, (float("inf"), 1))}
+    assert gate._pass == before
+
+
+def test_gate_runs_interactive_job_before_queued_bulk_job():
+    gate = PriorityGate(SCHEDULER_MODE_WEIGHTED)
+    order = []
+    release = threading.Event()
+    with gate.hold(PRIORITY_BULK_SEND):
+        pass
+
+    def job(priority):
+        with gate.hold(priority):
+            order.append(priority)
+            if priority == PRIORITY_SEARCH:
+                release.wait(5)
+
+    running = threading.Thread(target=job, args=(PRIORITY_SEARCH,))
+    running.start()
+    while not order:
+        time.sleep(0.005)
+
+    bulk = threading.Thread(target=job, args=(PRIORITY_BULK_SEND,))
+    bulk.start()
+    wait_for_waiting(gate, PRIORITY_BULK_SEND, 1)
+    interactive = threading.Thread(target=job, args=(PRIORITY_INTERACTIVE,))
+    interactive.start()
+    wait_for_waiting(gate, PRIORITY_INTERACTIVE, 1)
+
+    release.set()
+    for thread in (running, bulk, interactive):
+        thread.join(5)
+
+    assert order == [PRIORITY_SEARCH, PRIORITY_INTERACTIVE, PRIORITY_BULK_SEND]
+
+
+def test_gate_times_out_past_deadline():
+    gate = PriorityGate(SCHEDULER_MODE_WEIGHTED)
+    with gate.hold(PRIORITY_SEARCH):
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(
+                gate._enter(PRIORITY_BULK_SEND, time.time() + 0.05)
+            )
+        )
+        thread.start()
+        thread.join(5)
+
+    assert results == [False]
+    assert gate.stats()[PRIORITY_BULK_SEND]["expired"] == 1
+
+
+def test_weighted_shares_follow_weights():
+    scheduler = PriorityScheduler(RateLimiter(100000), SCHEDULER_MODE_WEIGHTED)
+    stop = threading.Event()
+
+    def worker(priority):
+        while not stop.is_set():
+            scheduler.acquire(priority)
+
+    threads = [
+        threading.Thread(target=worker, args=(p,))
+        for p in (PRIORITY_INTERACTIVE, PRIORITY_INTERACTIVE, PRIORITY_SEARCH)
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)
+    stop.set()
+    for thread in threads:
+        thread.join(5)
+
+    stats = scheduler.stats()
+    interactive = stats[PRIORITY_INTERACTIVE]["granted"]
+    search = stats[PRIORITY_SEARCH]["granted"]
+    assert interactive > 3 * search
+    assert search > 0
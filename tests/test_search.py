@@ -0,0 +1,59 @@
+import pytest
+
+from ksef.constants import ENDPOINT_INVOICE_SEARCH, HTTP_BAD_REQUEST
+from ksef.invoice_service import SearchIncompleteError
+import benchmarks.mock_ksef as mock_ksef_module
+
+SEARCH = dict(
+    subject_type="Subject1",
+    date_type="Issue",
+    date_from="2025-11-01T00:00:00",
+    date_to="2025-11-30T23:59:59",
+    page_size=10,
+)
+
+
+def fail_page(monkeypatch, failing_offset):
+    route = mock_ksef_module.ROUTES[("POST", ENDPOINT_INVOICE_SEARCH)]
+
+    def failing(mock, params, query, body):
+        if int(query.get("pageOffset", ["0"])[0]) == failing_offset:
+            return HTTP_BAD_REQUEST, {}
+        return route(mock, params, query, body)
+
+    monkeypatch.setitem(
+        mock_ksef_module.ROUTES, ("POST", ENDPOINT_INVOICE_SEARCH), failing
+    )
+
+
+def test_iter_search_follows_all_pages(mock_ksef, make_client):
+    client = make_client(mock_ksef)
+    assert client.ensure_authenticated()
+
+    records = list(client.iter_search(**SEARCH))
+
+    assert len(records) == 50
+    assert len({record.ksef_number for record in records}) == 50
+
+
+def test_iter_search_raises_when_page_fails(mock_ksef, make_client, monkeypatch):
+    client = make_client(mock_ksef)
+    assert client.ensure_authenticated()
+    fail_page(monkeypatch, 2)
+
+    seen = []
+    with pytest.raises(SearchIncompleteError) as error:
+        for record in client.iter_search(**SEARCH):
+            seen.append(record)
+
+    assert error.value.page_offset == 2
+    assert len(seen) == 20
+
+
+def test_search_frame_raises_when_page_fails(mock_ksef, make_client, monkeypatch):
+    client = make_client(mock_ksef)
+    assert client.ensure_authenticated()
+    fail_page(monkeypatch, 0)
+
+    with pytest.raises(SearchIncompleteError):
+        client.search_frame(**SEARCH)
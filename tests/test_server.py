@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+from types import SimpleNamespace
+import pytest
+from ksef.server import KSeFServer
+
+TOKEN = "secret-token"
+
+
+def make_server(tmp_path, socket_path=None, token=TOKEN):
+    client = SimpleNamespace(
+        logger=logging.getLogger("test"),
+        config=SimpleNamespace(scheduler_mode="weighted"),
+    )
+    return KSeFServer(
+        client,
+        socket_path,
+        "127.0.0.1",
+        8765,
+        token,
+        str(tmp_path),
+    )
+
+
+def headers(**extra):
+    base = {
+        "Host": "127.0.0.1:8765",
+        "Authorization": f"Bearer {TOKEN}",
+        "Content-Type": "application/json",
+    }
+    base.update(extra)
+    return {k: v for k, v in base.items() if v is not None}
+
+
+def test_tcp_mode_requires_token(tmp_path):
+    with pytest.raises(ValueError):
+        make_server(tmp_path, token="")
+
+
+def test_unix_socket_mode_without_token(tmp_path):
+    server = make_server(tmp_path, socket_path=str(tmp_path / "s.sock"), token="")
+    assert server.check_request("POST", {"Content-Type": "application/json"}) is None
+
+
+def test_accepts_valid_request(tmp_path):
+    assert make_server(tmp_path).check_request("POST", headers()) is None
+
+
+@pytest.mark.parametrize(
+    "override, status",
+    [
+        ({"Authorization": None}, 401),
+        ({"Authorization": "Bearer wrong"}, 401),
+        ({"Authorization": f"Basic {TOKEN}"}, 401),
+        ({"Host": "evil.example:8765"}, 403),
+        ({"Origin": "https://evil.example"}, 403),
+        ({"Content-Type": "text/plain"}, 415),
+        ({"Content-Type": None}, 415),
+    ],
+)
+def test_rejects_unsafe_requests(tmp_path, override, status):
+    rejected = make_server(tmp_path).check_request("POST", headers(**override))
+    assert rejected is not None and rejected[0] == status
+
+
+def test_same_origin_and_json_charset_allowed(tmp_path):
+    request = headers(
+        Origin="http://localhost:8765",
+        **{"Content-Type": "application/json; charset=utf-8"},
+    )
+    assert make_server(tmp_path).check_request("POST", request) is None
+
+
+def test_output_dir_confined_to_root(tmp_path):
+    server = make_server(tmp_path)
+    root = os.path.realpath(str(tmp_path))
+
+    assert server._resolve_output_dir("") == root
+    assert server._resolve_output_dir("november") == os.path.join(root, "november")
+    assert server._resolve_output_dir("../outside") is None
+    assert server._resolve_output_dir("/etc") is None
+
+
+def test_download_outside_root_is_forbidden(tmp_path):
+    server = make_server(tmp_path)
+    server.client.ensure_authenticated = lambda: True
+
+    status, payload = server._download({"ksefNumbers": ["X"], "outputDir": "/tmp"})
+    assert status == 403
+    assert "outputDir" in payload["error"]
+
+
+def test_search_rejects_unknown_parameters(tmp_path):
+    server = make_server(tmp_path)
+    server.client.ensure_authenticated = lambda: True
+    server.client.search_invoices = lambda **params: {"invoices": [params]}
+
+    status, payload = server.dispatch(
+        "POST", "/search", {"subject_type": "Subject1", "priority": "interactive"}
+    )
+    assert status == 400
+    assert "priority" in payload["error"]
+
+    status, payload = server.dispatch(
+        "POST", "/search", {"subject_type": "Subject1", "page_size": 10}
+    )
+    assert status == 200
+    assert payload["invoices"] == [
+        {"priority": "search", "subject_type": "Subject1", "page_size": 10}
+    ]
+
+
+def test_jobs_run_concurrently_with_their_priority(tmp_path):
+    server = make_server(tmp_path)
+    barrier = threading.Barrier(2, timeout=5)
+    priorities = []
+
+    def send_single_invoice(xml, priority):
+        priorities.append(priority)
+        barrier.wait()
+        return {"status": "accepted"}
+
+    def send_multiple_invoices(invoices, keep_session, priority):
+        priorities.append(priority)
+        barrier.wait()
+        return {"total": len(invoices)}
+
+    server.client.send_single_invoice = send_single_invoice
+    server.client.send_multiple_invoices = send_multiple_invoices
+
+    results = {}
+    jobs = [
+        threading.Thread(
+            target=lambda: results.update(
+                bulk=server.dispatch("POST", "/send", {"invoices": ["<a/>"]})
+            )
+        ),
+        threading.Thread(
+            target=lambda: results.update(
+                single=server.dispatch("POST", "/send", {"xml": "<a/>"})
+            )
+        ),
+    ]
+    for job in jobs:
+        job.start()
+    for job in jobs:
+        job.join()
+
+    assert results["bulk"] == (200, {"total": 1})
+    assert results["single"] == (200, {"status": "accepted"})
+    assert sorted(priorities) == ["bulk_send", "interactive"]
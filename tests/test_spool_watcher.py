@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+
+from ksef.constants import (
+    ENDPOINT_SESSION_INVOICE_LIST,
+    SPOOL_RESULT_SUFFIX,
+    WATCH_MAX_SEND_ATTEMPTS,
+)
+from ksef.http_client import CircuitOpenError
+from ksef.spool_watcher import SpoolWatcher
+import benchmarks.mock_ksef as mock_ksef_module
+
+
+def write_invoice(directory, name, content="<Faktura/>"):
+    path = directory / name
+    path.write_text(content)
+    return str(path)
+
+
+def sidecar(directory, name):
+    with open(directory / f"{name}{SPOOL_RESULT_SUFFIX}", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_files_are_ready_once_size_and_mtime_settle(mock_ksef, make_client, tmp_path):
+    watcher = SpoolWatcher(make_client(mock_ksef), str(tmp_path))
+    path = write_invoice(tmp_path, "a.xml")
+    write_invoice(tmp_path, "empty.xml", "")
+
+    assert watcher._collect_ready_files() == []
+    assert watcher._collect_ready_files() == [path]
+
+    with open(path, "a") as f:
+        f.write("<!-- more -->")
+    assert watcher._collect_ready_files() == []
+    assert watcher._collect_ready_files() == [path]
+
+
+def test_vanished_file_is_skipped(mock_ksef, make_client, tmp_path, monkeypatch):
+    watcher = SpoolWatcher(make_client(mock_ksef), str(tmp_path))
+    write_invoice(tmp_path, "a.xml")
+
+    def vanished(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os.path, "getmtime", vanished)
+
+    assert watcher._collect_ready_files() == []
+
+
+def test_batch_moves_files_with_result_sidecars(
+    mock_ksef, make_client, tmp_path, monkeypatch
+):
+    route = mock_ksef_module.ROUTES[("GET", ENDPOINT_SESSION_INVOICE_LIST)]
+
+    def reject_first(mock, params, query, body):
+        status, payload = route(mock, params, query, body)
+        payload["invoices"][0]["status"] = {"code": 450, "description": "Invalid"}
+        return status, payload
+
+    monkeypatch.setitem(
+        mock_ksef_module.ROUTES, ("GET", ENDPOINT_SESSION_INVOICE_LIST), reject_first
+    )
+    watcher = SpoolWatcher(make_client(mock_ksef), str(tmp_path))
+    os.makedirs(watcher.sent_dir)
+    os.makedirs(watcher.failed_dir)
+    paths = [write_invoice(tmp_path, name) for name in ("a.xml", "b.xml")]
+
+    watcher._process_batch(paths)
+
+    sent, failed = tmp_path / "sent", tmp_path / "failed"
+    assert sorted(os.listdir(tmp_path)) == ["failed", "sent"]
+    assert sidecar(failed, "a.xml")["status"] == "rejected"
+    assert sidecar(sent, "b.xml")["status"] == "accepted"
+    assert (sent / "b.xml").read_text() == "<Faktura/>"
+
+
+def test_failed_sends_stop_after_retry_cap(mock_ksef, make_client, tmp_path):
+    client = make_client(mock_ksef)
+    watcher = SpoolWatcher(client, str(tmp_path))
+    os.makedirs(watcher.failed_dir)
+    path = write_invoice(tmp_path, "a.xml")
+    calls = []
+
+    def failing_send(invoice_xml, timeline=None):
+        calls.append(invoice_xml)
+        return None
+
+    client.send_invoice_to_session = failing_send
+
+    for _ in range(WATCH_MAX_SEND_ATTEMPTS):
+        assert os.path.exists(path)
+        watcher._process_batch([path])
+
+    assert len(calls) == WATCH_MAX_SEND_ATTEMPTS
+    assert not os.path.exists(path)
+    assert sidecar(tmp_path / "failed", "a.xml")["error"] == "Failed to send"
+
+
+def test_network_errors_do_not_stop_the_watcher(mock_ksef, make_client, tmp_path):
+    client = make_client(mock_ksef)
+    watcher = SpoolWatcher(client, str(tmp_path), interval=0.01)
+    write_invoice(tmp_path, "a.xml")
+    calls = []
+
+    def open_breaker(invoice_xml, timeline=None):
+        calls.append(invoice_xml)
+        raise CircuitOpenError("circuit open")
+
+    client.send_invoice_to_session = open_breaker
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    for _ in range(500):
+        if os.path.exists(tmp_path / "failed" / "a.xml"):
+            break
+        threading.Event().wait(0.01)
+    watcher.stop()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert len(calls) == WATCH_MAX_SEND_ATTEMPTS
+    assert sidecar(tmp_path / "failed", "a.xml")["error"] == "Failed to send"
@@ -0,0 +1,58 @@
+from ksef.constants import ENDPOINT_SESSION_INVOICE_LIST, ENDPOINT_SESSION_INVOICES
+import benchmarks.mock_ksef as mock_ksef_module
+
+
+def count_requests(monkeypatch, method, template):
+    calls = []
+    route = mock_ksef_module.ROUTES[(method, template)]
+
+    def counting(mock, params, query, body):
+        calls.append(params)
+        return route(mock, params, query, body)
+
+    monkeypatch.setitem(mock_ksef_module.ROUTES, (method, template), counting)
+    return calls
+
+
+def test_batch_polls_session_list_once_per_round(mock_ksef, make_client, monkeypatch):
+    mock_ksef.latency = 0.01
+    client = make_client(mock_ksef)
+    sends = count_requests(monkeypatch, "POST", ENDPOINT_SESSION_INVOICES)
+    lists = count_requests(monkeypatch, "GET", ENDPOINT_SESSION_INVOICE_LIST)
+
+    results = client.send_multiple_invoices(["<Faktura/>"] * 20)
+
+    assert results["successful"] == 20
+    assert len(sends) == 20
+    assert len(lists) == 1
+    assert sorted(r["index"] for r in results["results"]) == list(range(1, 21))
+
+
+def test_until_listed_excludes_client_side_wait(mock_ksef, make_client):
+    mock_ksef.latency = 0.01
+    client = make_client(mock_ksef)
+
+    results = client.send_multiple_invoices(["<Faktura/>"] * 20)
+
+    first = min(results["results"], key=lambda r: r["index"])
+    durations = first["timeline"]["durations"]
+    assert durations["poll_wait"] > 0.1
+    assert durations["until_listed"] < durations["poll_wait"]
+
+
+def test_rejected_and_processing_invoices(mock_ksef, make_client, monkeypatch):
+    client = make_client(mock_ksef)
+    route = mock_ksef_module.ROUTES[("GET", ENDPOINT_SESSION_INVOICE_LIST)]
+
+    def reject_first(mock, params, query, body):
+        status, payload = route(mock, params, query, body)
+        payload["invoices"][0]["status"] = {"code": 450, "description": "Invalid"}
+        return status, payload
+
+    monkeypatch.setitem(
+        mock_ksef_module.ROUTES, ("GET", ENDPOINT_SESSION_INVOICE_LIST), reject_first
+    )
+    results = client.send_multiple_invoices(["<Faktura/>"] * 3)
+
+    assert results["successful"] == 2
+    assert results["failed"] == 1
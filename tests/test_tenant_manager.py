@@ -0,0 +1,103 @@
+import pytest
+
+from ksef.config import KSeFConfig
+from ksef.http_client import HttpClient
+from ksef.tenant_manager import TenantManager
+
+
+def tenant_config(tmp_path, nip, **overrides):
+    options = dict(
+        nip=nip,
+        ksef_token="token",
+        log_file=str(tmp_path / "ksef.log"),
+        log_level_console="ERROR",
+        rate_limit=1000,
+        poll_stats_file=str(tmp_path / "stats.json"),
+        index_db=str(tmp_path / "index.db"),
+        offline_spool_dir=str(tmp_path / "spool"),
+    )
+    options.update(overrides)
+    return KSeFConfig(**options)
+
+
+@pytest.fixture
+def manager(mock_ksef, tmp_path):
+    manager = TenantManager(workers=1)
+    base_url = tenant_config(tmp_path, "").base_url
+    manager._http_clients[base_url] = HttpClient(mock_ksef.base_url)
+    yield manager
+    manager.stop()
+    manager._http_clients[base_url].close()
+
+
+def test_jobs_are_shared_by_weight(manager, tmp_path):
+    manager.add_tenant("a", tenant_config(tmp_path, "1111111111"), weight=2.0)
+    manager.add_tenant("b", tenant_config(tmp_path, "2222222222"), weight=1.0)
+    order = []
+    for _ in range(6):
+        for name in ("a", "b"):
+            manager.submit(name, lambda client, name=name: order.append(name))
+
+    manager.start()
+    manager.stop()
+
+    assert order[:6].count("a") == 4
+    assert order[:6].count("b") == 2
+    assert sorted(order) == ["a"] * 6 + ["b"] * 6
+
+
+def test_tenant_state_is_namespaced(manager, tmp_path):
+    first = manager.add_tenant("a", tenant_config(tmp_path, "1111111111")).client
+    second = manager.add_tenant("b", tenant_config(tmp_path, "2222222222")).client
+
+    for key in ("index_db", "poll_stats_file", "offline_spool_dir"):
+        assert getattr(first.config, key) != getattr(second.config, key)
+    assert first.config.index_db == str(tmp_path / "a" / "index.db")
+    assert second.config.offline_spool_dir == str(tmp_path / "spool" / "b")
+
+
+def test_drain_only_sends_own_spool(manager, tmp_path):
+    first = manager.add_tenant("a", tenant_config(tmp_path, "1111111111")).client
+    second = manager.add_tenant("b", tenant_config(tmp_path, "2222222222")).client
+    second.offline_spool.put("<Faktura/>")
+
+    assert first.drain_offline_spool()["drained"] == 0
+    assert second.offline_spool.depth == 1
+
+
+def test_invalid_tenant_name_is_rejected(manager, tmp_path):
+    with pytest.raises(ValueError):
+        manager.add_tenant("../a", tenant_config(tmp_path, "1111111111"))
+
+
+def test_submit_send_totals_include_spooled(manager, tmp_path):
+    tenant = manager.add_tenant("a", tenant_config(tmp_path, "1111111111"))
+
+    def offline_send(invoices, keep_session=False):
+        return {
+            "total": len(invoices),
+            "successful": 0,
+            "failed": 0,
+            "spooled": len(invoices),
+            "results": [],
+        }
+
+    tenant.client.send_multiple_invoices = offline_send
+    manager.start()
+
+    totals = manager.submit_send("a", ["<Faktura/>"] * 5, chunk_size=2).result(5)
+
+    assert totals["spooled"] == 5
+    assert totals["total"] == 5
+
+
+def test_tenants_send_concurrently(mock_ksef, manager, tmp_path):
+    manager.workers = 2
+    for name, nip in (("a", "1111111111"), ("b", "2222222222")):
+        manager.add_tenant(name, tenant_config(tmp_path, nip))
+    manager.start()
+
+    futures = [manager.submit_send(name, ["<Faktura/>"] * 3) for name in ("a", "b")]
+
+    for future in futures:
+        assert future.result(30)["successful"] == 3
@@ -0,0 +1,105 @@
+import logging
+import socket
+import sys
+import pytest
+import requests
+from ksef.constants import TRANSPORT_HTTP1
+from ksef.http_client import request_not_sent
+from ksef.transports import (
+    Http2Transport,
+    RequestsTransport,
+    _BufferBody,
+    create_transport,
+)
+
+
+def _httpx_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        import httpx  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+requires_httpx = pytest.mark.skipif(
+    not _httpx_available(), reason="httpx[http2] not installed"
+)
+
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_http2_falls_back_to_http1_without_httpx(monkeypatch, caplog):
+    monkeypatch.setitem(sys.modules, "httpx", None)
+
+    with caplog.at_level(logging.WARNING):
+        transport = create_transport(http2=True, logger=logging.getLogger("test"))
+
+    try:
+        assert isinstance(transport, RequestsTransport)
+        assert transport.stats() == {"transport": TRANSPORT_HTTP1}
+    finally:
+        transport.close()
+    assert "falling back to HTTP/1.1" in caplog.text
+
+
+def test_http1_is_the_default():
+    transport = create_transport()
+    try:
+        assert isinstance(transport, RequestsTransport)
+    finally:
+        transport.close()
+
+
+def test_buffer_body_reads_without_copying():
+    body = _BufferBody(bytearray(b"abcdef"))
+
+    assert len(body) == 6
+    assert bytes(body.read(4)) == b"abcd"
+    assert body.tell() == 4
+    assert bytes(body.read()) == b"ef"
+    body.seek(0)
+    assert bytes(body.read(2)) == b"ab"
+
+
+@requires_httpx
+def test_refused_http2_connection_is_a_requests_error():
+    transport = Http2Transport()
+    try:
+        with pytest.raises(requests.ConnectionError) as excinfo:
+            transport.request("GET", f"http://127.0.0.1:{closed_port()}/")
+    finally:
+        transport.close()
+
+    assert request_not_sent(excinfo.value)
+
+
+@requires_httpx
+@pytest.mark.parametrize(
+    "error, expected, not_sent",
+    [
+        ("ConnectTimeout", requests.ConnectTimeout, True),
+        ("ReadTimeout", requests.ReadTimeout, False),
+        ("RemoteProtocolError", requests.RequestException, False),
+    ],
+)
+def test_httpx_errors_are_translated(error, expected, not_sent):
+    import httpx
+
+    def handler(request):
+        raise getattr(httpx, error)("boom", request=request)
+
+    transport = Http2Transport()
+    transport.client = httpx.Client(transport=httpx.MockTransport(handler))
+    try:
+        with pytest.raises(expected) as excinfo:
+            transport.request("GET", "http://ksef.test/", timeout=(1, 1))
+    finally:
+        transport.close()
+
+    assert isinstance(excinfo.value.__cause__, httpx.HTTPError)
+    assert request_not_sent(excinfo.value) is not_sent
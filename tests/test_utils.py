@@ -0,0 +1,76 @@
+import os
+import random
+import pytest
+import ksef.utils
+from ksef.utils import iter_invoices_from_directory, iter_sorted_files
+
+
+@pytest.fixture
+def invoice_dir(tmp_path):
+    names = [f"invoice-{index:03d}.xml" for index in range(25)]
+    random.Random(7).shuffle(names)
+    for name in names:
+        index = int(name[8:11])
+        (tmp_path / name).write_text(f"<Faktura>{'x' * index}</Faktura>")
+    (tmp_path / "notes.txt").write_text("skip me")
+    (tmp_path / "nested.xml").mkdir()
+    return tmp_path
+
+
+def spilled_runs(monkeypatch):
+    runs = []
+    original = ksef.utils._spill_sorted_run
+
+    def spill(chunk):
+        run = original(chunk)
+        runs.append(run)
+        return run
+
+    monkeypatch.setattr(ksef.utils, "_spill_sorted_run", spill)
+    return runs
+
+
+def test_external_merge_keeps_order_and_sizes(invoice_dir, monkeypatch):
+    runs = spilled_runs(monkeypatch)
+
+    entries = list(iter_sorted_files(str(invoice_dir), "*.xml", chunk_size=4))
+
+    assert len(runs) == 7
+    assert all(run.closed for run in runs)
+    assert [os.path.basename(path) for path, _ in entries] == [
+        f"invoice-{index:03d}.xml" for index in range(25)
+    ]
+    assert [size for _, size in entries] == [
+        os.path.getsize(path) for path, _ in entries
+    ]
+
+
+def test_small_directory_is_sorted_in_memory(invoice_dir, monkeypatch):
+    runs = spilled_runs(monkeypatch)
+
+    entries = list(iter_sorted_files(str(invoice_dir), "*.xml", chunk_size=100))
+
+    assert runs == []
+    assert entries == sorted(entries)
+    assert len(entries) == 25
+
+
+def test_runs_are_closed_when_iteration_stops_early(invoice_dir, monkeypatch):
+    runs = spilled_runs(monkeypatch)
+
+    entries = iter_sorted_files(str(invoice_dir), "*.xml", chunk_size=4)
+    first = next(entries)
+    entries.close()
+
+    assert os.path.basename(first[0]) == "invoice-000.xml"
+    assert runs and all(run.closed for run in runs)
+
+
+def test_invoices_are_loaded_in_sorted_order(invoice_dir):
+    invoices = list(iter_invoices_from_directory(str(invoice_dir), chunk_size=3))
+
+    assert [invoice.content for invoice in invoices[:2]] == [
+        "<Faktura></Faktura>",
+        "<Faktura>x</Faktura>",
+    ]
+    assert all(invoice.size == len(invoice.content) for invoice in invoices)